@@ -1,5 +1,21 @@
-import requests
+import codecs
+import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from calendar_store import CalendarMirror
+from models import APPOINTMENT_FIELDS, Forecast
+
+
+class _LazyRequests:
+    """Imports requests on first use, keeping it off the startup path."""
+    def __getattr__(self, name):
+        global requests
+        import requests as _requests
+        requests = _requests
+        return getattr(_requests, name)
+
+requests = _LazyRequests()
 
 # --- CONFIGURATION ---
 TEAM_ID = "team_ASUS_PRIVATOOOO444SSSO"
@@ -7,64 +23,260 @@ TEAM_ID = "team_ASUS_PRIVATOOOO444SSSO"
 WEATHER_URL = "https://api.responsible-nlp.net/weather.php"
 CALENDAR_URL = "https://api.responsible-nlp.net/calendar.php"
 
-# --- WEATHER (UNCHANGED) ---
+# Local copy of the calendar, used when the server is slow or down
+mirror = CalendarMirror()
+FORECAST_MAX_AGE = 600.0  # seconds a city's forecast is reused before asking weather.php again
+_forecasts = {}           # city (lowercase) -> (fetched at, Forecast)
+OFFLINE_RETRY = 30  # seconds to serve the mirror before trying a dead server again
+STREAM_CHUNK = 64 * 1024  # bytes read at a time from calendar.php
+SNAPSHOT_MAX_AGE = 30.0   # seconds a command's calendar snapshot may be reused (no writes in between)
+
+# Calendar reads within one command share one download (see begin_command):
+# _write_generation counts writes sent through this module; a snapshot or an
+# in-flight GET from an older generation is never reused.
+_state_lock = threading.Lock()
+_write_generation = 0
+_snapshot = None          # {"generation", "time"} of the last download in the current command
+_flight = None            # GET in progress: {"generation", "done": Event}
+fetch_stats = {"fetches": 0, "coalesced": 0, "snapshot_hits": 0}  # of the current command
+
+# --- WEATHER ---
 def get_weather_forecast(city):
+    """
+    The city's Forecast (see models.py), None if there is none. A forecast
+    younger than FORECAST_MAX_AGE is reused; forecasts change a few times a day.
+    """
+    cached = _forecasts.get(city.lower())
+    if cached and time.time() - cached[0] < FORECAST_MAX_AGE:
+        return cached[1]
     try:
-        response = requests.post(WEATHER_URL, data={"place": city})
+        response = requests.post(WEATHER_URL, data={"place": city}, timeout=5)
         if response.status_code == 200:
-            return response.json()
+            forecast = Forecast.from_json(response.json())
+            if forecast:
+                _forecasts[city.lower()] = (time.time(), forecast)
+            return forecast
         return None
     except Exception:
         return None
 
 
+def get_weather_forecasts(cities):
+    """
+    Fetch forecasts for several cities concurrently.
+    Returns {city: Forecast or None} in the order the cities were given.
+    """
+    if len(cities) <= 1:
+        return {city: get_weather_forecast(city) for city in cities}
+    with ThreadPoolExecutor(max_workers=min(8, len(cities))) as pool:
+        results = list(pool.map(get_weather_forecast, cities))
+    return dict(zip(cities, results))
+
+
 # ---------------- CALENDAR FIXES START HERE ---------------- #
 
-def get_appointments():
+def iter_json_array(chunks):
+    """
+    Yields the items of a top-level JSON array while its text is still
+    arriving in chunks, so only one item at a time is held in memory.
+    A body that isn't an array yields nothing; a cut-off one raises ValueError.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    return
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # item not complete yet
+            if isinstance(item, (int, float)) and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                break  # a number cut at the chunk edge decodes early ("12" of "123", "4" of "4.5")
+            pos = end
+            yield item
+        buffer, pos = buffer[pos:], 0
+    if started:
+        raise ValueError("calendar response ended in the middle of the list")
+
+
+def _decode_chunks(byte_chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in byte_chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def begin_command():
     """
-    Fetch all appointments with retry logic
+    Start of one spoken command: the first calendar read downloads, every later
+    read of the same command (and of the writes it queued) reuses that download
+    until something is written. Resets fetch_stats.
     """
+    global _snapshot
+    with _state_lock:
+        _snapshot = None
+        for key in fetch_stats:
+            fetch_stats[key] = 0
+
+
+def end_command():
+    """fetch_stats of the command that just finished (a copy)."""
+    with _state_lock:
+        return dict(fetch_stats)
+
+
+def _note_write():
+    """
+    Called before every calendar write is sent and again once its response is
+    back: a download that started in between may or may not include the write,
+    so it must not be reused either.
+    """
+    global _write_generation
+    with _state_lock:
+        _write_generation += 1
+
+
+def sync_appointments(max_age=None):
+    """
+    Bring the local mirror up to date with retry logic. The response is parsed
+    as it streams in and written straight into the mirror, without building
+    the full list in memory. With max_age (seconds) a recent enough mirror is
+    kept without touching the network; if the server can't be reached the
+    mirror keeps its last good copy (see mirror.sync_status() for how old it is).
+    Within one command the mirror is downloaded at most once between writes,
+    and callers arriving while a GET is in flight wait for it instead of
+    sending their own.
+    """
+    global _snapshot, _flight
+    if max_age is not None and mirror.is_fresh(max_age):
+        return
+    if mirror.is_offline() and mirror.seconds_since_attempt() < OFFLINE_RETRY:
+        return
+
+    with _state_lock:
+        if (_snapshot is not None and _snapshot["generation"] == _write_generation
+                and time.time() - _snapshot["time"] < SNAPSHOT_MAX_AGE):
+            fetch_stats["snapshot_hits"] += 1
+            return
+        flight = _flight
+        leader = flight is None or flight["generation"] != _write_generation
+        if leader:
+            flight = _flight = {"generation": _write_generation, "done": threading.Event()}
+            fetch_stats["fetches"] += 1
+        else:
+            fetch_stats["coalesced"] += 1
+    if not leader:
+        flight["done"].wait()
+        return
+
+    try:
+        if _download():
+            with _state_lock:
+                _snapshot = {"generation": flight["generation"], "time": time.time()}
+    finally:
+        with _state_lock:
+            if _flight is flight:
+                _flight = None
+        flight["done"].set()
+
+
+def _unreachable(error):
+    """True for errors meaning calendar.php could not be reached (not an error answer from it)."""
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _download():
+    """One GET of the whole calendar into the mirror, retried once. Returns True on success."""
     max_retries = 2
+    error = None
     for attempt in range(max_retries):
         try:
             response = requests.get(
                 CALENDAR_URL,
                 params={"calenderid": TEAM_ID},
                 headers={"Cache-Control": "no-cache"},
-                timeout=5
+                timeout=5,
+                stream=True
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list):
-                    return data
-                return []
-            
+            try:
+                if response.status_code == 200:
+                    events = iter_json_array(_decode_chunks(response.iter_content(chunk_size=STREAM_CHUNK)))
+                    mirror.replace_all(e for e in events if isinstance(e, dict))
+                    return True
+            finally:
+                response.close()  # a streamed response holds its connection until closed, also when parsing fails
+
+            error = f"HTTP {response.status_code}"
             # If first attempt fails, wait and retry
             if attempt < max_retries - 1:
                 time.sleep(0.5)
                 
         except Exception as e:
+            error = e
             if attempt < max_retries - 1:
                 time.sleep(0.5)
             else:
                 print(f"Error fetching appointments: {e}")
                 
-    return []
+    if _unreachable(error):
+        mirror.mark_failed(error)
+    else:
+        mirror.mark_rejected(error)
+    return False
 
 
-def create_appointment(title, description, start_time, end_time, location):
+def get_appointments(max_age=None):
     """
-    Create appointment with verification
+    All appointments as models.Appointment, in a tuple shared until the
+    calendar changes (see sync_appointments for max_age and offline use).
     """
+    sync_appointments(max_age=max_age)
+    return mirror.appointments()
+
+
+def appointment_exists(**fields):
+    """After a sync: True if the calendar has an appointment with exactly these field values (or id)."""
+    sync_appointments()
+    return mirror.contains(**fields)
+
+
+def resolve_appointment(fields):
+    """
+    The appointment a queued write refers to (fields as journaled), as the
+    server has it now: by its id while that still exists, else by its other
+    fields - a modify queued before it replaced it under a new id, or the
+    queue created it and it had no id yet. Only answered from a download made
+    after the last write sent from here (so never from a mirror that predates
+    our own changes); None if it isn't there or no such download can be made.
+    """
+    sync_appointments()
+    with _state_lock:
+        current = _snapshot is not None and _snapshot["generation"] == _write_generation
+    if not current and not _download():
+        return None
+    if fields.get("id") is not None:
+        event = mirror.find(id=fields["id"])
+        if event is not None:
+            return event
+    return mirror.find(**{f: fields.get(f) for f in APPOINTMENT_FIELDS if f != "id"})
+
+
+def _post_appointment(payload):
+    """Single POST of one appointment, no verification. Returns True on HTTP 200."""
+    _note_write()
     try:
-        payload = {
-            "title": title,
-            "description": description,
-            "start_time": start_time,
-            "end_time": end_time,
-            "location": location
-        }
         r = requests.post(
             CALENDAR_URL,
             params={"calenderid": TEAM_ID},
@@ -72,15 +284,64 @@ def create_appointment(title, description, start_time, end_time, location):
             json=payload,
             timeout=5
         )
-        
-        if r.status_code == 200:
+    except requests.RequestException as e:
+        if _unreachable(e):
+            mirror.mark_failed(e)
+        raise
+    finally:
+        _note_write()
+    if r.status_code == 200:
+        mirror.mark_written()
+    else:
+        mirror.mark_rejected(f"HTTP {r.status_code}")
+    return r.status_code == 200
+
+
+def _delete_by_id(event_id):
+    """Single DELETE of one appointment by ID. Returns True on HTTP 200."""
+    _note_write()
+    try:
+        r = requests.delete(
+            CALENDAR_URL,
+            params={
+                "calenderid": TEAM_ID,
+                "id": event_id
+            },
+            timeout=5
+        )
+    except requests.RequestException as e:
+        if _unreachable(e):
+            mirror.mark_failed(e)
+        raise
+    finally:
+        _note_write()
+    if r.status_code == 200:
+        mirror.mark_written()
+    else:
+        mirror.mark_rejected(f"HTTP {r.status_code}")
+    return r.status_code == 200
+
+
+def create_appointment(title, description, start_time, end_time, location, verify=True):
+    """
+    Create appointment, with verification unless verify=False
+    """
+    try:
+        payload = {
+            "title": title,
+            "description": description,
+            "start_time": start_time,
+            "end_time": end_time,
+            "location": location
+        }
+        if _post_appointment(payload):
+            if not verify:
+                return True
             # Wait for sync
             time.sleep(1.0)
             # Verify creation
-            events = get_appointments()
-            for e in events:
-                if e.get('title') == title:
-                    return True
+            if appointment_exists(title=title):
+                return True
         
         return False
     except Exception as e:
@@ -88,45 +349,22 @@ def create_appointment(title, description, start_time, end_time, location):
         return False
 
 
-def delete_appointment(title_to_delete):
+def delete_appointment(title_to_delete, event_id=None):
     """
-    Delete appointment by finding its ID first, then using DELETE request
+    Delete appointment by finding its ID first, then using DELETE request.
+    With event_id that exact appointment is deleted, no lookup by title.
     """
     try:
-        events = get_appointments()
-        
-        # Find the appointment ID
-        target_id = None
-        for event in events:
-            server_title = event.get("title", "")
-            # Try exact match first
-            if server_title.lower() == title_to_delete.lower():
-                target_id = event.get("id")
-                break
-        
-        # If no exact match, try partial match
-        if not target_id:
-            for event in events:
-                server_title = event.get("title", "")
-                if title_to_delete.lower() in server_title.lower():
-                    target_id = event.get("id")
-                    break
+        target_id = event_id
+        if target_id is None:
+            target_id = _find_id(title_to_delete)
         
         if not target_id:
             print(f"Could not find appointment: {title_to_delete}")
             return False
         
         # Delete using ID with DELETE request
-        r = requests.delete(
-            CALENDAR_URL,
-            params={
-                "calenderid": TEAM_ID,
-                "id": target_id
-            },
-            timeout=5
-        )
-        
-        if r.status_code == 200:
+        if _delete_by_id(target_id):
             time.sleep(1.0)  # Wait for server sync
             return True
         
@@ -137,6 +375,13 @@ def delete_appointment(title_to_delete):
         return False
 
 
+def _find_id(title_to_delete):
+    """ID of the appointment with this title: exact match first, then partial."""
+    sync_appointments()
+    event = mirror.find_by_title(title_to_delete)
+    return event.id if event else None
+
+
 def delete_all_appointments():
     """
     Delete all appointments using DELETE request with ID
@@ -155,20 +400,12 @@ def delete_all_appointments():
         deleted_this_pass = 0
         
         for event in events:
-            event_id = event.get("id")
-            title = event.get("title", "Unknown")
+            event_id = event.id
+            title = event.title or "Unknown"
             
             if event_id:
                 try:
-                    r = requests.delete(
-                        CALENDAR_URL,
-                        params={
-                            "calenderid": TEAM_ID,
-                            "id": event_id
-                        },
-                        timeout=5
-                    )
-                    if r.status_code == 200:
+                    if _delete_by_id(event_id):
                         deleted_this_pass += 1
                         print(f"  Deleted: {title} (ID: {event_id})")
                 except Exception as e:
@@ -192,65 +429,106 @@ def delete_all_appointments():
     return total_deleted
 
 
-def modify_appointment(old_title, new_location=None, new_title=None, new_date=None, new_end_date=None):
+def _on_server(fields=None, event_id=None):
     """
-    Modify appointment by deleting and recreating with new values
+    True if a fresh download of the calendar has an appointment with exactly
+    these fields (or this ID). For requests that failed without an answer:
+    a timed-out POST may still have been carried out. Downloads even right
+    after a connection error (False if that fails too).
+    """
+    if not _download():
+        return False
+    if event_id is not None and mirror.contains(id=event_id):
+        return True
+    return fields is not None and mirror.contains(**fields)
+
+
+def update_appointment(event, changes, resent=False):
     """
+    Apply several field changes to an already-fetched event in one replace
+    (calendar.php has no update, so: one DELETE + one POST, no refetch).
+    changes maps field names from APPOINTMENT_FIELDS to new values; None and
+    unchanged values are skipped, and nothing is sent if nothing changes.
+    If the new version cannot be created, the original event is restored.
+    resent=True means an earlier attempt may have got partway: if the old
+    version is already gone, only the missing POST is sent.
+    """
+    diff = {k: v for k, v in changes.items() if v is not None and v != getattr(event, k)}
+    if not diff:
+        return True
+
+    event_id = event.id
+    if not event_id:
+        print("Appointment has no ID")
+        return False
+
+    original = {f: getattr(event, f) for f in APPOINTMENT_FIELDS if f != "id"}  # the server assigns the ID
+    updated = dict(original, **diff)
+
+    if resent and not _on_server(event_id=event_id):
+        try:
+            return _on_server(updated) or _post_appointment(updated)
+        except Exception as e:
+            print(f"Error creating updated appointment: {e}")
+            return False
+
     try:
-        events = get_appointments()
-        target_event = None
-        
-        # Find the appointment (exact or partial match)
-        for event in events:
-            server_title = event.get("title", "")
-            if old_title.lower() == server_title.lower() or old_title.lower() in server_title.lower():
-                target_event = event
+        if not _delete_by_id(event_id):
+            print("Failed to delete old appointment")
+            return False
+    except Exception as e:
+        print(f"Error deleting: {e}")
+        return False
+
+    try:
+        if _post_appointment(updated):
+            return True
+    except Exception as e:
+        print(f"Error creating updated appointment: {e}")
+        if _on_server(updated):
+            return True  # it was written, only the answer got lost
+
+    # Roll back: put the original back so the appointment is never lost
+    print("Update failed, restoring the original appointment")
+    for attempt in range(3):
+        try:
+            if _post_appointment(original):
                 break
+        except Exception as e:
+            print(f"Error restoring appointment: {e}")
+            if _on_server(original):
+                break
+        time.sleep(0.5)
+    else:
+        print(f"Could not restore appointment: {original}")
+    return False
+
+
+def modify_appointment(old_title, new_location=None, new_title=None, new_date=None, new_end_date=None, event=None,
+                       resent=False):
+    """
+    Modify appointment; any combination of fields can change in one call.
+    Pass event to reuse an already-fetched appointment instead of fetching again
+    (resent: see update_appointment).
+    """
+    try:
+        target_event = event
+        if target_event is None:
+            # Find the appointment (exact or partial match)
+            sync_appointments()
+            target_event = mirror.find_by_title(old_title)
         
         if not target_event:
             print(f"Could not find appointment: {old_title}")
             return False
         
-        # Get the ID for deletion
-        event_id = target_event.get("id")
-        
-        if not event_id:
-            print("Appointment has no ID")
-            return False
-        
-        # Delete old appointment using ID
-        try:
-            r = requests.delete(
-                CALENDAR_URL,
-                params={
-                    "calenderid": TEAM_ID,
-                    "id": event_id
-                },
-                timeout=5
-            )
-            
-            if r.status_code != 200:
-                print("Failed to delete old appointment")
-                return False
-                
-        except Exception as e:
-            print(f"Error deleting: {e}")
-            return False
-        
-        # Wait for deletion to sync
-        time.sleep(1.5)
-        
-        # Create new appointment with updated values
-        success = create_appointment(
-            new_title if new_title else target_event.get("title"),
-            target_event.get("description", ""),
-            new_date if new_date else target_event.get("start_time"),
-            new_end_date if new_end_date else target_event.get("end_time"),
-            new_location if new_location else target_event.get("location")
-        )
-        
-        return success
+        return update_appointment(target_event, {
+            "title": new_title,
+            "start_time": new_date,
+            "end_time": new_end_date,
+            "location": new_location
+        }, resent=resent)
         
     except Exception as e:
         print(f"Error modifying appointment: {e}")
-        return False
\ No newline at end of file
+        return False
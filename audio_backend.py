@@ -0,0 +1,299 @@
+import os
+import tempfile
+import time
+import numpy as np
+
+from response_cache import ClipCache
+
+# Audio I/O backends used by speech_module.
+# A "source" provides the microphone stream for record_audio,
+# a "sink" turns the assistant's answers into sound (or not).
+
+
+class AudioSourceExhausted(EOFError):
+    """Raised by replay streams once every clip has been played."""
+
+
+# --- CAPTURE SOURCES ---
+
+class LiveAudioSource:
+    """
+    Real microphone through sounddevice (the default).
+    """
+    exhausted = False
+
+    def open(self, samplerate, channels=1, dtype='int16'):
+        import sounddevice as sd
+        return sd.InputStream(samplerate=samplerate, channels=channels, dtype=dtype)
+
+
+class FileAudioSource:
+    """
+    Replays WAV files (or int16 NumPy arrays) as if they were spoken into the mic.
+    Every clip is followed by a gap of silence so the endpointing in record_audio
+    stops exactly like it would for a real speaker.
+
+    speed=None feeds chunks as fast as they are read, speed=20 paces the stream
+    at 20x real time, speed=1 behaves like a real microphone.
+    """
+
+    def __init__(self, clips=(), samplerate=16000, gap_seconds=3.0, speed=None):
+        self.samplerate = samplerate
+        self.gap_seconds = gap_seconds
+        self.speed = speed
+        self.clips = []
+        self.position = 0
+        self._audio = np.zeros(0, dtype=np.int16)
+        for clip in clips:
+            self.add(clip)
+
+    def add(self, clip):
+        """Queue a WAV path or an int16 array (already at self.samplerate)."""
+        if isinstance(clip, (str, os.PathLike)):
+            name = os.path.basename(str(clip))
+            samples = load_wav(clip, self.samplerate)
+        else:
+            name = f"array {len(self.clips) + 1}"
+            samples = np.asarray(clip, dtype=np.int16).reshape(-1)
+        gap = np.zeros(int(self.gap_seconds * self.samplerate), dtype=np.int16)
+        self.clips.append(name)
+        self._audio = np.concatenate([self._audio, samples, gap])
+
+    @property
+    def exhausted(self):
+        return self.position >= len(self._audio)
+
+    @property
+    def duration(self):
+        """Total length of the queued audio in seconds."""
+        return len(self._audio) / self.samplerate
+
+    def open(self, samplerate, channels=1, dtype='int16'):
+        if samplerate != self.samplerate:
+            raise ValueError(f"Replay source is {self.samplerate} Hz, stream asked for {samplerate} Hz")
+        return _ReplayStream(self, channels)
+
+
+class _ReplayStream:
+    """Mimics the parts of sd.InputStream that record_audio uses."""
+
+    def __init__(self, source, channels):
+        self.source = source
+        self.channels = channels
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def read(self, frames):
+        src = self.source
+        if src.exhausted:
+            raise AudioSourceExhausted("No more audio to replay")
+
+        chunk = src._audio[src.position:src.position + frames]
+        src.position += len(chunk)
+        if len(chunk) < frames:
+            chunk = np.concatenate([chunk, np.zeros(frames - len(chunk), dtype=np.int16)])
+
+        if src.speed:
+            time.sleep(frames / src.samplerate / src.speed)
+
+        # Same shape as sounddevice: (frames, channels), overflow flag
+        return np.repeat(chunk[:, None], self.channels, axis=1), False
+
+
+# --- CAPTURE BUFFER ---
+
+class CaptureBuffer:
+    """
+    Preallocated int16 storage for one utterance.
+    While waiting for speech, chunks go into a small ring (the pre-roll) so the
+    start of the first word isn't cut off; once speech starts, chunks are copied
+    in after it up to a hard cap, so a stuck-open mic can't grow memory.
+    The buffer is reused between utterances: view() is only valid until reset().
+    """
+
+    def __init__(self, samplerate, max_seconds, pre_roll_seconds):
+        self.samplerate = samplerate
+        self.pre_roll = int(pre_roll_seconds * samplerate)
+        self.capacity = self.pre_roll + int(max_seconds * samplerate)
+        self.data = np.zeros(self.capacity, dtype=np.int16)
+        self.reset()
+
+    def reset(self):
+        self.length = 0
+        self.truncated = False
+        self._ring_pos = 0
+        self._ring_filled = 0
+
+    def push_pre_roll(self, chunk):
+        """Keep only the newest pre_roll samples while waiting for speech."""
+        if self.pre_roll == 0:
+            return
+        chunk = chunk[-self.pre_roll:]
+        n = len(chunk)
+        first = min(n, self.pre_roll - self._ring_pos)
+        self.data[self._ring_pos:self._ring_pos + first] = chunk[:first]
+        self.data[:n - first] = chunk[first:]
+        self._ring_pos = (self._ring_pos + n) % self.pre_roll
+        self._ring_filled = min(self.pre_roll, self._ring_filled + n)
+
+    def start(self):
+        """Speech began: put the pre-roll in chronological order at the front."""
+        if self._ring_filled == self.pre_roll and self._ring_pos:
+            oldest = self.data[self._ring_pos:self.pre_roll].copy()
+            self.data[len(oldest):self.pre_roll] = self.data[:self._ring_pos]
+            self.data[:len(oldest)] = oldest
+        self.length = self._ring_filled
+
+    def append(self, chunk):
+        """Add recorded audio. Returns False once the cap is reached (the rest is dropped)."""
+        room = self.capacity - self.length
+        n = min(room, len(chunk))
+        self.data[self.length:self.length + n] = chunk[:n]
+        self.length += n
+        if n < len(chunk):
+            self.truncated = True
+            return False
+        return True
+
+    def view(self):
+        """The utterance so far, without copying."""
+        return self.data[:self.length]
+
+    @property
+    def seconds(self):
+        return self.length / self.samplerate
+
+
+def load_wav(path, samplerate=16000):
+    """
+    Read a WAV file as mono int16 at the given sample rate.
+    """
+    import scipy.io.wavfile as wav
+    from audio_preprocess import to_float32, to_mono, resample
+
+    rate, data = wav.read(path)
+    audio = resample(to_mono(to_float32(data)), rate, samplerate)
+    return np.clip(audio * 32767.0, -32768, 32767).astype(np.int16)
+
+
+# --- SPEECH SINKS ---
+
+class Pyttsx3Sink:
+    """
+    Speaks through pyttsx3. Uses 'sapi5' (Windows standard) by default;
+    pass driver=None to let pyttsx3 pick (espeak on Linux).
+    speak() re-initializes the engine each time to prevent audio driver
+    conflicts; synthesize() only writes files, so it keeps one engine.
+    """
+
+    release_seconds = 0.5  # pause before speaking so the microphone can release the audio device
+
+    def __init__(self, driver='sapi5', rate=170, volume=1.0):
+        self.driver = driver
+        self.rate = rate
+        self.volume = volume
+        self.clips = ClipCache()  # rendered answers, so a repeated one plays without synthesis
+        self._engine = None       # synthesis engine, reused across chunks
+
+    def speak(self, text):
+        import pyttsx3
+
+        # pyttsx3.init() hands out a live engine for the same driver: drop the
+        # synthesis one so speaking gets a fresh engine as before
+        self._engine = None
+
+        # Tiny pause to let the microphone release the audio device
+        time.sleep(self.release_seconds)
+
+        try:
+            engine = pyttsx3.init(self.driver) if self.driver else pyttsx3.init()
+            engine.setProperty('volume', self.volume)
+            engine.setProperty('rate', self.rate)
+
+            engine.say(text)
+            engine.runAndWait()
+
+            # Cleanup (helps prevents errors on next loop)
+            engine.stop()
+            del engine
+        except Exception as e:
+            print(f"[Error] TTS failed: {e}")
+
+    # Streaming (see speech_module.speak_stream): synthesis and playback are
+    # separate steps, so the next sentence renders while this one plays.
+
+    def cached(self, text):
+        """The already rendered clip for text, or None."""
+        return self.clips.get((text, self.driver, self.rate, self.volume))
+
+    def synthesize(self, text):
+        """Render text to a (samples, rate) clip without playing it; None if that fails."""
+        key = (text, self.driver, self.rate, self.volume)
+        clip = self.clips.get(key)
+        if clip is not None:
+            return clip
+
+        import pyttsx3
+        import scipy.io.wavfile as wav
+
+        t0 = time.perf_counter()
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            if self._engine is None:
+                self._engine = pyttsx3.init(self.driver) if self.driver else pyttsx3.init()
+                self._engine.setProperty('volume', self.volume)
+                self._engine.setProperty('rate', self.rate)
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+            rate, data = wav.read(path)
+            if not len(data):
+                return None
+            self.clips.put(key, (data, rate), time.perf_counter() - t0)
+            return data, rate
+        except Exception as e:
+            print(f"[Error] TTS synthesis failed: {e}")
+            self._engine = None  # start over with a new engine next time
+            return None
+        finally:
+            os.remove(path)
+
+    def play(self, clip):
+        """Start playing a clip and return its length in seconds (playback runs in the background)."""
+        import sounddevice as sd
+        data, rate = clip
+        try:
+            sd.play(data, rate)
+        except Exception as e:
+            print(f"[Error] Playback failed: {e}")
+            return 0.0
+        return len(data) / rate
+
+    def wait(self):
+        import sounddevice as sd
+        sd.wait()
+
+    def stop(self):
+        import sounddevice as sd
+        sd.stop()
+
+
+class NullSink:
+    """Drops all speech output (headless runs)."""
+
+    def speak(self, text):
+        pass
+
+
+class RecordingSink:
+    """Keeps every spoken response in self.spoken instead of playing it."""
+
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text):
+        self.spoken.append(text)
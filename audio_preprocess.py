@@ -0,0 +1,138 @@
+import numpy as np
+
+# Audio clean-up before Whisper: mono, 16 kHz float32, normalized gain and
+# no leading/trailing silence. Decode time grows with the length of the
+# audio, so every second of dead air cut here is a second Whisper skips.
+# Everything is done on whole arrays (no per-chunk Python loops).
+
+TARGET_RATE = 16000
+TARGET_PEAK = 0.9          # normalize to 90% of full scale
+SILENCE_DB = -35.0         # frames quieter than this (relative to the peak) are silence
+FRAME_MS = 20
+PADDING_MS = 200           # keep a little context around the speech
+
+
+def to_mono(audio, out=None):
+    """
+    (samples, channels) float audio -> (samples,) by averaging the channels.
+    Mono input is returned as is. Writes into out (must not overlap audio) if given.
+    """
+    if audio.ndim > 1:
+        if out is None:
+            out = np.empty(audio.shape[0], dtype=np.float32)
+        # Column adds: much faster than mean(axis=1) over a 2-wide inner axis
+        np.copyto(out, audio[:, 0])
+        for channel in range(1, audio.shape[1]):
+            out += audio[:, channel]
+        out *= 1.0 / audio.shape[1]
+        return out
+    return audio
+
+
+def to_float32(audio, out=None):
+    """Integer PCM -> float32 in [-1, 1]. Writes into out if given."""
+    if audio.dtype == np.int16:
+        scale = 1.0 / 32768.0
+    elif audio.dtype == np.int32:
+        scale = 1.0 / 2147483648.0
+    elif audio.dtype == np.uint8:
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        np.subtract(audio, 128.0, out=out, dtype=np.float32)
+        out *= 1.0 / 128.0
+        return out
+    else:
+        scale = 1.0
+    if out is None:
+        out = np.empty(audio.shape, dtype=np.float32)
+    np.multiply(audio, scale, out=out, casting="unsafe")
+    return out
+
+
+def resample(audio, rate, target_rate=TARGET_RATE):
+    """
+    Polyphase resampling (anti-aliased) to target_rate. scipy returns a new
+    array, so this is the one step that allocates; at target_rate (what the
+    microphone records) it's skipped and the input is returned as is.
+    """
+    if rate == target_rate:
+        return audio
+    from math import gcd
+    from scipy.signal import resample_poly
+    g = gcd(int(rate), int(target_rate))
+    return resample_poly(audio, target_rate // g, int(rate) // g).astype(np.float32, copy=False)
+
+
+def normalize(audio, target_peak=TARGET_PEAK):
+    """Scale in place so the loudest sample hits target_peak."""
+    peak = max(float(audio.max()), -float(audio.min())) if audio.size else 0.0  # no abs() copy
+    if peak > 0:
+        audio *= target_peak / peak
+    return audio
+
+
+def speech_bounds(audio, rate=TARGET_RATE, silence_db=SILENCE_DB, frame_ms=FRAME_MS, padding_ms=PADDING_MS):
+    """
+    (start, end) sample indices of the speech in audio, padded.
+    Uses per-frame RMS computed in one reshape (row dot products, so no squared
+    copy of the audio); returns (0, 0) for pure silence.
+    """
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return 0, len(audio)
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    peak = rms.max()
+    if peak <= 0:
+        return 0, 0
+
+    voiced = np.flatnonzero(rms > peak * 10 ** (silence_db / 20.0))
+    pad = int(rate * padding_ms / 1000)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(audio), (voiced[-1] + 1) * frame + pad)
+    return start, end
+
+
+class Preprocessor:
+    """
+    Keeps float32 work buffers (the converted input and its mono downmix) and
+    reuses them for every utterance, so 16 kHz audio - everything the
+    microphone records - is processed without allocating a new array per turn.
+    Other rates also pay for one resampled copy (see resample). The returned
+    array is a view into a shared buffer: use it (transcribe it) before the
+    next call.
+    """
+
+    def __init__(self, target_rate=TARGET_RATE):
+        self.target_rate = target_rate
+        self._buffer = np.empty(0, dtype=np.float32)
+        self._mono = np.empty(0, dtype=np.float32)
+
+    def _work(self, n):
+        if len(self._buffer) < n:
+            self._buffer = np.empty(n, dtype=np.float32)
+        return self._buffer[:n]
+
+    def _mono_work(self, n):
+        if len(self._mono) < n:
+            self._mono = np.empty(n, dtype=np.float32)
+        return self._mono[:n]
+
+    def process(self, audio, rate):
+        """Any-rate, any-channel PCM array -> trimmed, normalized float32 at target_rate."""
+        audio = np.asarray(audio)
+        audio = to_float32(audio, out=self._work(audio.size).reshape(audio.shape))
+        if audio.ndim > 1:
+            audio = to_mono(audio, out=self._mono_work(audio.shape[0]))
+        audio = resample(audio, rate, self.target_rate)
+        start, end = speech_bounds(audio, self.target_rate)
+        audio = audio[start:end]
+        return normalize(audio)
+
+    def load(self, path):
+        """Read and preprocess a WAV file."""
+        import scipy.io.wavfile as wav
+        rate, data = wav.read(path)
+        return self.process(data, rate)
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+import scipy.io.wavfile as wav
+
+import speech_module
+from audio_preprocess import Preprocessor
+from replay import collect_wavs
+
+# Whisper decode time with and without the preprocessing stage, per file.
+#
+#   python bench_preprocess.py test_audio --runs 3
+#   python bench_preprocess.py test_audio --no-decode   # preprocessing only, no model needed
+
+
+def decode(model, audio):
+    segments, info = model.transcribe(audio, beam_size=5)
+    return " ".join(segment.text for segment in segments).strip()
+
+
+def best_of(runs, fn):
+    best, result = float("inf"), None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Whisper decode time on raw vs preprocessed audio.")
+    parser.add_argument("paths", nargs="*", default=["test_audio"], help="WAV files or folders")
+    parser.add_argument("--runs", type=int, default=1, help="Best of N decodes per file")
+    parser.add_argument("--no-decode", action="store_true", help="Only time the preprocessing (no Whisper model)")
+    args = parser.parse_args()
+
+    files = collect_wavs(args.paths)
+    if not files:
+        print("No .wav files found.")
+        sys.exit(1)
+
+    preprocessor = Preprocessor()
+    if args.no_decode:
+        total_audio = total_trimmed = total_prep = 0.0
+        print(f"{'file':<40}{'audio s':>9}{'trim s':>8}{'prep ms':>9}")
+        for path in files:
+            rate, data = wav.read(path)
+            prep_time, audio = best_of(args.runs, lambda: preprocessor.load(path))
+            trimmed_seconds = len(audio) / preprocessor.target_rate
+            total_audio += len(data) / rate
+            total_trimmed += trimmed_seconds
+            total_prep += prep_time
+            print(f"{os.path.basename(path)[:38]:<40}{len(data) / rate:>9.2f}{trimmed_seconds:>8.2f}{prep_time * 1000:>9.2f}")
+        print("-" * 66)
+        print(f"{'total':<40}{total_audio:>9.2f}{total_trimmed:>8.2f}{total_prep * 1000:>9.2f}")
+        sys.exit(0)
+
+    model = speech_module.get_model()
+    decode(model, files[0])  # warm-up
+
+    totals = {"raw_audio": 0.0, "trimmed_audio": 0.0, "raw": 0.0, "pre": 0.0, "prep": 0.0}
+    print(f"{'file':<40}{'audio s':>9}{'trim s':>8}{'raw ms':>9}{'prep ms':>9}{'pre ms':>9}{'speedup':>9}")
+    for path in files:
+        rate, data = wav.read(path)
+        raw_seconds = len(data) / rate
+
+        raw_time, raw_text = best_of(args.runs, lambda: decode(model, path))
+        prep_time, audio = best_of(args.runs, lambda: preprocessor.load(path))
+        pre_time, pre_text = best_of(args.runs, lambda: decode(model, preprocessor.load(path)))
+        trimmed_seconds = len(audio) / preprocessor.target_rate
+
+        totals["raw_audio"] += raw_seconds
+        totals["trimmed_audio"] += trimmed_seconds
+        totals["raw"] += raw_time
+        totals["pre"] += pre_time
+        totals["prep"] += prep_time
+
+        name = os.path.basename(path)[:38]
+        print(f"{name:<40}{raw_seconds:>9.2f}{trimmed_seconds:>8.2f}{raw_time * 1000:>9.0f}"
+              f"{prep_time * 1000:>9.1f}{pre_time * 1000:>9.0f}{raw_time / pre_time:>8.2f}x")
+        if raw_text.lower() != pre_text.lower():
+            print(f"    raw: {raw_text}\n    pre: {pre_text}")
+
+    print("-" * 93)
+    print(f"{'total':<40}{totals['raw_audio']:>9.2f}{totals['trimmed_audio']:>8.2f}{totals['raw'] * 1000:>9.0f}"
+          f"{totals['prep'] * 1000:>9.1f}{totals['pre'] * 1000:>9.0f}{totals['raw'] / totals['pre']:>8.2f}x")
+    print("(pre ms includes preprocessing)")
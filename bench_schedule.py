@@ -0,0 +1,93 @@
+import argparse
+import datetime
+import random
+import time
+
+from models import Appointment
+from schedule import ScheduleIndex, parse_time
+
+# ScheduleIndex against a plain linear scan over the event list, on a large
+# synthetic calendar. Checks that both give the same answers.
+#
+#   python bench_schedule.py --events 10000 --queries 2000
+
+
+def make_events(count, seed=0):
+    rng = random.Random(seed)
+    base = datetime.datetime.combine(datetime.date.today(), datetime.time(8, 0)) - datetime.timedelta(days=180)
+    events = []
+    for i in range(count):
+        start = base + datetime.timedelta(days=rng.randrange(365), minutes=15 * rng.randrange(48))
+        end = start + datetime.timedelta(minutes=15 * rng.randint(1, 12))
+        events.append(Appointment(id=i, title=f"event {i}",
+                                  start_time=start.isoformat(timespec="minutes"),
+                                  end_time=end.isoformat(timespec="minutes")))
+    return events
+
+
+def linear_between(events, start, end):
+    found = []
+    for event in events:
+        s = parse_time(event.start_time)
+        e = parse_time(event.end_time)
+        if s < end and e > start:
+            found.append((s, e, event))
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def linear_next_after(events, moment):
+    best = None
+    for event in events:
+        s = parse_time(event.start_time)
+        if s >= moment and (best is None or s < best[0]):
+            best = (s, parse_time(event.end_time), event)
+    return best
+
+
+def timed(fn, queries):
+    t0 = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - t0) / len(queries), results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark schedule queries: interval index vs linear scan.")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.seed)
+    rng = random.Random(args.seed + 1)
+    today = datetime.date.today()
+    days = [today + datetime.timedelta(days=rng.randrange(-180, 185)) for _ in range(args.queries)]
+    moments = [datetime.datetime.combine(d, datetime.time(rng.randrange(24))) for d in days]
+    slots = [(m, m + datetime.timedelta(hours=1)) for m in moments]
+
+    t0 = time.perf_counter()
+    index = ScheduleIndex(events)
+    build = time.perf_counter() - t0
+    print(f"{args.events} events, index built in {build * 1000:.1f} ms")
+
+    day_range = lambda d: (datetime.datetime.combine(d, datetime.time.min),
+                           datetime.datetime.combine(d + datetime.timedelta(days=1), datetime.time.min))
+    cases = [
+        ("day range", days, lambda d: index.between(*day_range(d)), lambda d: linear_between(events, *day_range(d))),
+        ("next after", moments, index.next_after, lambda m: linear_next_after(events, m)),
+        ("conflicts", slots, lambda s: index.conflicts(*s), lambda s: linear_between(events, *s)),
+    ]
+
+    print(f"{'query':<12}{'index us':>10}{'linear us':>11}{'speedup':>9}")
+    for name, queries, indexed, linear in cases:
+        fast, fast_results = timed(indexed, queries)
+        slow, slow_results = timed(linear, queries[:max(1, len(queries) // 10)])  # the scan is slow
+        for got, want in zip(fast_results, slow_results):
+            if name == "next after":
+                assert (got and got[0]) == (want and want[0]), name
+            else:
+                assert sorted(e.id for _, _, e in got) == sorted(e.id for _, _, e in want), name
+        print(f"{name:<12}{fast * 1e6:>10.1f}{slow * 1e6:>11.1f}{slow / fast:>8.0f}x")
+
+    free, _ = timed(index.free_slots, days)
+    print(f"{'free slots':<12}{free * 1e6:>10.1f}")
@@ -0,0 +1,89 @@
+import argparse
+import threading
+import time
+
+import speech_module
+
+# Time-to-first-audio of long answers: the whole text synthesized before
+# playback (the old speak()) against speak_stream's sentence pipeline.
+# By default a simulated engine is used (synthesis and playback time
+# proportional to the text length); --real uses pyttsx3 + sounddevice.
+#
+#   python bench_speech.py
+#   python bench_speech.py --real --cancel-after 2
+
+
+FORECAST = ("Here is the weather in Marburg starting monday for the next 7 days:\n"
+            + "".join(f"• {day}: light rain, 4 to 11 degrees.\n"
+                      for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]))
+LISTING = ("You have 23 appointments: 1. Dentist, 2. Team meeting (every Monday), 3. Lunch with Anna, "
+           "4. Gym, 5. Parents evening. Say next page for more.")
+
+
+class SimulatedSink:
+    """Synthesis costs synth_rate seconds per character, playback speech_rate; nothing is played."""
+
+    def __init__(self, synth_rate=0.002, speech_rate=0.012):
+        self.synth_rate = synth_rate
+        self.speech_rate = speech_rate
+        self.started = None
+        self._stop = threading.Event()
+
+    def speak(self, text):
+        time.sleep(len(text) * self.synth_rate)
+        self.started = time.perf_counter()
+        self._stop.wait(len(text) * self.speech_rate)
+
+    def synthesize(self, text):
+        time.sleep(len(text) * self.synth_rate)
+        return text, 1
+
+    def play(self, clip):
+        self._stop.clear()
+        if self.started is None:
+            self.started = time.perf_counter()
+        return len(clip[0]) * self.speech_rate
+
+    def wait(self):
+        pass
+
+    def stop(self):
+        self._stop.set()
+
+
+def first_audio_whole(sink, text):
+    """Seconds until playback starts when the whole text is synthesized first (speak())."""
+    if not hasattr(sink, "started"):
+        t0 = time.perf_counter()
+        sink.synthesize(text)  # the old path had to render everything before the first sound
+        return time.perf_counter() - t0
+    sink.started = None
+    t0 = time.perf_counter()
+    sink.speak(text)
+    return sink.started - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure time-to-first-audio of long answers.")
+    parser.add_argument("--real", action="store_true", help="Use pyttsx3 and the sound card")
+    parser.add_argument("--cancel-after", type=float, help="Call cancel_speech() after this many seconds")
+    args = parser.parse_args()
+
+    sink = speech_module.Pyttsx3Sink(driver=None) if args.real else SimulatedSink()
+    speech_module.set_audio_backend(sink=sink)
+
+    for name, text in [("forecast", FORECAST), ("listing", LISTING)]:
+        whole = first_audio_whole(sink, text)
+        timer = None
+        if args.cancel_after is not None:
+            timer = threading.Timer(args.cancel_after, speech_module.cancel_speech)
+            timer.start()
+        t0 = time.perf_counter()
+        speech_module.speak_stream(text)
+        total = time.perf_counter() - t0
+        if timer: timer.cancel()
+        stats = speech_module.last_speech
+        print(f"{name:<9} {len(text):4d} chars  first audio: whole {whole * 1000:6.0f} ms, "
+              f"streamed {stats['first_audio'] * 1000:6.0f} ms  "
+              f"({stats['spoken']}/{stats['chunks']} chunks{', cancelled' if stats['cancelled'] else ''}, "
+              f"{total:.1f}s total)")
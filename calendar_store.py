@@ -0,0 +1,228 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from models import APPOINTMENT_FIELDS, Appointment
+
+# Local SQLite copy of the calendar. api_client refreshes it after every
+# successful fetch and serves it when calendar.php is slow or unreachable.
+
+# --- CONFIGURATION ---
+MIRROR_FILE = "calendar_mirror.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    pos INTEGER PRIMARY KEY,      -- order the server returned
+    id,                           -- server ID, kept with its original type
+    title TEXT,
+    description TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    location TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_title ON appointments(title COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+class CalendarMirror:
+    """
+    Embedded mirror of the server calendar (one row per appointment) plus
+    the sync bookkeeping: last successful sync, last attempt, last error.
+    last_error is only set while calendar.php can't be reached at all; a
+    server that answers with an error is recorded as server_error instead.
+    """
+
+    def __init__(self, path=MIRROR_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self.version = None  # digest of the content of the last fetch (see replace_all)
+        self._listing = (None, None)  # (version, appointments()) so the list is built once per version
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+
+    # --- SYNC ---
+
+    def replace_all(self, events):
+        """
+        Store a full, successful server fetch. events may be a lazy iterator:
+        rows are inserted as they come, and if it raises the old copy is kept.
+        self.version becomes a digest of the content, so it only changes when
+        the calendar did (cached replies stay valid across identical fetches).
+        """
+        digest = hashlib.blake2b(digest_size=16)
+
+        def rows():
+            for e in events:
+                row = tuple(e.get(c) for c in APPOINTMENT_FIELDS)
+                digest.update(repr(row).encode())
+                yield row
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM appointments")
+            self._conn.executemany(
+                "INSERT INTO appointments (id, title, description, start_time, end_time, location) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows())
+            now = time.time()
+            self._set_many({"last_sync": now, "last_attempt": now, "last_error": None, "server_error": None,
+                            "dirty": 0})
+            self.version = digest.hexdigest()
+
+    def mark_failed(self, error):
+        """Record that calendar.php could not be reached; reads keep being served from the mirror."""
+        with self._lock, self._conn:
+            self._set_many({"last_attempt": time.time(), "last_error": str(error)})
+
+    def mark_rejected(self, error):
+        """
+        calendar.php answered, but with an error (e.g. HTTP 500): it is
+        reachable, so this is not offline, but the mirror was not refreshed.
+        """
+        with self._lock, self._conn:
+            self._set_many({"last_attempt": time.time(), "last_error": None, "server_error": str(error)})
+
+    def mark_written(self):
+        """
+        A write reached the server: it is reachable again, but the mirror
+        no longer matches it until the next full fetch.
+        """
+        with self._lock, self._conn:
+            self._set_many({"last_error": None, "server_error": None, "dirty": 1})
+
+    def _set_many(self, values):
+        self._conn.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                               list(values.items()))
+
+    def _get(self, key):
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync_status(self):
+        """
+        {"last_sync": epoch or None, "last_attempt": ..., "last_error": str or None,
+         "server_error": str or None, "online": bool, "count": int}
+        """
+        with self._lock:
+            status = {key: self._get(key) for key in ("last_sync", "last_attempt", "last_error", "server_error")}
+            status["count"] = self._conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+        status["online"] = status["last_error"] is None and status["last_sync"] is not None
+        return status
+
+    def is_fresh(self, max_age):
+        """True if the last successful sync is younger than max_age seconds."""
+        status = self.sync_status()
+        with self._lock:
+            dirty = self._get("dirty")
+        return status["online"] and not dirty and time.time() - status["last_sync"] < max_age
+
+    def is_offline(self):
+        """True if calendar.php could not be reached on the most recent attempt."""
+        with self._lock:
+            return self._get("last_error") is not None
+
+    def seconds_since_attempt(self):
+        with self._lock:
+            last = self._get("last_attempt")
+        return float("inf") if last is None else time.time() - last
+
+    # --- READS ---
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def appointments(self):
+        """
+        All appointments, in server order. Built once per version and shared
+        until the calendar changes, so it's a tuple: copy it to change it.
+        """
+        with self._lock:
+            version, events = self._listing
+            if events is None or version != self.version:
+                rows = self._conn.execute("SELECT * FROM appointments ORDER BY pos")
+                events = tuple(_appointment(dict(row)) for row in rows)
+                self._listing = (self.version, events)
+            return events
+
+    def find(self, **fields):
+        """First appointment (server order) with exactly these column values, e.g. find(id=7); None if none."""
+        unknown = set(fields) - set(APPOINTMENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown appointment fields: {', '.join(sorted(unknown))}")
+        where = " AND ".join(f"{column} IS ?" for column in fields)
+        rows = self._rows(f"SELECT * FROM appointments WHERE {where} ORDER BY pos LIMIT 1", tuple(fields.values()))
+        return _appointment(rows[0]) if rows else None
+
+    def contains(self, **fields):
+        """True if an appointment has exactly these column values, e.g. contains(id=7)."""
+        return self.find(**fields) is not None
+
+    def count(self):
+        """Number of appointments with a title (the ones a listing shows)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM appointments WHERE trim(coalesce(title, '')) != ''").fetchone()[0]
+
+    def page(self, offset, limit):
+        """One page of titled appointments in server order, read on demand."""
+        return [_appointment(r) for r in self._rows(
+            "SELECT * FROM appointments WHERE trim(coalesce(title, '')) != '' ORDER BY pos LIMIT ? OFFSET ?",
+            (limit, offset))]
+
+    def find_by_title(self, title):
+        """Exact (case-insensitive) title match first, then partial."""
+        rows = self._rows("SELECT * FROM appointments WHERE title = ? COLLATE NOCASE ORDER BY pos LIMIT 1", (title,))
+        if not rows:
+            rows = self._rows("SELECT * FROM appointments WHERE title LIKE ? ORDER BY pos LIMIT 1", (f"%{title}%",))
+        return _appointment(rows[0]) if rows else None
+
+
+def _appointment(row):
+    return Appointment.from_json(row)
+
+
+def apply_pending(events, entries):
+    """
+    Overlay journaled but unsent outbox writes on a list of Appointments,
+    so reads already reflect what the user asked for. The input list is not changed.
+    """
+    events = list(events)
+    for entry in entries:
+        args = entry["args"]
+        if entry["op"] == "create":
+            events.append(Appointment.from_json(dict(args, id=None)))
+            continue
+
+        journaled = args.get("event")  # the appointment's fields (see outbox.py)
+        if journaled is not None:
+            target = None
+            if journaled.get("id") is not None:
+                target = next((i for i, e in enumerate(events) if e.id == journaled["id"]), None)
+            if target is None:  # replaced under a new id by an earlier write, or not created yet when queued
+                fields = [f for f in APPOINTMENT_FIELDS if f != "id"]
+                target = next((i for i, e in enumerate(events)
+                               if all(getattr(e, f) == journaled.get(f) for f in fields)), None)
+        elif args.get("event_id") is not None:
+            target = next((i for i, e in enumerate(events) if e.id == args["event_id"]), None)
+        else:
+            title = (args.get("title") or args.get("old_title") or "").lower()
+            target = next((i for i, e in enumerate(events) if (e.title or "").lower() == title), None)
+            if target is None:
+                target = next((i for i, e in enumerate(events) if title in (e.title or "").lower()), None)
+        if target is None:
+            continue
+
+        if entry["op"] == "delete":
+            del events[target]
+        elif entry["op"] == "modify":
+            changes = {field: args[key] for field, key in (("title", "new_title"), ("location", "new_location"),
+                                                           ("start_time", "new_date"), ("end_time", "new_end_date"))
+                       if args.get(key) is not None}
+            events[target] = events[target].replace(**changes)
+    return events
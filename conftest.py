@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def stub_calendar(tmp_path, monkeypatch):
+    """main and api_client running against the load generator's stub backend: (main, backend)."""
+    import api_client
+    import load_generator
+    import main
+
+    for module, names in ((api_client, ("requests", "time", "mirror")),
+                          (main, ("time", "calendar_mirror", "calendar_outbox", "text_input", "echo_input",
+                                  "schedule_cache", "title_index_version"))):
+        for name in names:
+            monkeypatch.setattr(module, name, getattr(module, name))
+    main, backend = load_generator.install_stubs(str(tmp_path))
+    main.schedule_cache = {}
+    main.text_input = iter([])
+    yield main, backend
+    main.calendar_outbox.flush(timeout=5)
+
+
+@pytest.fixture
+def assistant(stub_calendar, monkeypatch):
+    """ask(text) -> what the assistant answered to that command."""
+    main, _ = stub_calendar
+    replies = []
+    monkeypatch.setattr(main, "log_response", replies.append)
+
+    def ask(text):
+        replies.clear()
+        main.handle_command(text)
+        return list(replies)
+
+    return ask
@@ -0,0 +1,328 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Synthetic load for the text command pipeline: generates varied utterances
+# from templates (including Whisper-style misspellings), runs them through
+# main.handle_command against an in-memory calendar.php / weather.php and
+# reports throughput, per-intent latency, allocations and misrouted commands.
+#
+#   python load_generator.py --count 5000
+#   python load_generator.py --count 500 --dump corpus.txt   (for main.py --file)
+
+CITIES = ["berlin", "marburg", "frankfurt", "munich", "hamburg", "cologne", "giessen", "kassel"]
+TITLES = ["dentist", "homework", "team sync", "gym", "lunch with anna", "doctor", "exam", "haircut"]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+ORDINAL_WORDS = ["first", "second", "third", "fourth", "fifth"]
+DAY_ORDINALS = ["1st", "2nd", "3rd", "4th", "5th", "12th", "15th", "20th", "first", "second", "third", "tenth"]
+CONDITIONS = ["rain", "snow", "sunny", "cloudy", "thunder", "clear"]
+NUMBER_WORDS = ["two", "three", "four", "five", "2", "3", "4"]
+
+# Misrecognitions the pipeline is expected to cope with
+WEATHER_WORDS = ["weather", "weather", "weather", "wether"]
+APPOINTMENT_WORDS = ["appointment", "appointment", "meeting", "event", "reminder", "remainder"]
+HISTORY_WORDS = ["history", "histry", "estory", "conversation"]
+
+TEMPLATES = {
+    "weather": [
+        "{weather} in {city} {day}",
+        "what's the {weather} in {city} {day}",
+        "will it {condition} in {city} {day}",
+        "{weather} in {city} for next {number} days",
+        "{weather} in {city}, {city2} and {city3} {day}",
+        "how is the {weather} in {city} on {weekday}",
+    ],
+    "create": [
+        "create an {appointment} {title} {day} at {hour}",
+        "add an {appointment} called {title} on the {day_ordinal} of {month} at {hour} p.m.",
+        "create a new {appointment} {title} on {weekday} at {hour} at {city_cap}",
+        "schedule {title} for {day} at {hour} a.m.",
+        "{title} every {weekday} at {hour} p.m.",
+        "create an {appointment} {title} every day at {hour}",
+    ],
+    "delete": [
+        "delete the {ordinal} {appointment}",
+        "cancel the last {appointment}",
+        "delete the {appointment} titled {title}",
+        "remove the previous {appointment}",
+    ],
+    "modify": [
+        "change the location of the previous {appointment} to {city}",
+        "change the {appointment} title to {title} and location to {city}",
+        "change the {appointment} time to {hour} pm",
+        "change the date of the {appointment} to {weekday}",
+    ],
+    "list": [
+        "display all the {appointment}s",
+        "when is my next {appointment}",
+        "where is my next {appointment}",
+        "show my calendar",
+    ],
+    "history": [
+        "show the conversation {history}",
+        "{history}",
+    ],
+}
+
+INTENT_WEIGHTS = {"weather": 35, "create": 20, "delete": 10, "modify": 15, "list": 15, "history": 5}
+
+# Answers for follow-up questions ("What is the new location?")
+FOLLOW_UPS = ["Frankfurt", "Dentist", "tomorrow", "5 pm", "Berlin"]
+
+
+def generate_corpus(count, seed=0):
+    """Returns [(intent, utterance), ...]."""
+    rng = random.Random(seed)
+    intents = list(INTENT_WEIGHTS)
+    weights = [INTENT_WEIGHTS[i] for i in intents]
+    corpus = []
+    for intent in rng.choices(intents, weights=weights, k=count):
+        city, city2, city3 = rng.sample(CITIES, 3)
+        slots = {
+            "weather": rng.choice(WEATHER_WORDS),
+            "appointment": rng.choice(APPOINTMENT_WORDS),
+            "history": rng.choice(HISTORY_WORDS),
+            "city": city, "city2": city2, "city3": city3, "city_cap": city.capitalize(),
+            "day": rng.choice(["today", "tomorrow", "day after tomorrow"]),
+            "weekday": rng.choice(WEEKDAYS),
+            "month": rng.choice(MONTHS),
+            "condition": rng.choice(CONDITIONS),
+            "number": rng.choice(NUMBER_WORDS),
+            "title": rng.choice(TITLES),
+            "ordinal": rng.choice(ORDINAL_WORDS),
+            "day_ordinal": rng.choice(DAY_ORDINALS),
+            "hour": rng.randint(1, 12),
+        }
+        corpus.append((intent, rng.choice(TEMPLATES[intent]).format(**slots)))
+    return corpus
+
+
+def classify_response(responses):
+    """Which branch of handle_command answered, judged by what it said."""
+    text = " ".join(responses)
+    if not text:
+        return "none"
+    if "didn't understand" in text:
+        return "unknown"
+    if "weather" in text.lower() or text.startswith(("Yes, on", "No, on")) or "location" in text and "tell me" in text:
+        return "weather"
+    if "conversation" in text or "history" in text:
+        return "history"
+    if text.startswith("Adding appointment"):
+        return "create"
+    if "Deleting" in text or "Which appointment should I delete" in text or "Could not find that" in text \
+            or "You only have" in text or "Should I delete" in text:
+        return "delete"
+    if "Changing" in text or "Moving" in text or "What is the new" in text or "what to change" in text \
+            or "already" in text or "Adding location" in text or "Removing location" in text:
+        return "modify"
+    if "You have" in text or "Your next appointment" in text:
+        return "list"
+    return "other"
+
+
+# --- STUB BACKEND ---
+
+class StubResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    def close(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        body = json.dumps(self._payload).encode("utf-8")
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+
+class StubBackend:
+    """
+    In-memory stand-in for the requests module as used by api_client:
+    calendar.php (GET/POST/DELETE) and weather.php (POST), answering instantly.
+    """
+    RequestException = IOError
+    ConnectionError = ConnectionError
+    Timeout = TimeoutError
+
+    def __init__(self):
+        self.events = []
+        self.next_id = 1
+        self.calls = 0
+        today = datetime.date.today()
+        self.days = [WEEKDAYS[(today.weekday() + i) % 7] for i in range(7)]
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        self.calls += 1
+        return StubResponse(200, [dict(e) for e in self.events])
+
+    def post(self, url, data=None, params=None, headers=None, json=None, timeout=None):
+        self.calls += 1
+        if data and "place" in data:
+            rng = random.Random(data["place"])
+            forecast = [{"day": day, "weather": rng.choice(["clear sky", "rain", "snow", "few clouds", "mist"]),
+                         "temperature": {"min": rng.randint(-5, 10), "max": rng.randint(11, 25)}}
+                        for day in self.days]
+            return StubResponse(200, {"place": data["place"], "forecast": forecast})
+        self.events.append(dict(json, id=self.next_id))
+        self.next_id += 1
+        return StubResponse(200)
+
+    def delete(self, url, params=None, timeout=None):
+        self.calls += 1
+        before = len(self.events)
+        self.events = [e for e in self.events if e["id"] != params["id"]]
+        return StubResponse(200 if len(self.events) < before else 404)
+
+
+class _InstantTime:
+    """time module without sleeps: the stub server needs no sync waits."""
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    @staticmethod
+    def sleep(seconds):
+        pass
+
+
+def install_stubs(workdir):
+    """Point main/api_client at the stub backend and throwaway local state."""
+    import api_client
+    import main
+    from calendar_store import CalendarMirror
+    from outbox import CalendarOutbox
+
+    backend = StubBackend()
+    api_client.requests = backend
+    api_client.time = _InstantTime()
+    main.time = _InstantTime()
+    api_client.mirror = main.calendar_mirror = CalendarMirror(os.path.join(workdir, "mirror.db"))
+    main.calendar_outbox = CalendarOutbox(os.path.join(workdir, "outbox.json"), retry_delay=0.0)
+    main.response_cache.clear()
+    api_client._forecasts.clear()
+    main.text_input = itertools.cycle(FOLLOW_UPS)
+    main.echo_input = False
+    return main, backend
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_load(corpus, track_allocations=False):
+    workdir = tempfile.mkdtemp(prefix="va_load_")
+    main, backend = install_stubs(workdir)
+
+    responses = []
+    main.log_response = responses.append
+
+    latencies = {}
+    allocations = {}
+    misroutes = []
+    devnull = open(os.devnull, "w")
+
+    if track_allocations:
+        tracemalloc.start()
+
+    real_stdout = sys.stdout
+    start = time.perf_counter()
+    try:
+        sys.stdout = devnull
+        for intent, text in corpus:
+            responses.clear()
+            blocks_before = sys.getallocatedblocks()
+            if track_allocations:
+                tracemalloc.reset_peak()
+                mem_before = tracemalloc.get_traced_memory()[0]
+
+            t0 = time.perf_counter()
+            main.handle_command(text)
+            elapsed = time.perf_counter() - t0
+
+            latencies.setdefault(intent, []).append(elapsed)
+            stats = allocations.setdefault(intent, {"blocks": 0, "peak": 0, "fetches": 0})
+            stats["blocks"] += sys.getallocatedblocks() - blocks_before
+            stats["fetches"] += main.conversation_history[-1].get("fetches", 0)
+            if track_allocations:
+                stats["peak"] = max(stats["peak"], tracemalloc.get_traced_memory()[1] - mem_before)
+
+            routed = classify_response(responses)
+            if routed != intent:
+                misroutes.append((intent, routed, text))
+            del main.conversation_history[:-50]  # keep the history command cheap and memory flat
+        main.calendar_outbox.flush(timeout=30)
+    finally:
+        sys.stdout = real_stdout
+        devnull.close()
+        if track_allocations:
+            tracemalloc.stop()
+    total = time.perf_counter() - start
+
+    return {"total": total, "latencies": latencies, "allocations": allocations,
+            "misroutes": misroutes, "backend_calls": backend.calls, "events_left": len(backend.events),
+            "cache": main.response_cache.stats()}
+
+
+def print_report(corpus, result, show_misroutes=10, track_allocations=False):
+    count = len(corpus)
+    print("=" * 78)
+    print(f"{count} commands in {result['total']:.2f}s  ->  {count / result['total']:.1f} commands/sec")
+    print(f"Backend calls: {result['backend_calls']}, events left in stub calendar: {result['events_left']}")
+    cache = result["cache"]
+    print(f"Response cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries, "
+          f"{cache['saved_ms']:.1f} ms of reply building saved")
+    print("-" * 78)
+    header = f"{'intent':<10}{'n':>6}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'net blocks':>12}{'fetches':>9}"
+    if track_allocations:
+        header += f"{'peak KiB':>10}"
+    print(header)
+    for intent, values in sorted(result["latencies"].items()):
+        ms = [v * 1000 for v in values]
+        alloc = result["allocations"][intent]
+        line = (f"{intent:<10}{len(ms):>6}{sum(ms) / len(ms):>10.2f}{percentile(ms, 50):>9.2f}"
+                f"{percentile(ms, 95):>9.2f}{max(ms):>9.2f}{alloc['blocks'] / len(ms):>12.1f}"
+                f"{alloc['fetches'] / len(ms):>9.2f}")
+        if track_allocations:
+            line += f"{alloc['peak'] / 1024:>10.1f}"
+        print(line)
+    print("-" * 78)
+
+    misroutes = result["misroutes"]
+    print(f"Routing: {count - len(misroutes)}/{count} as expected ({100.0 * (count - len(misroutes)) / count:.1f}%)")
+    for expected, routed, text in misroutes[:show_misroutes]:
+        print(f"  expected {expected:<8} got {routed:<8} <- \"{text}\"")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic load test for handle_command.")
+    parser.add_argument("--count", type=int, default=2000, help="Number of utterances")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alloc", action="store_true", help="Also track peak memory per command (slower)")
+    parser.add_argument("--show-misroutes", type=int, default=10)
+    parser.add_argument("--dump", help="Only write the corpus to this file (one utterance per line)")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.count, args.seed)
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            f.writelines(text + "\n" for _, text in corpus)
+        print(f"Wrote {len(corpus)} utterances to {args.dump}")
+        sys.exit(0)
+
+    result = run_load(corpus, track_allocations=args.alloc)
+    print_report(corpus, result, args.show_misroutes, args.alloc)
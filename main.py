@@ -1,20 +1,71 @@
-from speech_module import record_audio, transcribe_audio, speak_text as _speak_text
-from api_client import get_weather_forecast, get_appointments, create_appointment, delete_appointment, modify_appointment, delete_all_appointments
+from api_client import get_weather_forecasts, get_appointments, sync_appointments, delete_all_appointments, mirror as calendar_mirror, \
+    begin_command, end_command
+from calendar_store import apply_pending
+from recurrence import HORIZON, describe as describe_recurrence, expand, finish_rule, first_start, format_rule, \
+    parse_recurrence, strip_recurrence
+from schedule import DAY_START, DEFAULT_DURATION, ScheduleIndex, parse_time, week_range
+from title_index import MIN_SCORE, TitleIndex, title_query
+from outbox import CalendarOutbox, describe as describe_write
+from response_cache import ResponseCache
+import profiling
 import re
 import datetime
 import time
 
+# --- INPUT / OUTPUT ---
+# The audio stack (speech_module: sounddevice, pyttsx3, faster_whisper) is only
+# imported when voice mode actually needs it, so text-only runs never load it.
+text_input = None  # Iterator of typed/scripted utterances in text-only mode
+echo_input = True  # Print utterances read from a file (typed ones are already on screen)
+
+def speech():
+    import speech_module
+    return speech_module
+
 # Wrap speak_text to log responses
 def speak_text(text):
-    _speak_text(text)
+    if text_input is None:
+        speech().speak_text(text)
+    else:
+        print(f"\nAssistant: {text}")
     log_response(text)
 
+def listen(silence_duration=2.5):
+    """
+    Get the user's next utterance: from the microphone in voice mode,
+    from the next input line in text-only mode. Returns "" if nothing was heard.
+    """
+    if text_input is not None:
+        text = next(text_input, "")
+        if text and echo_input: print(f"You: {text}")
+        return text
+    # The recording is handed over as a view of the capture buffer, no WAV file in between
+    audio = speech().record_audio(silence_duration=silence_duration, return_array=True)
+    if audio is None:
+        return ""
+    with profiling.section(len(conversation_history) + 1, "transcribe"):
+        return speech().transcribe_audio(audio)
+
 # --- GLOBAL CONTEXT ---
-last_location = None 
+last_locations = []  # Cities of the last weather query (one or more)
 last_day_index = 0
 last_created_title = None
 conversation_history = []  # NEW: Store full conversation 
 
+# Calendar writes are journaled and sent in the background (see outbox.py)
+calendar_outbox = CalendarOutbox()
+title_index = TitleIndex()  # Fuzzy lookup of spoken appointment titles, kept in step with the calendar
+title_index_version = None  # calendar_version() the index was last synced against
+response_cache = ResponseCache()  # Replies keyed by (intent, slots), valid for one version of their data
+schedule_cache = {}  # titled only? -> (calendar_version(), window start, window end, ScheduleIndex)
+OUTBOX_READ_WAIT = 5.0  # Max seconds a read waits for our own queued writes
+MIRROR_MAX_AGE = 30.0   # Read-only commands reuse the local calendar mirror if it is this fresh
+PAGE_SIZE = 5           # Appointments read out per page of "display all"
+SCHEDULE_WINDOW = datetime.timedelta(days=15)  # Cached schedule index: today until the end of next week
+listing_pages = None    # Remaining pages of the current listing, for "next page"
+listing_total = 0
+listing_shown = 0
+
 # --- MAPPINGS & TRIGGERS ---
 CONDITION_MAPPING = {
     "thunder": "thunderstorm", "storm": "thunderstorm", "lightning": "thunderstorm",
@@ -59,9 +110,10 @@ def parse_appointment_details(text):
     relative_dates = ["tomorrow", "today", "next"]
     weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
     
-    month_num = today.month
-    day_num = today.day + 1
-    year = today.year
+    tomorrow = today + datetime.timedelta(days=1)  # the default day, also across month ends
+    month_num = tomorrow.month
+    day_num = tomorrow.day
+    year = tomorrow.year
     
     # Check for specific date triggers in the whole text
     has_date_keywords = False
@@ -133,7 +185,13 @@ def parse_appointment_details(text):
             hour_num = 10
 
     start_time = f"{year}-{month_num:02d}-{day_num:02d}T{hour_num:02d}:00"
-    end_time = f"{year}-{month_num:02d}-{day_num:02d}T{hour_num+1:02d}:00"
+    try:
+        # One hour later, into the next day for "at 11 pm"
+        end = datetime.datetime(year, month_num, day_num, hour_num) + datetime.timedelta(hours=1)
+        end_time = f"{end:%Y-%m-%dT%H:%M}"
+    except ValueError:
+        # Not a real date ("february 30"); callers find out through parse_time
+        end_time = f"{year}-{month_num:02d}-{day_num:02d}T{hour_num+1:02d}:00"
 
     # 2. Extract Title and Location
     location = "Not specified"
@@ -202,54 +260,97 @@ def parse_appointment_details(text):
 
     return clean_title, start_time, end_time, location
 
-def parse_target_day_index(user_text, forecast_list, current_index):
+def parse_target_day_index(user_text, forecast, current_index):
     user_text = user_text.lower()
     if "yesterday" in user_text: return -1
     elif "day after tomorrow" in user_text: return 2
     elif "tomorrow" in user_text: return 1
     elif "today" in user_text: return 0
-    for i, entry in enumerate(forecast_list):
-        if entry.get('day', '').lower() in user_text: return i
+    for word in re.findall(r"[a-z]+", user_text):
+        if word in forecast.day_index: return forecast.day_index[word]
     if "next" in user_text and "days" in user_text: return 0
     return current_index
 
-def get_forecast_summary(forecast_list, user_text, city, start_index):
+def weather_slots(user_text):
+    """
+    What a weather answer depends on besides the forecast and the day:
+    (number of days for "next N days" or None, asked-for condition or None).
+    """
     user_text = text_to_int(user_text.lower())
     match = re.search(r'next (\d+) days', user_text)
     if match:
-        requested_count = int(match.group(1))
-        if start_index >= len(forecast_list): start_index = 0
-        available_days = len(forecast_list) - start_index
-        count = min(requested_count, available_days)
-        msg = f"I can only provide {available_days} days. " if requested_count > available_days else ""
-        response = f"{msg}Here is the weather in {city} starting {forecast_list[start_index].get('day')} for the next {count} days:\n"
-        for i in range(count):
-            day = forecast_list[start_index+i]
-            response += f"• {day.get('day').capitalize()}: {day.get('weather')}, {day.get('temperature',{}).get('min')} to {day.get('temperature',{}).get('max')} degrees.\n"
-        return response
-    
-    if start_index >= len(forecast_list): start_index = 0
-    day = forecast_list[start_index]
-    actual = day.get('weather','').lower()
-    day_name = day.get('day', 'today') 
-    temps = day.get('temperature', {})
-    temp_string = f"with temperatures between {temps.get('min','?')} and {temps.get('max','?')} degrees"
-
+        return int(match.group(1)), None
     asked = None
     for c in API_CONDITIONS: 
         if c in user_text: asked = c; break
     if not asked:
         for k,v in CONDITION_MAPPING.items(): 
             if k in user_text: asked = v; break
-            
+    return None, asked
+
+def get_forecast_summary(forecast, user_text, city, start_index):
+    requested_count, asked = weather_slots(user_text)
+    days = forecast.days
+    if requested_count is not None:
+        if start_index >= len(days): start_index = 0
+        available_days = len(days) - start_index
+        count = min(requested_count, available_days)
+        msg = f"I can only provide {available_days} days. " if requested_count > available_days else ""
+        lines = [f"{msg}Here is the weather in {city} starting {days[start_index].name} for the next {count} days:"]
+        for day in days[start_index:start_index+count]:
+            lines.append(f"• {day.name.capitalize()}: {day.weather}, {day.temp_min} to {day.temp_max} degrees.")
+        return "\n".join(lines) + "\n"
+    
+    if start_index >= len(days): start_index = 0
+    day = days[start_index]
+    actual = day.condition
+    day_name = day.name or 'today'
+    temp_min = '?' if day.temp_min is None else day.temp_min
+    temp_max = '?' if day.temp_max is None else day.temp_max
+    temp_string = f"with temperatures between {temp_min} and {temp_max} degrees"
+
     if asked:
-        match = (asked == actual) or ("rain" in asked and "rain" in actual) or (asked=="sunny" and actual=="clear sky")
-        if match: 
+        if asked in day.conditions: 
             return f"Yes, on {day_name}, it will be {actual} in {city} {temp_string}."
         else: 
             return f"No, on {day_name}, it won't be {asked}, it will be {actual} in {city} {temp_string}."
     
-    return f"The weather in {city} on {day.get('day')} is {actual} {temp_string}."
+    return f"The weather in {city} on {day.name} is {actual} {temp_string}."
+
+def get_multi_city_summary(forecasts, user_text, start_index):
+    """
+    Builds one answer for several cities. forecasts maps city -> Forecast (None if unavailable).
+    Each city's sentence is reused while its forecast is unchanged.
+    """
+    parts = []
+    slots = (start_index,) + weather_slots(user_text)
+    for city, forecast in forecasts.items():
+        if forecast:
+            parts.append(response_cache.get_or_build(
+                "weather", (city,) + slots, forecast.version,
+                lambda: get_forecast_summary(forecast, user_text, city, start_index).rstrip("\n")))
+        else:
+            parts.append(f"I couldn't find weather data for {city}.")
+    return "\n".join(parts)
+
+def parse_cities(words):
+    """
+    Reads one or more cities from the words after "in":
+    "berlin, marburg and frankfurt tomorrow" -> ["Berlin", "Marburg", "Frankfurt"]
+    """
+    stop_words = {"tomorrow", "today", "yesterday", "for", "on", "next", "this", "the", "day", "days"}
+    cities = []
+    for i, word in enumerate(words):
+        if word == "and" and cities:
+            continue
+        city = word.strip(",?.!")
+        if not city or city in stop_words:
+            break
+        cities.append(city.capitalize())
+        # Keep going only while the list continues ("berlin," / "berlin and ...")
+        if not (word.endswith(",") or (i + 1 < len(words) and words[i+1] == "and")):
+            break
+    return cities
 
 def log_response(response_text):
     """Helper to log assistant responses to conversation history"""
@@ -257,8 +358,334 @@ def log_response(response_text):
     if conversation_history:
         conversation_history[-1]["assistant"] = response_text
 
+def current_appointments(max_age=None):
+    """
+    Fetch the calendar after our own queued writes reached the server (bounded wait),
+    so a command never works on a list that misses what the user just said.
+    When the server is unreachable, the local mirror is used with the queued
+    writes applied on top.
+    """
+    wait_for_outbox()
+    events = get_appointments(max_age=max_age)
+    if calendar_outbox.pending():
+        events = apply_pending(events, calendar_outbox.entries())
+    return events
+
+def calendar_version():
+    """Changes whenever what a calendar read would return can have changed."""
+    return calendar_mirror.version, calendar_outbox.version
+
+def wait_for_outbox():
+    if calendar_outbox.pending() and not calendar_mirror.is_offline():
+        calendar_outbox.flush(timeout=OUTBOX_READ_WAIT, through_retries=False)
+
+def mirror_pages(page_size):
+    offset = 0
+    while True:
+        page = calendar_mirror.page(offset, page_size)
+        if not page: return
+        yield page
+        offset += len(page)
+
+def start_listing(page_size=PAGE_SIZE):
+    """
+    "display all": reads out the first page of the (already synced) mirror.
+    Later pages are only fetched when the user says "next page". With writes
+    still queued the overlaid list has to be built in memory instead.
+    """
+    global listing_pages, listing_total, listing_shown
+    if calendar_outbox.pending():
+        events = [e for e in apply_pending(calendar_mirror.appointments(), calendar_outbox.entries())
+                  if e.has_title]
+        listing_total = len(events)
+        listing_pages = (events[i:i + page_size] for i in range(0, len(events), page_size))
+    else:
+        listing_total = calendar_mirror.count()
+        listing_pages = mirror_pages(page_size)
+    listing_shown = 0
+    if listing_total == 0:
+        listing_pages = None
+        speak_text("You have no appointments.")
+        return
+    speak_next_page(first=True)
+
+def speak_next_page(first=False):
+    global listing_pages, listing_shown
+    page = next(listing_pages, None) if listing_pages is not None else None
+    if not page:
+        listing_pages = None
+        speak_text("There are no more appointments.")
+        return
+    shown = listing_shown
+
+    # Print full details to console
+    print(f"\n{'='*60}")
+    print(f"APPOINTMENTS {shown + 1}-{shown + len(page)} of {listing_total}:")
+    print('='*60)
+    for i, evt in enumerate(page, shown + 1):
+        print(f"{i}. {evt.title}")
+        print(f"   Date: {evt.date or 'No date'}")
+        print(f"   Time: {evt.clock or 'No time'}")
+        print(f"   Location: {evt.location or 'No location'}")
+        if evt.rule: print(f"   Repeats: {describe_recurrence(evt.rule, evt.start)}")
+        print()
+    print('='*60)
+    listing_shown = shown + len(page)
+
+    # Speak only count and titles (and how often a series repeats)
+    names = []
+    for evt in page:
+        names.append(f"{evt.title} ({describe_recurrence(evt.rule, evt.start)})" if evt.rule else evt.title)
+    if listing_total == 1:
+        speak_text(f"You have 1 appointment: {names[0]}.")
+        listing_pages = None
+        return
+    titles = ", ".join(f"{i}. {name}" for i, name in enumerate(names, shown + 1))
+    msg = f"You have {listing_total} appointments: {titles}." if first else f"{titles}."
+    if listing_shown < listing_total:
+        msg += " Say next page for more."
+    else:
+        listing_pages = None
+    speak_text(msg)
+
+def format_age(seconds):
+    if seconds < 60: return f"{int(seconds)} seconds"
+    if seconds < 3600: return f"{int(seconds // 60)} minutes"
+    return f"{int(seconds // 3600)} hours"
+
+def describe_sync_status():
+    """Spoken summary of how current the local calendar copy is."""
+    status = calendar_mirror.sync_status()
+    if status["last_sync"] is None:
+        msg = "I have not been able to load your calendar yet."
+    elif status["online"] and status["server_error"]:
+        msg = (f"The calendar server is answering with errors. Your appointments are from "
+               f"{format_age(time.time() - status['last_sync'])} ago and may be out of date.")
+    elif status["online"]:
+        msg = f"Your calendar is in sync, last updated {format_age(time.time() - status['last_sync'])} ago."
+    else:
+        msg = (f"I can't reach the calendar server. Your appointments are from "
+               f"{format_age(time.time() - status['last_sync'])} ago and may be out of date.")
+    queued = calendar_outbox.pending()
+    if queued:
+        msg += f" {queued} changes are waiting to be sent."
+    return msg
+
+FIELD_NAMES = {"title": "title", "name": "title", "location": "location", "place": "location",
+               "date": "date", "day": "date", "time": "time"}
+FIELD_CHANGE_PATTERN = re.compile(
+    r'\b(title|name|location|place|date|day|time)\s+(?:to|as)\s+(.+?)'
+    r'(?=\s*(?:,|\band\b)\s*(?:the\s+)?(?:title|name|location|place|date|day|time)\s+(?:to|as)\b|$)'
+)
+
+def parse_field_changes(text):
+    """
+    "change the title to gym and the location to berlin" -> {"title": "gym", "location": "berlin"}
+    Only explicit "<field> to <value>" pairs are returned.
+    """
+    changes = {}
+    for field, value in FIELD_CHANGE_PATTERN.findall(text):
+        value = value.strip(" .?!,")
+        if value: changes[FIELD_NAMES[field]] = value
+    return changes
+
+def sync_title_index(events):
+    """Bring title_index in line with events, the current calendar; only needed when it changed."""
+    global title_index_version
+    version = calendar_version()
+    if version != title_index_version:
+        title_index.sync(e.title for e in events)
+        title_index_version = version
+
+def match_title(events, title):
+    """
+    (title in events that best matches what was heard, True if it matched exactly).
+    Exact, then partial, then sound-alike ("dennis" -> "Dentist"); (None, False) if nothing is close.
+    """
+    sync_title_index(events)
+    results = title_index.search(title, limit=1)
+    if not results or results[0][0] < MIN_SCORE:
+        return None, False
+    return results[0][1], results[0][0] == 1.0
+
+def find_title(events, title):
+    """Title in events that best matches what was heard, None if nothing is close (see match_title)."""
+    return match_title(events, title)[0]
+
+def confirm(question):
+    """Ask a yes/no question; True only for a clear yes."""
+    speak_text(question)
+    print(">>> Waiting for confirmation...")
+    answer = listen(silence_duration=1.5).lower()
+    return re.search(r"\b(yes|yeah|yep|sure|correct|right|okay|ok|do it)\b", answer) is not None
+
+def delete_matching(events, heard):
+    """
+    Delete the appointment whose title best matches what was heard. A sound-alike
+    or partial match could be a different appointment, so that is confirmed first.
+    """
+    global last_created_title
+    matched_title, exact = match_title(events, heard)
+    if not matched_title:
+        speak_text("Could not find that appointment.")
+    elif exact or confirm(f"Did you mean {matched_title}? Should I delete it?"):
+        queue_delete(events, matched_title)
+        speak_text(f"Deleting appointment: {matched_title}.")
+        if matched_title == last_created_title: last_created_title = None
+    else:
+        speak_text(f"Okay, I won't delete {matched_title}.")
+
+def queue_delete(events, title, event=None):
+    """
+    Journal the deletion of the appointment titled title (or of event), with
+    its fields: the worker finds it by them if its ID is gone by then (see outbox.py).
+    """
+    if event is None:
+        event = next((e for e in events if e.title == title), None)
+    calendar_outbox.submit("delete", title=title, event=event.to_json() if event is not None else None)
+    title_index.remove(title)
+
+def queue_modify(events, title, event=None, **changes):
+    """
+    Journal changes to the appointment titled title. Its fields go into the
+    journal too, so the worker replaces exactly that appointment, even if an
+    earlier queued write gave it a new ID (see outbox.py).
+    """
+    if event is None:
+        event = next((e for e in events if e.title == title), None)
+    calendar_outbox.submit("modify", old_title=title, event=event.to_json() if event is not None else None,
+                           **changes)
+
+def title_in_command(events, text):
+    """Appointment named somewhere in a spoken command ("delete the dentist appointment")."""
+    query = title_query(text)
+    return find_title(events, query) if query else None
+
+def local_appointments():
+    """Mirror plus queued writes, no network: good enough for conflict warnings."""
+    return apply_pending(calendar_mirror.appointments(), calendar_outbox.entries())
+
+def calendar_schedule(start, end, titled=True, cache=True):
+    """
+    ScheduleIndex of the local calendar (see local_appointments) for questions
+    about [start, end); sync first if it should be current. One index from
+    today over SCHEDULE_WINDOW is built per calendar_version() and shared by
+    every question inside that window, so a question is a binary search; a
+    range outside it expands the series just for itself, uncached.
+    titled=True leaves out appointments without a title. cache=False uses a
+    valid cached index but doesn't build one (for a write that is about to
+    change the calendar anyway); without one it indexes only what overlaps
+    [start, end) instead of every appointment.
+    """
+    version = calendar_version()
+    cached = schedule_cache.get(titled)
+    if cached and cached[0] == version and cached[1] <= start and end <= cached[2]:
+        return cached[3]
+    events = local_appointments()
+    if titled:
+        events = [e for e in events if e.has_title]
+    window_start = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+    window_end = window_start + SCHEDULE_WINDOW
+    if not cache:
+        return ScheduleIndex(expand(events, start, end), window=(start, end))
+    if not (window_start <= start and end <= window_end):
+        return ScheduleIndex(expand(events, start, end))
+    schedule = ScheduleIndex(expand(events, window_start, window_end))
+    schedule_cache[titled] = (version, window_start, window_end, schedule)
+    return schedule
+
+READ_WORDS = ["read", "what", "list", "where", "show", "display", "check", "when", "free", "busy"]
+
+DATE_WORDS = ["today", "tomorrow", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+              "january", "february", "march", "april", "may", "june", "july", "august", "september",
+              "october", "november", "december"]
+
+def parse_query_range(text):
+    """
+    Time range a schedule question is about, as (start, end, spoken label), or None:
+    "next week", "this week", or a single day understood by parse_appointment_details.
+    Raises ValueError for a day that doesn't exist ("february 30").
+    """
+    today = datetime.date.today()
+    if "next week" in text:
+        return week_range(today, next_week=True) + ("next week",)
+    if "week" in text:
+        return week_range(today) + ("this week",)
+    if not any(word in DATE_WORDS for word in re.findall(r"[a-z]+", text)):  # whole words: not "maybe"
+        return None
+    _, start_time, _, _ = parse_appointment_details(text)
+    day = datetime.date.fromisoformat(start_time.split('T')[0])
+    start = datetime.datetime.combine(day, datetime.time.min)
+    if day == today: label = "today"
+    elif day == today + datetime.timedelta(days=1): label = "tomorrow"
+    else: label = f"on {day:%A}, {day:%B} {day.day}"
+    return start, start + datetime.timedelta(days=1), label
+
+def describe_range(start, end, label):
+    """Spoken answer to "what's on <day / week>" from the calendar (synced by the caller)."""
+    schedule = calendar_schedule(start, end)
+    if len(schedule) == 0:
+        return "You have no appointments."
+    found = schedule.between(start, end)
+    if not found:
+        return f"You have nothing planned {label}."
+    fmt = "%A at %H:%M" if end - start > datetime.timedelta(days=1) else "%H:%M"
+    items = ", ".join(f"{e.title} {'on' if 'A' in fmt else 'at'} {s:{fmt}}" for s, _, e in found)
+    return f"{label[0].upper() + label[1:]} you have {len(found)}: {items}."
+
+def answer_availability(schedule, text, query_range):
+    """"am I free tomorrow at 3" checks one slot, "when am I free on friday" lists the gaps."""
+    day = query_range[0].date() if query_range else datetime.date.today()
+    label = query_range[2] if query_range else "today"
+
+    if re.search(r'\bat\s+\d', text_to_int(text)):
+        _, start_time, _, _ = parse_appointment_details(text)
+        start = parse_time(start_time)
+        if start is None:
+            speak_text("I didn't understand that time.")
+            return
+        if start.hour < DAY_START.hour and not re.search(r'\d\s*a\.?m\b', text):
+            start += datetime.timedelta(hours=12)  # "am I free at 3" means the afternoon
+        start = datetime.datetime.combine(day, start.time())
+        end = start + DEFAULT_DURATION  # not combined with day: a 23:00 slot ends tomorrow
+        clashes = schedule.conflicts(start, end)
+        if not clashes:
+            speak_text(f"Yes, you are free {label} at {start:%H:%M}.")
+            return
+        clash_start, clash_end, clash = clashes[0]
+        msg = f"No, you have {clash.title or 'an appointment'} from {clash_start:%H:%M} to {clash_end:%H:%M}."
+        later = [slot for slot in schedule.free_slots(day) if slot[0] >= start]
+        if later: msg += f" You are free from {later[0][0]:%H:%M}."
+        speak_text(msg)
+        return
+
+    slots = schedule.free_slots(day)
+    if not slots:
+        speak_text(f"You have no free time {label}.")
+    else:
+        gaps = ", ".join(f"from {a:%H:%M} to {b:%H:%M}" for a, b in slots)
+        speak_text(f"{label[0].upper() + label[1:]} you are free {gaps}.")
+
 def handle_command(text):
-    global last_location, last_day_index, last_created_title, conversation_history
+    """
+    One turn. All calendar reads of the turn share one download (see
+    api_client.begin_command); the number of downloads is kept in the turn's
+    conversation_history entry as "fetches". If profiling is on for this turn
+    (see profiling.py) it runs under the profiler.
+    """
+    begin_command()
+    try:
+        with profiling.section(len(conversation_history) + 1, "handle"):
+            return dispatch_command(text)
+    finally:
+        stats = end_command()
+        if conversation_history:
+            conversation_history[-1]["fetches"] = stats["fetches"]
+        if stats["fetches"] > 1:
+            print(f"[calendar] {stats['fetches']} downloads this turn")
+
+def dispatch_command(text):
+    global last_locations, last_day_index, last_created_title, conversation_history, title_index_version
     text = text.lower()
     
     # Log user input to conversation history
@@ -267,53 +694,79 @@ def handle_command(text):
         "user": text,
         "timestamp": datetime.datetime.now().isoformat()
     })
+
+    # Report calendar writes that failed in the background since the last turn
+    for entry in calendar_outbox.pop_failures():
+        speak_text(f"Sorry, I could not {describe_write(entry)} earlier.")
+
+    # Runtime profiling switches (files go to profiling.OUTPUT_DIR)
+    command = text.strip(" .?!")
+    if command in ["profiling on", "start profiling"]:
+        profiling.configure("all")
+        speak_text("Profiling is on.")
+        return True
+    if command in ["profiling off", "stop profiling"]:
+        profiling.configure("off")
+        speak_text("Profiling is off.")
+        return True
+    if command == "profile next turn":
+        profiling.profile_next()
+        speak_text("I will profile the next turn.")
+        return True
+
+    # "next page" while an appointment listing is being read out
+    if "next page" in text or (listing_pages is not None and text.strip(" .?!") in ["next", "more", "continue"]):
+        speak_next_page()
+        return True
     
     # CRITICAL: Check appointment/calendar keywords FIRST (before weather)
     # This prevents "create event" or "add reminder" from triggering weather
-    appointment_keywords = ["appointment", "calendar", "schedule", "event", "reminder", "meeting", "remainder"]
-    if any(keyword in text for keyword in appointment_keywords):
+    appointment_keywords = ["appointment", "calendar", "schedule", "event", "reminder", "meeting", "remainder",
+                            "am i free", "am i busy", "free slot", "free time", "do i have", "what's on",
+                            "what is on", "what's next week", "what is next week"]
+    # "homework every monday at 5 pm": a repetition with a time is an appointment too
+    repeats_at_time = parse_recurrence(text) is not None and re.search(r'\bat \d', text_to_int(text))
+    if any(keyword in text for keyword in appointment_keywords) or repeats_at_time:
+        # "is my calendar up to date" / "calendar sync status"
+        if any(p in text for p in ["sync status", "calendar status", "up to date", "in sync", "last sync"]):
+            speak_text(describe_sync_status())
+            return True
+
+        # "team meeting every monday at 9" is a create even without "add"/"create"
+        recurrence = parse_recurrence(text_to_int(text))
+
         # Check if this is about ADDING a field (location) to existing appointment
         if "add" in text and ("location" in text or "place" in text):
             # This is about adding location to existing appointment
-            events = get_appointments()
+            events = current_appointments()
             target_title_search = None
             
             # Check which appointment to modify
             if "first" in text and events:
-                target_title_search = events[0].get('title')
+                target_title_search = events[0].title
             elif "second" in text and len(events) > 1:
-                target_title_search = events[1].get('title')
+                target_title_search = events[1].title
             elif "third" in text and len(events) > 2:
-                target_title_search = events[2].get('title')
+                target_title_search = events[2].title
             elif "last" in text and events:
-                target_title_search = events[-1].get('title')
+                target_title_search = events[-1].title
             elif "previous" in text or "recently" in text:
                 if last_created_title:
                     target_title_search = last_created_title
                 elif events:
-                    target_title_search = events[-1].get('title')
+                    target_title_search = events[-1].title
             else:
                 # Try to find appointment by name in the command
-                for event in events:
-                    event_title = event.get('title', '').lower()
-                    if event_title in text:
-                        target_title_search = event.get('title')
-                        break
+                target_title_search = title_in_command(events, text)
             
             if target_title_search:
                 speak_text("What is the location?")
                 print(">>> Waiting for location...")
-                loc_file = record_audio(silence_duration=2.0)
-                if loc_file:
-                    loc_text = transcribe_audio(loc_file)
-                    if loc_text:
-                        new_location = loc_text.strip(" .?!").capitalize()
-                        speak_text(f"Adding location {new_location} to {target_title_search}.")
-                        success = modify_appointment(target_title_search, new_location=new_location)
-                        if success:
-                            speak_text("Location added.")
-                        else:
-                            speak_text("Could not update.")
+                loc_text = listen(silence_duration=2.0)
+                if loc_text:
+                    new_location = loc_text.strip(" .?!").capitalize()
+                    queue_modify(events, target_title_search, new_location=new_location)
+                    speak_text(f"Adding location {new_location} to {target_title_search}.")
             else:
                 speak_text("Could not find the appointment.")
             return True
@@ -325,7 +778,7 @@ def handle_command(text):
             clear_time = "time" in text
             
             # Find target appointment
-            events = get_appointments()
+            events = current_appointments()
             target_title_search = None
             
             if events:
@@ -333,18 +786,14 @@ def handle_command(text):
                     if last_created_title:
                         target_title_search = last_created_title
                     else:
-                        target_title_search = events[-1].get('title')
+                        target_title_search = events[-1].title
                 else:
-                    target_title_search = events[0].get('title')
+                    target_title_search = events[0].title
             
             if target_title_search:
                 if clear_location:
+                    queue_modify(events, target_title_search, new_location="Not specified")
                     speak_text(f"Removing location from {target_title_search}.")
-                    success = modify_appointment(target_title_search, new_location="Not specified")
-                    if success:
-                        speak_text("Location cleared.")
-                    else:
-                        speak_text("Could not update.")
                 elif clear_time:
                     speak_text("I cannot remove the time from an appointment. Time is required. You can change the date or time instead.")
             else:
@@ -353,9 +802,12 @@ def handle_command(text):
         
         # Now handle actual appointment deletion
         if "delete" in text or "remove" in text or "cancel" in text:
-            if "all" in text or "everything" in text:
+            if re.search(r'\b(all|everything)\b', text):  # not "called", "football"
                 speak_text("Deleting all appointments...")
+                calendar_outbox.flush(timeout=OUTBOX_READ_WAIT)  # Queued writes go first
                 count = delete_all_appointments()
+                title_index.sync([])
+                title_index_version = None
                 time.sleep(2.0)  # Extra wait for server sync
                 speak_text(f"Deleted {count} appointments. Calendar is empty.")
                 last_created_title = None  # Reset tracking
@@ -368,25 +820,19 @@ def handle_command(text):
                 word_to_num = {"two": 2, "three": 3, "four": 4, "five": 5}
                 delete_count = word_to_num.get(count_word, int(count_word) if count_word.isdigit() else 1)
                 
-                events = get_appointments()
+                events = current_appointments()
                 if len(events) < delete_count:
                     speak_text(f"You only have {len(events)} appointments.")
                     delete_count = len(events)
                 
-                speak_text(f"Deleting last {delete_count} appointments...")
-                deleted = 0
                 for i in range(delete_count):
-                    if events:
-                        target = events[-(i+1)].get('title')
-                        if delete_appointment(target):
-                            deleted += 1
-                            time.sleep(0.5)
-                
-                speak_text(f"Deleted {deleted} appointments.")
+                    event = events[-(i+1)]
+                    queue_delete(events, event.title, event=event)
+                speak_text(f"Deleting last {delete_count} appointments.")
                 if last_created_title: last_created_title = None
                 return True
 
-            events = get_appointments()
+            events = current_appointments()
             target_title = None
 
             ordinals = {
@@ -396,16 +842,16 @@ def handle_command(text):
             found_ordinal = False
             for word, index in ordinals.items():
                 if word in text:
-                    if len(events) > index: target_title = events[index].get('title')
+                    if len(events) > index: target_title = events[index].title
                     found_ordinal = True
                     break
             
             if not found_ordinal:
                 if "last" in text:
-                    if events: target_title = events[-1].get('title')
+                    if events: target_title = events[-1].title
                 elif "previous" in text or "recently" in text:
                     if last_created_title: target_title = last_created_title
-                    elif events: target_title = events[-1].get('title')
+                    elif events: target_title = events[-1].title
                 elif "titled" in text or "called" in text or "named" in text:
                     try:
                         if "titled" in text: target_title = text.split("titled")[1].strip().capitalize()
@@ -413,38 +859,17 @@ def handle_command(text):
                         elif "named" in text: target_title = text.split("named")[1].strip().capitalize()
                     except: pass
                 else:
-                    # Try to extract appointment name from "delete the appointment X"
-                    for event in events:
-                        event_title = event.get('title', '').lower()
-                        if event_title in text:
-                            target_title = event.get('title')
-                            break
+                    # The appointment name in "delete the dentist appointment", matched below
+                    target_title = title_query(text) or None
 
             if target_title:
-                speak_text(f"Deleting appointment: {target_title}...")
-                success = delete_appointment(target_title)
-                time.sleep(1.0)  # Wait for API to sync
-                if success: 
-                    speak_text("Done.")
-                    if target_title == last_created_title: last_created_title = None
-                else: 
-                    speak_text("Could not find that appointment.")
+                delete_matching(events, target_title)
             else:
                 speak_text("Which appointment should I delete?")
                 print(">>> Waiting for appointment name...")
-                title_file = record_audio(silence_duration=2.0)
-                if title_file:
-                    title_text = transcribe_audio(title_file)
-                    if title_text:
-                        target_title = title_text.strip(" .?!").capitalize()
-                        speak_text(f"Deleting appointment: {target_title}...")
-                        success = delete_appointment(target_title)
-                        time.sleep(1.0)
-                        if success: 
-                            speak_text("Done.")
-                            if target_title == last_created_title: last_created_title = None
-                        else: 
-                            speak_text("Could not find that appointment.")
+                title_text = listen(silence_duration=2.0)
+                if title_text:
+                    delete_matching(events, title_text.strip(" .?!"))
 
         
         elif "change" in text or "modify" in text or "move" in text or "rename" in text:
@@ -459,8 +884,20 @@ def handle_command(text):
             change_date = "date" in text or "day" in text # Split date and time triggers
             change_time = "time" in text # ADDED: Specific trigger for time
 
+            # Several fields in one go: "change the title to X and the location to Y"
+            field_changes = parse_field_changes(text)
+            if field_changes:
+                change_title = "title" in field_changes
+                change_location = "location" in field_changes
+                change_date = "date" in field_changes
+                change_time = "time" in field_changes
+                new_title = field_changes.get("title", "").capitalize() or None
+                new_location = field_changes.get("location", "").capitalize() or None
+                new_date = field_changes.get("date")
+                new_time = field_changes.get("time")
+
             # Check if new value is provided in command
-            if " to " in text:
+            elif " to " in text:
                 after_to = text.split(" to ", 1)[1].strip(" .?!")
                 
                 if change_title:
@@ -479,44 +916,40 @@ def handle_command(text):
             if change_location and not new_location:
                 speak_text("What is the new location?")
                 print(">>> Waiting for new location...")
-                loc_file = record_audio(silence_duration=2.0)
-                if loc_file:
-                    loc_text = transcribe_audio(loc_file)
-                    if loc_text:
-                        new_location = loc_text.strip(" .?!").capitalize()
+                loc_text = listen(silence_duration=2.0)
+                if loc_text:
+                    new_location = loc_text.strip(" .?!").capitalize()
             
             if change_title and not new_title:
                 speak_text("What is the new title?")
                 print(">>> Waiting for new title...")
-                title_file = record_audio(silence_duration=2.0)
-                if title_file:
-                    title_text = transcribe_audio(title_file)
-                    if title_text:
-                        new_title = title_text.strip(" .?!").capitalize()
+                title_text = listen(silence_duration=2.0)
+                if title_text:
+                    new_title = title_text.strip(" .?!").capitalize()
             
             if change_date and not new_date:
                 speak_text("What is the new date?")
                 print(">>> Waiting for new date...")
-                date_file = record_audio(silence_duration=2.0)
-                if date_file:
-                    date_text = transcribe_audio(date_file)
-                    if date_text:
-                        new_date = date_text.strip(" .?!")
+                date_text = listen(silence_duration=2.0)
+                if date_text:
+                    new_date = date_text.strip(" .?!")
 
             if change_time and not new_time: # ADDED: Audio prompt for time
                 speak_text("What is the new time?")
                 print(">>> Waiting for new time...")
-                time_file = record_audio(silence_duration=2.0)
-                if time_file:
-                    time_text = transcribe_audio(time_file)
-                    if time_text: 
-                        new_time = time_text.strip(" .?!")
+                time_text = listen(silence_duration=2.0)
+                if time_text: 
+                    new_time = time_text.strip(" .?!")
             
             # Find target appointment
-            events = get_appointments()
+            events = current_appointments()
             target_title_search = None
             
             if events:
+                # An appointment named in the command wins ("move the dentist to friday")
+                target_title_search = title_in_command(events, text.split(" to ")[0])
+
+            if events and not target_title_search:
                 # Try to match by date first if date is mentioned
                 months = ["january", "february", "march", "april", "may", "june", 
                          "july", "august", "september", "october", "november", "december"]
@@ -540,74 +973,87 @@ def handle_command(text):
                     tomorrow = today + datetime.timedelta(days=1)
                     
                     for e in events:
-                        start = e.get('start_time', '')
-                        if date_mentioned == "tomorrow" and str(tomorrow) in start:
-                            target_title_search = e.get('title')
+                        start = e.start_time or ''
+                        if date_mentioned == "tomorrow" and e.date == str(tomorrow):
+                            target_title_search = e.title
                             break
                         elif date_mentioned in start.lower():
-                            target_title_search = e.get('title')
+                            target_title_search = e.title
                             break
                 
                 # Fallback to last created or first appointment
                 if not target_title_search:
                     if last_created_title:
                         for e in events:
-                            if e.get('title') == last_created_title:
+                            if e.title == last_created_title:
                                 target_title_search = last_created_title
                                 break
                         if not target_title_search: last_created_title = None
 
                 if not target_title_search:
                     if "previous" in text or "last" in text or "recently" in text:
-                        target_title_search = events[-1].get('title')
+                        target_title_search = events[-1].title
                     else:
-                        target_title_search = events[0].get('title')
+                        target_title_search = events[0].title
 
-            if target_title_search and (new_location or new_title or new_date):
+            if target_title_search and (new_location or new_title or new_date or new_time):
                 # Check if change is actually needed
-                if new_title and new_title.lower() == target_title_search.lower():
+                if new_title and new_title.lower() == target_title_search.lower() and not (new_location or new_date or new_time):
                     speak_text(f"The title is already {new_title}.")
                 else:
+                    target_event = next((e for e in events if e.title == target_title_search), None)
+                    changes = {}
+                    described = []
+                    if new_title:
+                        changes["new_title"] = new_title
+                        described.append(f"title to {new_title}")
+                    if new_location:
+                        changes["new_location"] = new_location
+                        described.append(f"location to {new_location}")
+                    if new_date or new_time:
+                        phrase = "appointment"
+                        if new_date: phrase += f" on {new_date}"
+                        if new_time: phrase += f" at {new_time}"
+                        _, start_time, end_time, _ = parse_appointment_details(phrase)
+                        start_dt, end_dt = parse_time(start_time), parse_time(end_time)
+                        if start_dt is None or end_dt is None:
+                            speak_text("I didn't understand that time.")
+                            return True
+                        if not new_date and target_event is not None and target_event.start is not None:
+                            # Keep the original date from the server, but swap the time part
+                            moved = datetime.datetime.combine(target_event.start.date(), start_dt.time())
+                            start_dt, end_dt = moved, moved + (end_dt - start_dt)
+                        start_time, end_time = f"{start_dt:%Y-%m-%dT%H:%M}", f"{end_dt:%Y-%m-%dT%H:%M}"
+                        changes["new_date"] = start_time
+                        changes["new_end_date"] = end_time
+                        if new_date: described.append(f"date to {start_time.split('T')[0]}")
+                        if new_time: described.append(f"time to {start_time.split('T')[1]}")
+                    # One journaled write for all fields; the worker does a single replace
+                    queue_modify(events, target_title_search, event=target_event, **changes)
                     if new_title:
-                        speak_text(f"Changing title of {target_title_search} to {new_title}.")
-                        success = modify_appointment(target_title_search, new_title=new_title)
-                        if success: 
-                            last_created_title = new_title
-                            speak_text("Updated.")
-                        else: 
-                            speak_text("Could not update.")
-                    elif new_location:
-                        speak_text(f"Moving appointment {target_title_search} to {new_location}.")
-                        success = modify_appointment(target_title_search, new_location=new_location)
-                        if success:
-                            speak_text("Updated.")
-                        else:
-                            speak_text("Could not update.")
-                    elif new_date:
-                        # Parse the new date
-                        _, start_time, end_time, _ = parse_appointment_details(f"appointment on {new_date}")
-                        speak_text(f"Changing date of {target_title_search} to {start_time.split('T')[0]}.")
-                        success = modify_appointment(target_title_search, new_date=start_time, new_end_date=end_time)
-                        if success:
-                            speak_text("Updated.")
-                        else:
-                            speak_text("Could not update.")
-                    elif new_time:
-                        # Use the existing date but update to the new time
-                        _, start_time, end_time, _ = parse_appointment_details(f"appointment at {new_time}")
-                        # Keep the original date from the server, but swap the time part
-                        speak_text(f"Changing time of {target_title_search} to {new_time}.")
-                        success = modify_appointment(target_title_search, new_date=start_time, new_end_date=end_time)
-                        if success:
-                            speak_text("Updated.")
-                        else:
-                            speak_text("Could not update.")
+                        last_created_title = new_title
+                        title_index.remove(target_title_search)
+                        title_index.add(new_title)
+                    speak_text(f"Changing {' and '.join(described)} for {target_title_search}.")
             else:
                 speak_text("I need to know what to change, or the appointment was not found.")
 
 
-        elif "add" in text or "create" in text or "new" in text:
-            title, start, end, loc = parse_appointment_details(text)
+        elif "add" in text or "create" in text or "new" in text or \
+                (recurrence and not any(w in text for w in READ_WORDS)):
+            title, start, end, loc = parse_appointment_details(strip_recurrence(text_to_int(text)) if recurrence else text)
+            start_dt, end_dt = parse_time(start), parse_time(end)
+            if start_dt is None or end_dt is None:
+                speak_text("I didn't understand that time.")
+                return True
+            description = "Voice Entry"
+            if recurrence and start_dt and end_dt:
+                # One entry for the whole series: first occurrence + rule in the description
+                first = first_start(recurrence, start_dt)
+                start_dt, end_dt = first, end_dt + (first - start_dt)
+                start, end = f"{start_dt:%Y-%m-%dT%H:%M}", f"{end_dt:%Y-%m-%dT%H:%M}"
+                recurrence = finish_rule(recurrence, start_dt)
+                description = format_rule(recurrence)
             
             # Extract date and time from start
             date_part = start.split('T')[0]
@@ -615,60 +1061,80 @@ def handle_command(text):
             
             msg = f"Adding appointment called {title}"
             if loc != "Not specified": msg += f" at {loc}"
-            msg += f" on {date_part} at {time_part}."
-            speak_text(msg)
-            create_appointment(title, "Voice Entry", start, end, loc)
-            time.sleep(1.0)  # Wait for API to sync
+            if description != "Voice Entry":
+                msg += f" {describe_recurrence(dict(recurrence, until=None), start_dt)} at {time_part}, starting {date_part}"
+                msg += f" until {recurrence['until']:%Y-%m-%d}." if recurrence["until"] else "."
+            else:
+                msg += f" on {date_part} at {time_part}."
+            clashes = calendar_schedule(start_dt, end_dt, titled=False, cache=False).conflicts(start_dt, end_dt)
+            if clashes:
+                clash_start, _, clash = clashes[0]
+                msg += f" Note: it overlaps with {clash.title or 'another appointment'} at {clash_start:%H:%M}."
+            # Journaled first, sent in the background while the confirmation is spoken
+            calendar_outbox.submit("create", title=title, description=description,
+                                   start_time=start, end_time=end, location=loc)
+            title_index.add(title)
             last_created_title = title 
-            speak_text("Appointment created successfully.")
+            speak_text(msg)
 
-        elif any(w in text for w in ["read", "what", "list", "where", "show", "display", "check", "when"]):
-            time.sleep(1.0)  # Longer delay to ensure latest data
-            raw_events = get_appointments()
-            events = [e for e in raw_events if e.get('title') and e.get('title').strip()]
+        elif any(w in text for w in READ_WORDS):
+            try:
+                query_range = parse_query_range(text)
+            except ValueError:
+                speak_text("I didn't understand that time.")
+                return True
+            time_question = any(w in text for w in ["where", "when", "free", "busy"]) or "time" in text
+            if not query_range and not time_question:
+                # Plain "display all": read out page by page instead of building the whole list
+                wait_for_outbox()
+                sync_appointments(max_age=MIRROR_MAX_AGE)
+                if calendar_mirror.is_offline():
+                    speak_text("I can't reach the calendar server, so this may be out of date.")
+                start_listing()
+                return True
+            if not time_question:
+                # "what's on tomorrow": the same answer for as long as the calendar is unchanged
+                wait_for_outbox()
+                sync_appointments(max_age=MIRROR_MAX_AGE)
+                if calendar_mirror.is_offline():
+                    speak_text("I can't reach the calendar server, so this may be out of date.")
+                speak_text(response_cache.get_or_build("range", query_range, calendar_version(),
+                                                       lambda: describe_range(*query_range)))
+                return True
+
+            wait_for_outbox()
+            sync_appointments(max_age=MIRROR_MAX_AGE)
+            if calendar_mirror.is_offline():
+                speak_text("I can't reach the calendar server, so this may be out of date.")
+            # The index is rebuilt only when the calendar changed (see calendar_schedule)
+            now = datetime.datetime.now()
+            if query_range:
+                schedule = calendar_schedule(query_range[0], query_range[1])
+            else:
+                # "what's next" looks one week ahead first and only widens if nothing is found in
+                # that week: the cached index holds later one-offs but not the series occurrences
+                # between them, so a hit after the week may not be the next appointment
+                today_start = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+                week_end = now + datetime.timedelta(days=7)
+                schedule = calendar_schedule(today_start, week_end)
+                upcoming = schedule.next_after(now)
+                if upcoming is None or upcoming[0] >= week_end:
+                    schedule = calendar_schedule(today_start, now + HORIZON)
             
-            if not events: 
+            if "free" in text or "busy" in text:
+                answer_availability(schedule, text, query_range)
+            elif len(schedule) == 0: 
                 speak_text("You have no appointments.")
             else:
-                if "where" in text:
-                    next_evt = events[0]
-                    location = next_evt.get('location', 'Not specified')
+                # First appointment that hasn't started yet (within the asked range, if any)
+                upcoming = schedule.next_after(query_range[0] if query_range else now)
+                if upcoming is None or (query_range and upcoming[0] >= query_range[1]):
+                    speak_text("You have no upcoming appointments.")
+                elif "where" in text:
+                    location = upcoming[2].location or 'Not specified'
                     speak_text(f"Your next appointment is at {location}.")
-                elif "when" in text or "time" in text:
-                    next_evt = events[0]
-                    start_time = next_evt.get('start_time', 'Not specified')
-                    if 'T' in start_time:
-                        date_part, time_part = start_time.split('T')
-                        speak_text(f"Your next appointment is on {date_part} at {time_part}.")
-                    else:
-                        speak_text(f"Your next appointment is on {start_time}.")
                 else:
-                    # Print full details to console
-                    count = len(events)
-                    print(f"\n{'='*60}")
-                    print(f"APPOINTMENTS ({count} total):")
-                    print('='*60)
-                    for i, evt in enumerate(events, 1):
-                        title = evt.get('title', 'Untitled')
-                        date = evt.get('start_time', 'No date').split('T')[0] if 'T' in evt.get('start_time', '') else 'No date'
-                        time_str = evt.get('start_time', 'No time').split('T')[1] if 'T' in evt.get('start_time', '') else 'No time'
-                        location = evt.get('location', 'No location')
-                        
-                        print(f"{i}. {title}")
-                        print(f"   Date: {date}")
-                        print(f"   Time: {time_str}")
-                        print(f"   Location: {location}")
-                        print()
-                    print('='*60)
-                    
-                    # Speak only count and titles
-                    if count == 1:
-                        title = events[0].get('title', 'Untitled')
-                        speak_text(f"You have 1 appointment: {title}.")
-                    else:
-                        titles = [f"{i}. {e.get('title', 'Untitled')}" for i, e in enumerate(events, 1)]
-                        titles_spoken = ", ".join(titles)
-                        speak_text(f"You have {count} appointments: {titles_spoken}.")
+                    speak_text(f"Your next appointment is on {upcoming[0]:%Y-%m-%d} at {upcoming[0]:%H:%M}.")
         return True
 
     # WEATHER SECTION - Only trigger if NOT an appointment command
@@ -676,45 +1142,45 @@ def handle_command(text):
     has_appointment_keyword = any(keyword in text for keyword in appointment_keywords)
     
     if not has_appointment_keyword and any(t in text for t in BASE_TRIGGERS + CONDITION_TRIGGERS):
-        city = None
+        cities = []
         words = text.split()
         if "in" in words: 
-            try: city = words[words.index("in")+1].strip("?.!").capitalize(); last_location = city
-            except: pass
-        if not city and "about" in words:
+            cities = parse_cities(words[words.index("in")+1:])
+        if not cities and "about" in words:
             try: 
                 c = words[words.index("about")+1].strip("?.!")
-                if c not in ["tomorrow","today"]: city=c.capitalize(); last_location = city
+                if c not in ["tomorrow","today"]: cities = [c.capitalize()]
             except: pass
-        if not city: city = last_location
+        if cities: last_locations = cities
+        else: cities = last_locations
         
-        if not city:
+        if not cities:
             speak_text("Please tell me the location.")
             print(">>> Waiting for location input...")
-            loc_file = record_audio(silence_duration=2.0)
-            if loc_file:
-                loc_text = transcribe_audio(loc_file)
-                if loc_text:
-                    temp_words = loc_text.split()
-                    if "in" in temp_words:
-                        try: city = temp_words[temp_words.index("in")+1].strip("?.!").capitalize()
-                        except: city = loc_text.strip("?.!").capitalize()
-                    else:
-                        city = loc_text.strip("?.!").capitalize()
-                    last_location = city
+            loc_text = listen(silence_duration=2.0)
+            if loc_text:
+                temp_words = loc_text.lower().split()
+                if "in" in temp_words:
+                    cities = parse_cities(temp_words[temp_words.index("in")+1:])
+                if not cities:
+                    cities = [loc_text.strip("?.!").capitalize()]
+                last_locations = cities
         
-        if not city:
+        if not cities:
             speak_text("I didn't hear a location. Canceling.")
             return True
 
-        print(f"Weather query for: {city}")
-        data = get_weather_forecast(city)
-        if data and 'forecast' in data:
-            new_index = parse_target_day_index(text, data['forecast'], last_day_index)
+        # All cities are fetched concurrently, so N cities cost about one round trip
+        print(f"Weather query for: {', '.join(cities)}")
+        results = get_weather_forecasts(cities)
+        forecasts = {c: f or None for c, f in results.items()}
+        available = [f for f in forecasts.values() if f]
+        if available:
+            new_index = parse_target_day_index(text, available[0], last_day_index)
             if new_index != -1: last_day_index = new_index
-            speak_text(get_forecast_summary(data['forecast'], text, city, last_day_index))
+            speak_text(get_multi_city_summary(forecasts, text, last_day_index))
         else:
-            speak_text(f"I couldn't find weather data for {city}.")
+            speak_text(f"I couldn't find weather data for {' and '.join(cities)}.")
         return True
 
     if "stop" in text or "exit" in text:
@@ -741,6 +1207,8 @@ def handle_command(text):
                     if len(response) > 100:
                         response = response[:100] + "..."
                     print(f"  Assistant: {response}")
+                if entry.get('fetches'):
+                    print(f"  Calendar downloads: {entry['fetches']}")
             print("="*60)
             
             count = len(conversation_history)
@@ -750,7 +1218,76 @@ def handle_command(text):
     speak_text("I didn't understand.")
     return True
 
+def run_voice():
+    speech().get_model()  # Load Whisper before the first turn, not during it
+    speak_text("System ready")
+    running = True
+    while running:
+        input("\nPress Enter to activate microphone...")
+        ut = listen()
+        if ut: running = handle_command(ut)
+
+def run_wake():
+    """
+    Hands-free loop: wait for the wake word (energy gate + keyword spotter, no
+    Whisper), then take one normal turn. Idle CPU and memory are printed after
+    every wait so they can be checked against the budgets in wake_word.py.
+    """
+    import wake_word
+    spotter = wake_word.WakeWordSpotter.load()
+    if spotter is None:
+        print(f"No wake word enrolled ({wake_word.TEMPLATE_FILE}). Run: python wake_word.py --enroll")
+        return run_voice()
+    speech().get_model()
+    baseline_mb = wake_word.resident_mb()  # Whisper is loaded: the idle budget covers what comes on top
+    speak_text("System ready")
+    stats = {}
+    running = True
+    while running:
+        print("\nListening for the wake word...")
+        meter = wake_word.ResourceMeter(baseline_mb).start()
+        if not speech().wait_for_wake_word(spotter, stats=stats):
+            break
+        usage = meter.report()
+        print(wake_word.format_usage(usage, stats))
+        if not wake_word.within_budget(usage):
+            print("[wake] Over the idle budget!")
+        speak_text("Yes?")
+        ut = listen()
+        if ut: running = handle_command(ut)
+
+def run_text(lines, echo=True):
+    """
+    Text-only loop: every line is one utterance; follow-up questions
+    ("What is the new location?") are answered by the next line.
+    """
+    global text_input, echo_input
+    echo_input = echo
+    text_input = (line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#"))
+    for ut in text_input:
+        if echo: print(f"\nYou: {ut}")
+        if not handle_command(ut): break
+
+def prompt_lines():
+    while True:
+        try:
+            yield input("\nYou> ")
+        except EOFError:
+            return
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Weather and calendar voice assistant.")
+    parser.add_argument("--text", action="store_true", help="Type commands instead of speaking (no audio stack)")
+    parser.add_argument("--file", help="Run the utterances in this file, one per line (no audio stack)")
+    parser.add_argument("--wake", action="store_true", help="Hands-free: start a turn when the wake word is heard")
+    parser.add_argument("--profile", nargs="?", const="all", metavar="TURNS",
+                        help="Profile every turn, 'next', or turns like 3,7 (files in profiles/)")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.configure(args.profile)
+    profiling.install_signal()
+
     try:
         # UNCOMMENT THE LINE BELOW TO DELETE ALL OLD APPOINTMENTS (run once, then comment it again)
         # delete_all_appointments()
@@ -758,11 +1295,15 @@ if __name__ == "__main__":
     except Exception:
         pass
     
-    speak_text("System ready")
-    running = True
-    while running:
-        input("\nPress Enter to activate microphone...")
-        fn = record_audio()
-        if fn:
-            ut = transcribe_audio(fn)
-            if ut: running = handle_command(ut)
+    calendar_outbox.start()  # Resume writes left over from the last run
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            run_text(f.readlines())
+    elif args.text:
+        run_text(prompt_lines(), echo=False)
+    elif args.wake:
+        run_wake()
+    else:
+        run_voice()
+    if not calendar_outbox.flush(timeout=30):
+        print(f"{calendar_outbox.pending()} calendar changes still queued, they will be sent on next start.")
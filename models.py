@@ -0,0 +1,139 @@
+import hashlib
+
+from recurrence import parse_rule
+from schedule import parse_time
+
+# Typed, slotted versions of the calendar.php / weather.php payloads. They
+# are built once where data enters the program (api_client for forecasts,
+# calendar_store for appointments) with everything the assistant keeps
+# asking for already derived: datetimes parsed, day names lowercased,
+# recurrence rules decoded. No per-instance __dict__: an appointment with
+# its two datetimes still takes about a quarter less memory than its JSON dict.
+
+APPOINTMENT_FIELDS = ("id", "title", "description", "start_time", "end_time", "location")
+
+
+class Appointment:
+    """
+    One calendar entry. The raw fields keep the server's strings (written back
+    unchanged by update_appointment); start/end are datetimes (None if missing
+    or malformed), rule the decoded recurrence rule of a series (None for
+    one-off entries).
+    """
+
+    __slots__ = APPOINTMENT_FIELDS + ("start", "end", "rule")
+
+    def __init__(self, id=None, title=None, description=None, start_time=None, end_time=None, location=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.start_time = start_time
+        self.end_time = end_time
+        self.location = location
+        self.start = parse_time(start_time)
+        self.end = parse_time(end_time)
+        self.rule = parse_rule(description)
+
+    @classmethod
+    def from_json(cls, data):
+        """From a calendar.php item, a mirror row or an outbox entry's args (extra keys are ignored)."""
+        return cls(*(data.get(field) for field in APPOINTMENT_FIELDS))
+
+    def to_json(self):
+        return {field: getattr(self, field) for field in APPOINTMENT_FIELDS}
+
+    def replace(self, **fields):
+        """Copy with some raw fields changed (derived ones are recomputed)."""
+        values = self.to_json()
+        values.update(fields)
+        return Appointment(**values)
+
+    def moved(self, start, end):
+        """Copy starting/ending at other datetimes, e.g. one occurrence of a series."""
+        copy = Appointment.__new__(Appointment)
+        for field in Appointment.__slots__:
+            setattr(copy, field, getattr(self, field))
+        copy.start, copy.end = start, end
+        copy.start_time, copy.end_time = start.strftime("%Y-%m-%dT%H:%M"), end.strftime("%Y-%m-%dT%H:%M")
+        return copy
+
+    @property
+    def date(self):
+        """'YYYY-MM-DD' of the start, None without a valid start time."""
+        return self.start_time[:10] if self.start is not None else None
+
+    @property
+    def clock(self):
+        """'HH:MM' of the start, None without a valid start time."""
+        return self.start_time[11:16] if self.start is not None and len(self.start_time) > 11 else None
+
+    @property
+    def has_title(self):
+        return bool(self.title and self.title.strip())
+
+    def __repr__(self):
+        return f"Appointment({self.title!r}, {self.start_time!r})"
+
+
+class ForecastDay:
+    """One day of a weather.php forecast; day is the lowercased day name, condition the lowercased weather."""
+
+    __slots__ = ("day", "name", "weather", "condition", "conditions", "temp_min", "temp_max")
+
+    def __init__(self, name, weather, temp_min=None, temp_max=None):
+        self.name = name or ""
+        self.day = self.name.lower()
+        self.weather = weather or ""
+        self.condition = self.weather.lower()
+        # Asked-for conditions this day counts as: its own, and any rain for any rain
+        self.conditions = frozenset([self.condition] + (["rain", "shower rain"] if "rain" in self.condition else []))
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+
+    @classmethod
+    def from_json(cls, data):
+        temps = data.get("temperature") or {}
+        return cls(data.get("day"), data.get("weather"), temps.get("min"), temps.get("max"))
+
+    def __repr__(self):
+        return f"ForecastDay({self.day!r}, {self.condition!r})"
+
+
+class Forecast:
+    """
+    A city's forecast: days in order plus a day name -> first index table.
+    version is a digest of everything the forecast says (place and every day's
+    name, weather and temperatures), equal only for identical content (see response_cache).
+    """
+
+    __slots__ = ("place", "days", "day_index", "version")
+
+    def __init__(self, place, days):
+        self.place = place
+        self.days = list(days)
+        self.day_index = {}
+        for i, day in enumerate(self.days):
+            self.day_index.setdefault(day.day, i)
+        digest = hashlib.blake2b(repr(self.place).encode(), digest_size=16)
+        for d in self.days:
+            digest.update(repr((d.name, d.weather, d.temp_min, d.temp_max)).encode())
+        self.version = digest.hexdigest()
+
+    @classmethod
+    def from_json(cls, data):
+        """None unless the response carries a forecast list."""
+        if not isinstance(data, dict) or not isinstance(data.get("forecast"), list):
+            return None
+        return cls(data.get("place"), (ForecastDay.from_json(d) for d in data["forecast"] if isinstance(d, dict)))
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, index):
+        return self.days[index]
+
+    def __iter__(self):
+        return iter(self.days)
+
+    def __repr__(self):
+        return f"Forecast({self.place!r}, {len(self.days)} days)"
@@ -0,0 +1,256 @@
+import json
+import os
+import threading
+import time
+import uuid
+from functools import partial
+
+import api_client
+from models import Appointment
+
+# --- CONFIGURATION ---
+OUTBOX_FILE = "calendar_outbox.json"
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 1.0      # seconds, doubled after every failed attempt
+MAX_RETRY_DELAY = 30.0
+
+# Calendar writes that can be deferred. Each gets the journaled args, whether
+# it was sent before (a request that timed out may still have been carried
+# out, so a resent write first checks the server) and note(**args), which
+# journals extra args before anything is sent. The functions in api_client
+# are looked up at call time so they can be swapped (tests, load generator).
+#
+# Deletes and modifies journal the appointment's fields ("event"). Its id can
+# be stale by the time the write is sent - calendar.php has no update, so a
+# modify queued before it replaced the appointment under a new id - so the
+# worker first looks it up on the server and journals what it found as
+# "target". Only that target going missing counts as this write's own
+# earlier attempt having got through.
+
+def _resolve(a, note):
+    """The appointment a delete/modify is about, as the server has it now (see above); None if not found."""
+    event = api_client.resolve_appointment(a["event"])
+    if event is not None:
+        note(target=event.to_json())
+    return event
+
+
+def _create(a, resent, note):
+    if resent and api_client.appointment_exists(title=a["title"], start_time=a["start_time"]):
+        return True  # the earlier attempt went through
+    # No read-back: the server may not list it yet, and a retry would create a duplicate
+    return api_client.create_appointment(
+        a["title"], a.get("description", ""), a["start_time"], a["end_time"], a.get("location", "Not specified"),
+        verify=False)
+
+
+def _delete(a, resent, note):
+    if a.get("event") is None:
+        return api_client.delete_appointment(a["title"])  # older journals: looked up by title
+    target = a.get("target")
+    if target is not None:
+        if not api_client.appointment_exists(id=target["id"]):
+            return True  # our own earlier DELETE went through, only the answer got lost
+        return api_client.delete_appointment(a["title"], event_id=target["id"])
+    event = _resolve(a, note)
+    return event is not None and api_client.delete_appointment(a["title"], event_id=event.id)
+
+
+def _modify(a, resent, note):
+    args = {key: value for key, value in a.items() if key not in ("event", "target")}
+    if a.get("event") is None:
+        return api_client.modify_appointment(**args)  # older journals: looked up by title
+    if a.get("target") is None:
+        event = _resolve(a, note)
+        if event is None:
+            return False
+        ok = api_client.modify_appointment(event=event, **args)
+    else:
+        # An earlier attempt got partway: carry on with the appointment it acted on
+        event = Appointment.from_json(a["target"])
+        ok = api_client.modify_appointment(event=event, resent=True, **args)
+    if not ok:
+        # update_appointment rolls back a failed replace: the original is then
+        # back under a new id, and the retry has to start over from that one
+        current = api_client.resolve_appointment(event.to_json())
+        if current is not None and current.id != event.id:
+            note(target=None)
+    return ok
+
+
+OPERATIONS = {
+    "create": _create,
+    "delete": _delete,
+    "modify": _modify,
+}
+
+
+def describe(entry):
+    """Short spoken description of a journaled write."""
+    args = entry["args"]
+    if entry["op"] == "create":
+        return f"create the appointment {args['title']}"
+    if entry["op"] == "delete":
+        return f"delete the appointment {args['title']}"
+    return f"update the appointment {args['old_title']}"
+
+
+class CalendarOutbox:
+    """
+    Write-behind queue for calendar mutations.
+
+    Every write is journaled to disk before the user is told it's done, then
+    sent to calendar.php by one background worker, strictly in submission order
+    (a write is retried until it succeeds or gives up before the next one runs).
+    Writes that are still in the journal when the program exits are resumed on
+    the next start. While calendar.php is unreachable writes wait without
+    using up their attempts. Writes that give up are kept in self.failures until
+    pop_failures() is called, so the assistant can mention them on the next turn.
+    """
+
+    def __init__(self, path=OUTBOX_FILE, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.failures = []
+        self._lock = threading.Condition()
+        self._worker = None
+        self._busy = False
+        self._backing_off = False
+        self._entries = self._load()
+        self.version = 0  # bumped whenever the set of queued writes changes
+
+    # --- JOURNAL ---
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, list) else []
+        except Exception as e:
+            print(f"[Outbox] Could not read {self.path}: {e}")
+            return []
+
+    def _save(self):
+        # Write to a temp file and rename, so a crash never leaves half a journal
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+    # --- PUBLIC API ---
+
+    def submit(self, op, **args):
+        """
+        Journal a write and return immediately. op is "create", "delete" or "modify".
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown calendar operation: {op}")
+        entry = {"id": uuid.uuid4().hex, "op": op, "args": args, "attempts": 0,
+                 "queued_at": time.time()}
+        with self._lock:
+            self._entries.append(entry)
+            self.version += 1
+            self._save()
+            self._lock.notify_all()
+        self.start()
+        return entry["id"]
+
+    def start(self):
+        """Start the background worker (also resumes writes left over from a previous run)."""
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="calendar-outbox", daemon=True)
+            self._worker.start()
+
+    def pending(self):
+        """Number of writes not yet confirmed by the server."""
+        with self._lock:
+            return len(self._entries)
+
+    def entries(self):
+        """Copy of the writes still waiting, oldest first."""
+        with self._lock:
+            return [dict(e) for e in self._entries]
+
+    def pop_failures(self):
+        """Return (and forget) the writes that gave up since the last call."""
+        with self._lock:
+            failures, self.failures = self.failures, []
+        return failures
+
+    def flush(self, timeout=None, through_retries=True):
+        """
+        Block until every journaled write was processed. Returns False on timeout.
+        With through_retries=False it also returns as soon as the worker is
+        waiting to retry a failed write (no point waiting for a dead server).
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._entries or self._busy:
+                if not through_retries and self._backing_off:
+                    return False
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    # --- WORKER ---
+
+    def _note(self, entry, **args):
+        """Journal extra args of the write being sent (see _resolve), before its next request goes out."""
+        with self._lock:
+            entry["args"].update(args)
+            self._save()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._entries:
+                    self._lock.wait()
+                entry = self._entries[0]
+                self._busy = True
+                resent = entry.get("sent", False)
+                if not resent:
+                    entry["sent"] = True  # journaled before sending: also covers a crash mid-request
+                    self._save()
+
+            try:
+                ok = OPERATIONS[entry["op"]](entry["args"], resent, partial(self._note, entry))
+            except Exception as e:
+                print(f"[Outbox] {entry['op']} failed: {e}")
+                ok = False
+
+            # While the server is unreachable nothing counts as an attempt:
+            # the write simply waits and is sent once the connection is back
+            offline = not ok and api_client.mirror.is_offline()
+            with self._lock:
+                if not offline:
+                    entry["attempts"] += 1
+                done = ok or entry["attempts"] >= self.max_attempts
+                if done:
+                    self._entries.pop(0)
+                    self.version += 1
+                    if not ok:
+                        self.failures.append(entry)
+                        print(f"[Outbox] Giving up on: {describe(entry)}")
+                self._save()
+                self._busy = False
+                self._lock.notify_all()
+
+            if not done:
+                if offline:
+                    delay = api_client.OFFLINE_RETRY
+                else:
+                    # Head-of-line retry keeps later writes in order behind this one
+                    delay = min(self.retry_delay * 2 ** (entry["attempts"] - 1), MAX_RETRY_DELAY)
+                with self._lock:
+                    self._backing_off = True
+                    self._lock.notify_all()
+                time.sleep(delay)
+                with self._lock:
+                    self._backing_off = False
@@ -0,0 +1,189 @@
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+# Per-turn profiling for slow turns that can't be reproduced later.
+# main wraps handle_command (and listen wraps transcribe_audio) in
+# section(turn, label). While profiling is off that is a couple of
+# comparisons; while it is on the turn runs under a stack sampler (or
+# cProfile) plus tracemalloc, and its files are written tagged by turn:
+#
+#   profiles/turn_0007_handle.collapsed    stacks for flamegraph.pl / speedscope
+#   profiles/turn_0007_handle.pstats       with VA_PROFILE_MODE=cprofile
+#   profiles/turn_0007_handle.alloc.txt    top allocation sites, current and peak memory
+#
+# Switching it on:
+#   VA_PROFILE=all | next | 3,7     (env var; main.py --profile does the same)
+#   VA_PROFILE_MIN_MS=200           only keep the files of turns slower than this
+#   "profiling on" / "profiling off" / "profile next turn" as a command,
+#   or SIGUSR1 to toggle a running process
+
+# --- CONFIGURATION ---
+OUTPUT_DIR = os.environ.get("VA_PROFILE_DIR", "profiles")
+MODE = os.environ.get("VA_PROFILE_MODE", "sample")          # "sample" or "cprofile"
+MIN_MS = float(os.environ.get("VA_PROFILE_MIN_MS", "0"))
+SAMPLE_INTERVAL = 0.002    # seconds between stack samples
+TRACE_FRAMES = 10          # traceback depth kept by tracemalloc
+TOP_ALLOCATIONS = 25
+
+enabled = False            # profile every turn
+turns = set()              # ...or only these turn numbers
+once = False               # ...or just the next turn
+_current = threading.local()  # .section: the _Section running on this thread, if any
+
+
+def configure(spec):
+    """'all'/'1'/'on', 'next', 'off'/'0', or a comma-separated list of turn numbers."""
+    global enabled, once
+    spec = (spec or "").strip().lower()
+    enabled, once = spec in ("all", "1", "on", "true"), spec == "next"
+    turns.clear()
+    if spec and not (enabled or once) and spec not in ("off", "0", "false"):
+        turns.update(int(t) for t in spec.split(",") if t.strip().isdigit())
+
+
+def toggle():
+    """Switch profiling of every turn on or off; returns the new state."""
+    configure("off" if enabled else "all")
+    return enabled
+
+
+def profile_next():
+    global once
+    once = True
+
+
+def active(turn):
+    return enabled or once or turn in turns
+
+
+def install_signal():
+    """SIGUSR1 toggles profiling in a running process (POSIX only)."""
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: print(
+            f"\n[profile] {'on' if toggle() else 'off'}"))
+
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds into collapsed-stack counts."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _Section:
+    def __init__(self, turn, label):
+        self.name = f"turn_{turn:04d}_{label}"
+
+    def __enter__(self):
+        import cProfile
+        import tracemalloc
+        _current.section = self
+        self.traced_here = not tracemalloc.is_tracing()
+        if self.traced_here:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        self.profiler = cProfile.Profile() if MODE == "cprofile" else StackSampler()
+        self.t0 = time.perf_counter()
+        if MODE == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        import tracemalloc
+        if MODE == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        elapsed_ms = (time.perf_counter() - self.t0) * 1000
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.traced_here:
+            tracemalloc.stop()
+        _current.section = None
+        if elapsed_ms >= MIN_MS:
+            self.write(elapsed_ms, snapshot, current, peak)
+        return False
+
+    def write(self, elapsed_ms, snapshot, current, peak):
+        import tracemalloc
+        try:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            base = os.path.join(OUTPUT_DIR, self.name)
+            if MODE == "cprofile":
+                path = base + ".pstats"
+                self.profiler.dump_stats(path)
+            else:
+                path = base + ".collapsed"
+                self.profiler.write(path)
+            with open(base + ".alloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"{self.name}: {elapsed_ms:.1f} ms, traced memory {current / 1024:.1f} KiB, "
+                        f"peak {peak / 1024:.1f} KiB\n\n")
+                snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                  tracemalloc.Filter(False, __file__)])
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+            print(f"[profile] {self.name}: {elapsed_ms:.1f} ms -> {path}")
+        except OSError as e:
+            print(f"[profile] Could not write {self.name}: {e}")
+
+
+class _Off:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_OFF = _Off()
+
+
+def section(turn, label):
+    """
+    Context manager profiling one part of a turn, or a no-op if this turn isn't
+    selected. Also a no-op inside another section on the same thread: a
+    follow-up question transcribed during a command belongs to the command's
+    profile (and a second profiler would corrupt the first).
+    """
+    global once
+    if not active(turn) or getattr(_current, "section", None) is not None:
+        return _OFF
+    if label == "handle":
+        once = False  # "next" covers the transcription and the command of one turn
+    return _Section(turn, label)
+
+
+configure(os.environ.get("VA_PROFILE"))
@@ -0,0 +1,220 @@
+import datetime
+import re
+
+from schedule import DEFAULT_DURATION
+
+# Repeating appointments are stored as ONE calendar entry: start_time and
+# end_time are the first occurrence and the description carries the rule,
+# e.g. "RRULE:FREQ=WEEKLY;INTERVAL=1;BYDAY=MO". Occurrences are generated on
+# demand, only for the time window a query looks at, and never stored, so
+# deleting or changing the series is a single write.
+
+RULE_PREFIX = "RRULE:"
+DAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+HORIZON = datetime.timedelta(days=366)   # how far ahead "what's next" looks for an occurrence
+
+EVERY_OTHER = r'\bevery (other|second|two|2)\b|\bbiweekly\b|\bfortnightly\b'
+
+
+# --- SPOKEN RULES ---
+
+def parse_recurrence(text):
+    """
+    Spoken repetition -> rule dict, or None for a one-off appointment:
+    {"freq": "DAILY"/"WEEKLY"/"MONTHLY", "interval": int, "byday": [0-6] or None,
+     "count": occurrences or None, "span": (number, "days"/"weeks"/"months") or None}
+    """
+    text = text.lower()
+    interval = 2 if re.search(EVERY_OTHER, text) else 1
+    days = [i for i, day in enumerate(WEEKDAYS) if re.search(rf'\b{day}s?\b', text)]
+    rule = None
+
+    if re.search(r'\b(every|each) (week ?day|working day|work day)\b|\bon weekdays\b', text):
+        rule = {"freq": "WEEKLY", "byday": [0, 1, 2, 3, 4]}
+    elif re.search(r'\b(every|each) day\b|\bdaily\b', text):
+        rule = {"freq": "DAILY", "byday": None}
+    elif days and re.search(rf'\b(every|each)\b|\b({"|".join(WEEKDAYS)})s\b', text):
+        rule = {"freq": "WEEKLY", "byday": days}
+    elif re.search(r'\b(every|each) (other |second |two |2 )?weeks?\b|\bweekly\b|\bbiweekly\b|\bfortnightly\b', text):
+        rule = {"freq": "WEEKLY", "byday": None}
+    elif re.search(r'\b(every|each) (other |second |two |2 )?months?\b|\bmonthly\b', text):
+        rule = {"freq": "MONTHLY", "byday": None}
+    if rule is None:
+        return None
+
+    rule["interval"] = interval
+    rule["count"] = rule["span"] = None
+    limit = re.search(r'\bfor (\d+) (times|days|weeks|months)\b', text)
+    if limit:
+        number, unit = int(limit.group(1)), limit.group(2)
+        if unit == "times":
+            rule["count"] = number
+        else:
+            rule["span"] = (number, unit)
+    return rule
+
+
+def strip_recurrence(text):
+    """
+    Remove the repetition from a command so the normal date/title parsing
+    still works: "team meeting every monday at 9" -> "team meeting on monday at 9".
+    """
+    text = re.sub(rf'\b(every|each) (other |second )?({"|".join(WEEKDAYS)})s?\b', r'on \3', text)
+    text = re.sub(rf'\bon ({"|".join(WEEKDAYS)})s\b', r'on \1', text)
+    text = re.sub(r'\b(every|each) (other |second |two |2 )?(week ?day|working day|work day|day|weeks?|months?)\b'
+                  r'|\bon weekdays\b|\b(bi)?weekly\b|\bfortnightly\b|\bdaily\b|\bmonthly\b', '', text)
+    text = re.sub(r'\bfor \d+ (times|days|weeks|months)\b', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def describe(rule, start=None):
+    """Spoken form: "every Monday", "every 2 weeks on Tuesday", "every weekday"."""
+    byday = rule.get("byday")
+    if byday is None and start is not None and rule["freq"] == "WEEKLY":
+        byday = [start.weekday()]
+    if rule["freq"] == "DAILY":
+        text = "every day" if rule["interval"] == 1 else f"every {rule['interval']} days"
+    elif rule["freq"] == "MONTHLY":
+        text = "every month" if rule["interval"] == 1 else f"every {rule['interval']} months"
+        if start is not None:
+            text += f" on day {start.day}"
+    elif byday == [0, 1, 2, 3, 4]:
+        text = "every weekday"
+    else:
+        names = " and ".join(WEEKDAYS[d].capitalize() for d in byday or [])
+        text = f"every {names}" if rule["interval"] == 1 else f"every {rule['interval']} weeks on {names}"
+    if rule.get("until"):
+        text += f" until {rule['until']:%Y-%m-%d}"
+    return text
+
+
+# --- STORED RULES ---
+
+def format_rule(rule):
+    """rule dict -> "RRULE:FREQ=WEEKLY;INTERVAL=1;BYDAY=MO[;UNTIL=20261231]" for the description field."""
+    parts = [f"FREQ={rule['freq']}", f"INTERVAL={rule['interval']}"]
+    if rule.get("byday"):
+        parts.append("BYDAY=" + ",".join(DAY_CODES[d] for d in rule["byday"]))
+    if rule.get("until"):
+        parts.append(f"UNTIL={rule['until']:%Y%m%d}")
+    return RULE_PREFIX + ";".join(parts)
+
+
+def parse_rule(description):
+    """The rule stored in an event description, or None for a one-off appointment."""
+    if not description or RULE_PREFIX not in description:
+        return None
+    body = description.split(RULE_PREFIX, 1)[1].split()[0]
+    fields = dict(part.split("=", 1) for part in body.split(";") if "=" in part)
+    try:
+        rule = {"freq": fields["FREQ"], "interval": max(1, int(fields.get("INTERVAL", 1))),
+                "byday": [DAY_CODES.index(code) for code in fields["BYDAY"].split(",")] if "BYDAY" in fields else None,
+                "until": datetime.datetime.strptime(fields["UNTIL"], "%Y%m%d").date() if "UNTIL" in fields else None}
+    except (KeyError, ValueError):
+        return None
+    return rule if rule["freq"] in ("DAILY", "WEEKLY", "MONTHLY") else None
+
+
+def first_start(rule, start):
+    """First occurrence at or after start (e.g. "every weekday" created on a Saturday moves to Monday)."""
+    if rule["freq"] == "WEEKLY" and rule.get("byday"):
+        while start.weekday() not in rule["byday"]:
+            start += datetime.timedelta(days=1)
+    return start
+
+
+def finish_rule(rule, start):
+    """Turn a spoken limit ("for 6 weeks", "for 10 times") into an end date for storage."""
+    rule = dict(rule)
+    rule["until"] = None
+    if rule.get("span"):
+        number, unit = rule["span"]
+        if unit == "months":
+            month = start.month - 1 + number
+            end = start.replace(year=start.year + month // 12, month=month % 12 + 1, day=1)
+        else:
+            end = start + datetime.timedelta(days=number * (7 if unit == "weeks" else 1))
+        rule["until"] = end.date() - datetime.timedelta(days=1)
+    elif rule.get("count"):
+        last = None
+        for n, last in enumerate(_starts(rule, start, start, None), 1):
+            if n >= rule["count"]:
+                break
+        rule["until"] = last.date() if last else None
+    return rule
+
+
+# --- EXPANSION ---
+
+def _starts(rule, dtstart, from_time, to_time):
+    """Start times of the series from from_time (inclusive) up to to_time (exclusive, None = open-ended)."""
+    until = rule.get("until")
+    step = rule["interval"]
+
+    if rule["freq"] == "DAILY":
+        period = datetime.timedelta(days=step)
+        k = max(0, -(-(from_time - dtstart) // period))  # ceiling division: skip whole periods arithmetically
+        while True:
+            moment = dtstart + k * period
+            if (to_time and moment >= to_time) or (until and moment.date() > until):
+                return
+            yield moment
+            k += 1
+
+    elif rule["freq"] == "WEEKLY":
+        byday = sorted(rule.get("byday") or [dtstart.weekday()])
+        week0 = dtstart - datetime.timedelta(days=dtstart.weekday())
+        weeks = max(0, (from_time - week0).days // 7)
+        w = weeks - weeks % step
+        while True:
+            week = week0 + datetime.timedelta(weeks=w)
+            for day in byday:
+                moment = week + datetime.timedelta(days=day)
+                if (to_time and moment >= to_time) or (until and moment.date() > until):
+                    return
+                if moment >= dtstart and moment >= from_time:
+                    yield moment
+            w += step
+
+    else:  # MONTHLY, same day of the month; months without that day are skipped
+        months = max(0, (from_time.year - dtstart.year) * 12 + from_time.month - dtstart.month - 1)
+        m = months - months % step
+        while True:
+            month = dtstart.month - 1 + m
+            year = dtstart.year + month // 12
+            first_of_month = datetime.datetime(year, month % 12 + 1, 1)
+            if (to_time and first_of_month >= to_time) or (until and first_of_month.date() > until):
+                return
+            try:
+                moment = dtstart.replace(year=year, month=month % 12 + 1)
+            except ValueError:
+                moment = None  # e.g. the 31st in a 30-day month
+            if moment is not None and moment >= from_time:
+                if (to_time and moment >= to_time) or (until and moment.date() > until):
+                    return
+                yield moment
+            m += step
+
+
+def occurrences(event, start, end):
+    """
+    Occurrences of a repeating models.Appointment that overlap [start, end),
+    as copies with their own start/end (same id: they all belong to one entry).
+    """
+    rule, dtstart, dtend = event.rule, event.start, event.end
+    if rule is None or dtstart is None:
+        return
+    duration = dtend - dtstart if dtend and dtend > dtstart else DEFAULT_DURATION
+    for moment in _starts(rule, dtstart, start - duration, end):
+        if moment + duration > start:
+            yield event.moved(moment, moment + duration)
+
+
+def expand(events, start, end):
+    """One-off events as they are, repeating ones as their occurrences within [start, end)."""
+    for event in events:
+        if event.rule is None:
+            yield event
+        else:
+            yield from occurrences(event, start, end)
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import time
+
+import speech_module
+from audio_backend import FileAudioSource, RecordingSink
+
+# Headless runner: feeds WAV files through the real capture/endpointing path
+# (record_audio) and collects the spoken answers instead of playing them.
+# Follow-up prompts ("What is the new location?") consume the next file.
+
+DEFAULT_AUDIO_DIR = "test_audio"
+
+
+def collect_wavs(paths):
+    """Expand folders into their sorted .wav files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(".wav")]
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"[WARN] Skipping missing path: {path}")
+    return files
+
+
+def run_replay(paths, speed=None, gap_seconds=3.0):
+    files = collect_wavs(paths)
+    if not files:
+        print("No .wav files to replay.")
+        return None
+
+    source = FileAudioSource(files, gap_seconds=gap_seconds, speed=speed)
+    sink = RecordingSink()
+    speech_module.set_audio_backend(source=source, sink=sink)
+
+    import main  # after the backend swap, so nothing touches the real devices
+
+    print(f"--- REPLAYING {len(files)} FILES ({source.duration:.1f}s of audio) ---")
+    turns = 0
+    start = time.perf_counter()
+    running = True
+    while running and not source.exhausted:
+        audio = speech_module.record_audio(return_array=True)
+        if audio is None:
+            break
+        text = speech_module.transcribe_audio(audio)
+        if text:
+            turns += 1
+            running = main.handle_command(text)
+    main.calendar_outbox.flush(timeout=30)
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "=" * 60)
+    print(f"Turns: {turns}, responses: {len(sink.spoken)}")
+    print(f"Replayed {source.duration:.1f}s of audio in {elapsed:.1f}s "
+          f"({source.duration / max(elapsed, 1e-9):.1f}x real time)")
+    print("=" * 60)
+    return sink.spoken
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the assistant headless on recorded audio.")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_AUDIO_DIR], help="WAV files or folders")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Pace the replay at N x real time (default: as fast as possible)")
+    parser.add_argument("--gap", type=float, default=3.0, help="Seconds of silence after each file")
+    args = parser.parse_args()
+
+    if run_replay(args.paths, speed=args.speed, gap_seconds=args.gap) is None:
+        sys.exit(1)
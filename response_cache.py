@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+
+# Memoized replies. Many turns produce the same answer from the same data:
+# the same city/day forecast sentence, the same "what's on tomorrow" while
+# the calendar hasn't changed. ResponseCache keeps the rendered text per
+# (intent, normalized slots) together with the version of the data it was
+# built from; a lookup with any other version drops the entry. ClipCache
+# keeps synthesized speech per text, so a repeated answer also skips TTS.
+#
+# Both are latency-aware: every entry remembers what it cost to build, and
+# when space runs out the cheapest of the least recently used entries goes
+# first, so the expensive renders survive.
+
+MAX_RESPONSES = 256
+CLIP_BUDGET_BYTES = 32 * 2 ** 20   # synthesized audio kept in memory
+EVICTION_WINDOW = 8                # LRU entries considered per eviction
+
+
+def _evict(entries, cost_of):
+    """Drop the cheapest of the EVICTION_WINDOW least recently used entries; returns that entry."""
+    window = []
+    for key in entries:
+        window.append(key)
+        if len(window) == EVICTION_WINDOW:
+            break
+    victim = min(window, key=lambda k: cost_of(entries[k]))
+    return entries.pop(victim)
+
+
+class ResponseCache:
+    """Rendered reply text keyed by (intent, slots), valid for one data version."""
+
+    def __init__(self, max_entries=MAX_RESPONSES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (intent, slots) -> (version, text, build seconds)
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0                # build seconds not spent thanks to hits
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, intent, slots, version):
+        """The cached text, or None if missing or built from another version of the data."""
+        key = (intent, slots)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self._entries[key]  # the data changed: this reply is stale for good
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved += entry[2]
+        return entry[1]
+
+    def put(self, intent, slots, version, text, cost=0.0):
+        key = (intent, slots)
+        self._entries[key] = (version, text, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _evict(self._entries, lambda entry: entry[2])
+
+    def get_or_build(self, intent, slots, version, build):
+        """Cached text for these inputs, else build() it, remember it and return it."""
+        text = self.get(intent, slots, version)
+        if text is None:
+            t0 = time.perf_counter()
+            text = build()
+            self.put(intent, slots, version, text, time.perf_counter() - t0)
+        return text
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "saved_ms": self.saved * 1000}
+
+
+class ClipCache:
+    """Synthesized (samples, rate) clips keyed by text and voice settings, within a byte budget."""
+
+    def __init__(self, budget_bytes=CLIP_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()   # key -> (clip, bytes, synthesis seconds)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, clip, cost=0.0):
+        size = getattr(clip[0], "nbytes", 0)
+        if size > self.budget_bytes:
+            return
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (clip, size, cost)
+        self.bytes += size
+        while self.bytes > self.budget_bytes:
+            # Synthesis seconds per byte: long, quickly rendered clips go before short, slow ones
+            self.bytes -= _evict(self._entries, lambda entry: entry[2] / max(1, entry[1]))[1]
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "mb": self.bytes / 2 ** 20}
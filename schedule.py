@@ -0,0 +1,101 @@
+import bisect
+import datetime
+
+# Time-based questions about the calendar: what's on a day / week, what's
+# next, am I free, does a new appointment clash with something.
+# Events are models.Appointment, whose start/end are already datetimes; they
+# are kept sorted, so queries are a binary search plus the events returned.
+
+DEFAULT_DURATION = datetime.timedelta(hours=1)
+DAY_START = datetime.time(8, 0)    # free-slot search window
+DAY_END = datetime.time(20, 0)
+
+
+def parse_time(value):
+    """'2026-02-02T15:00' -> datetime, None if missing or malformed."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduleIndex:
+    """
+    Events sorted by start time with a running maximum of end times.
+    The running maximum is non-decreasing, so the first event that can still
+    overlap a given moment is found by bisection too. With window=(start, end)
+    only the events overlapping it are kept.
+    """
+
+    def __init__(self, events, window=None):
+        items = []
+        for event in events:
+            start = event.start
+            if start is None:
+                continue
+            end = event.end
+            if end is None or end <= start:
+                end = start + DEFAULT_DURATION
+            if window and not (start < window[1] and end > window[0]):
+                continue
+            items.append((start, end, event))
+        items.sort(key=lambda item: item[0])
+
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.events = [item[2] for item in items]
+        self.max_ends = []
+        latest = None
+        for end in self.ends:
+            latest = end if latest is None or end > latest else latest
+            self.max_ends.append(latest)
+
+    def __len__(self):
+        return len(self.events)
+
+    def between(self, start, end):
+        """Events overlapping [start, end), in start order, as (start, end, event)."""
+        lo = bisect.bisect_right(self.max_ends, start)
+        hi = bisect.bisect_left(self.starts, end)
+        return [(self.starts[i], self.ends[i], self.events[i])
+                for i in range(lo, hi) if self.ends[i] > start]
+
+    def on_day(self, day):
+        start = datetime.datetime.combine(day, datetime.time.min)
+        return self.between(start, start + datetime.timedelta(days=1))
+
+    def next_after(self, moment):
+        """First event starting at or after moment, as (start, end, event) or None."""
+        i = bisect.bisect_left(self.starts, moment)
+        if i == len(self.starts):
+            return None
+        return self.starts[i], self.ends[i], self.events[i]
+
+    def conflicts(self, start, end):
+        """Events that would overlap a new appointment from start to end."""
+        return self.between(start, end)
+
+    def free_slots(self, day, duration=DEFAULT_DURATION, day_start=DAY_START, day_end=DAY_END):
+        """Gaps of at least duration between day_start and day_end, as (start, end)."""
+        window_start = datetime.datetime.combine(day, day_start)
+        window_end = datetime.datetime.combine(day, day_end)
+        slots = []
+        cursor = window_start
+        for start, end, _ in self.between(window_start, window_end):
+            if start - cursor >= duration:
+                slots.append((cursor, start))
+            cursor = max(cursor, end)
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+        return slots
+
+
+def week_range(today, next_week=False):
+    """(start, end) datetimes from today (or next Monday) until the end of that week."""
+    start = today
+    if next_week:
+        start = today + datetime.timedelta(days=7 - today.weekday())
+    end = start + datetime.timedelta(days=7 - start.weekday())
+    return datetime.datetime.combine(start, datetime.time.min), datetime.datetime.combine(end, datetime.time.min)
@@ -1,62 +1,221 @@
-import sounddevice as sd
-import scipy.io.wavfile as wav
-import pyttsx3
-from faster_whisper import WhisperModel
 import numpy as np
 import os
+import re
 import sys
-import time  # Import time for the pause fix
+import threading
+import time
+from audio_backend import LiveAudioSource, Pyttsx3Sink, AudioSourceExhausted, CaptureBuffer
+from audio_preprocess import Preprocessor, resample, to_float32, to_mono
 
 # --- CONFIGURATION ---
-print("Loading Whisper model... please wait.")
-model = WhisperModel("base", device="cpu", compute_type="int8")
+# faster_whisper and the model are loaded on first use (see get_model),
+# so importing this module stays cheap.
+model = None
+
+# Downmix / resample / normalize / trim silence before decoding (see audio_preprocess.py)
+PREPROCESS_AUDIO = True
+preprocessor = Preprocessor()
+
+# Recording limits
+MAX_UTTERANCE_SECONDS = 20.0  # hard cap, e.g. for a mic stuck above the threshold
+PRE_ROLL_SECONDS = 0.4        # audio kept from just before speech was detected
+capture = None                # reused CaptureBuffer
+wake_capture = None           # separate small buffer for wake word bursts
+last_capture = {}             # stats of the last recording: seconds, overflows, truncated
+
+# Where audio comes from and where speech goes (see audio_backend.py)
+audio_source = LiveAudioSource()
+speech_sink = Pyttsx3Sink()
+
+# Long answers are spoken sentence by sentence (see speak_stream)
+MAX_CHUNK_CHARS = 160         # longer sentences are split further at commas
+SENTENCE_END = re.compile(r'(?<=[.!?])(?<!\d\.)(?<!\bDr\.)(?<!\bMr\.)(?<!\bMrs\.)(?<!\bSt\.)\s+')
+speech_cancel = threading.Event()
+CANCEL_ON_ENTER = True        # Enter stops a streamed answer (voice mode reads nothing else from the console then)
+last_speech = {}              # stats of the last answer: chunks, spoken, first_audio, cancelled
 
 # --- FUNCTIONS ---
 
+def get_model():
+    """Load the Whisper model once, on first use, with the settings calibrated for this machine."""
+    global model
+    if model is None:
+        from faster_whisper import WhisperModel
+        import whisper_calibration
+        config = whisper_calibration.get_config()
+        print(f"Loading Whisper model ({config['model']}, {config['compute_type']}, "
+              f"{config['cpu_threads'] or 'default'} threads)... please wait.")
+        model = WhisperModel(config["model"], device="cpu", compute_type=config["compute_type"],
+                             cpu_threads=config["cpu_threads"])
+    return model
+
+def set_audio_backend(source=None, sink=None):
+    """
+    Swap the capture source and/or speech sink, e.g. FileAudioSource + RecordingSink
+    to run the whole assistant headless.
+    """
+    global audio_source, speech_sink
+    if source is not None: audio_source = source
+    if sink is not None: speech_sink = sink
+
 def speak_text(text):
     """
-    Converts text to speech.
-    Uses 'sapi5' driver (Windows standard) and re-initializes engine
-    each time to prevent audio driver conflicts.
+    Converts text to speech through the current speech sink.
     """
     print(f"\nAssistant: {text}")
-    
-    # FIX 1: Tiny pause to let the microphone release the audio device
-    time.sleep(0.5) 
-    
+    speak_stream(text)
+    if last_speech["chunks"] > 1 and last_speech["first_audio"] is not None:
+        note = f"[speech] first audio after {last_speech['first_audio']:.2f}s"
+        if last_speech["cancelled"]:
+            note += f", stopped after {last_speech['spoken']} of {last_speech['chunks']} parts"
+        print(note)
+
+def split_chunks(text, max_chars=MAX_CHUNK_CHARS):
+    """
+    Break an answer into speakable pieces at line breaks (bullets), sentence
+    ends and, inside very long sentences, commas. The "1." of a numbered list
+    and "Dr." don't end a sentence.
+    """
+    chunks = []
+    for line in text.splitlines():
+        line = line.strip().lstrip("•").strip()
+        for sentence in SENTENCE_END.split(line):
+            sentence = sentence.strip()
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(", ", 0, max_chars)
+                if cut <= 0: break
+                chunks.append(sentence[:cut + 1])
+                sentence = sentence[cut + 2:].strip()
+            if sentence: chunks.append(sentence)
+    return chunks
+
+def cancel_speech():
+    """Drop the rest of the answer being spoken (safe to call from another thread)."""
+    speech_cancel.set()
+
+def enter_pressed():
+    """True if Enter was pressed on the console since the last check; never blocks."""
     try:
-        # FIX 2: Re-initialize engine locally for robustness
-        engine = pyttsx3.init('sapi5') 
-        engine.setProperty('volume', 1.0)
-        engine.setProperty('rate', 170)
-        
-        engine.say(text)
-        engine.runAndWait()
-        
-        # Cleanup (helps prevents errors on next loop)
-        engine.stop()
-        del engine
-    except Exception as e:
-        print(f"[Error] TTS failed: {e}")
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+    if msvcrt is not None:
+        pressed = False
+        while msvcrt.kbhit():
+            pressed = msvcrt.getwch() in "\r\n" or pressed
+        return pressed
+    import select
+    if sys.stdin is None or not sys.stdin.isatty() or not select.select([sys.stdin], [], [], 0)[0]:
+        return False
+    sys.stdin.readline()
+    return True
+
+def cancel_on_enter(done):
+    """speak_stream's watcher thread: cancel_speech() on Enter, until done is set."""
+    while not done.wait(0.05):
+        if enter_pressed():
+            cancel_speech()
+            return
+
+def speak_stream(text):
+    """
+    Speak text chunk by chunk: while one sentence plays the next one is
+    synthesized, so a long answer is heard after one sentence of synthesis
+    instead of all of it. cancel_speech(), Enter (in a console) or Ctrl+C stops
+    it after/within the current chunk. Sinks without synthesize/play (NullSink,
+    RecordingSink) go through speak() unchanged, and so does a one-sentence
+    answer unless the sink already has its clip: rendering it to a file first
+    would only add a step.
+    """
+    start = time.perf_counter()
+    speech_cancel.clear()
+    chunks = split_chunks(text)
+    last_speech.clear()
+    last_speech.update(chunks=len(chunks), spoken=0, first_audio=None, cancelled=False)
+    single = len(chunks) == 1 and getattr(speech_sink, "cached", lambda chunk: None)(chunks[0]) is None
+    if not chunks or not hasattr(speech_sink, "synthesize") or single:
+        speech_sink.speak(text)
+        last_speech["spoken"] = len(chunks)
+        return
+
+    done = threading.Event()
+    watcher = None
+    if CANCEL_ON_ENTER and sys.stdin is not None and sys.stdin.isatty():
+        watcher = threading.Thread(target=cancel_on_enter, args=(done,), daemon=True)
+        watcher.start()
+    try:
+        clip = speech_sink.synthesize(chunks[0])
+        # Let the microphone release the audio device, as speak() does; rendering
+        # the first chunk already used up part of that pause
+        time.sleep(max(0.0, start + getattr(speech_sink, "release_seconds", 0.0) - time.perf_counter()))
+        for i, chunk in enumerate(chunks):
+            if speech_cancel.is_set():
+                break
+            if clip is None:
+                speech_sink.speak(chunk)  # synthesis failed: say this one the blocking way
+                duration = 0.0
+            else:
+                duration = speech_sink.play(clip)
+            if last_speech["first_audio"] is None:
+                last_speech["first_audio"] = time.perf_counter() - start
+            ends = time.perf_counter() + duration
+
+            # Render the next chunk while this one is playing
+            clip = speech_sink.synthesize(chunks[i + 1]) if i + 1 < len(chunks) else None
 
-def record_audio(filename="input.wav", silence_threshold=800, silence_duration=2.5, samplerate=16000):
+            if speech_cancel.wait(max(0.0, ends - time.perf_counter())):
+                speech_sink.stop()
+                break
+            speech_sink.wait()
+            last_speech["spoken"] += 1
+    except KeyboardInterrupt:
+        speech_cancel.set()
+        speech_sink.stop()
+    finally:
+        done.set()
+        if watcher is not None:
+            watcher.join()  # before the caller reads the console again
+    last_speech["cancelled"] = last_speech["spoken"] < len(chunks)
+
+def get_capture_buffer(samplerate, max_duration, pre_roll):
+    """Reuse the preallocated capture buffer unless the settings changed."""
+    global capture
+    if capture is None or (capture.samplerate, capture.capacity, capture.pre_roll) != \
+            (samplerate, int(pre_roll * samplerate) + int(max_duration * samplerate), int(pre_roll * samplerate)):
+        capture = CaptureBuffer(samplerate, max_duration, pre_roll)
+    capture.reset()
+    return capture
+
+def record_audio(filename="input.wav", silence_threshold=800, silence_duration=2.5, samplerate=16000,
+                 max_duration=MAX_UTTERANCE_SECONDS, pre_roll=PRE_ROLL_SECONDS, return_array=False):
     """
     Smart recording with Volume Meter.
+    Writes the utterance to filename and returns the name, or with return_array=True
+    returns it as an int16 view into the capture buffer (no copy, no file; valid
+    until the next recording). Returns None if no speech was heard.
     """
     print("\n[Microphone Active] Waiting for you to speak...")
     
-    audio_data = []
+    buffer = get_capture_buffer(samplerate, max_duration, pre_roll)
     chunk_duration = 0.2 
     chunk_samples = int(chunk_duration * samplerate)
     
     has_started = False
     silence_chunks = 0
     max_silence_chunks = int(silence_duration / chunk_duration)
+    overflows = 0
     
     # Open stream
-    with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16') as stream:
+    with audio_source.open(samplerate, channels=1, dtype='int16') as stream:
         while True:
-            chunk, overflow = stream.read(chunk_samples)
+            try:
+                chunk, overflow = stream.read(chunk_samples)
+            except AudioSourceExhausted:
+                print("\nEnd of replayed audio.")
+                break
+            if overflow:
+                overflows += 1
+            chunk = chunk.reshape(-1)
             
             # Use Peak Amplitude
             volume = np.max(np.abs(chunk))
@@ -72,10 +231,15 @@ def record_audio(filename="input.wav", silence_threshold=800, silence_duration=2
                 if volume > silence_threshold:
                     print("\n\n>>> Speech detected! Recording...")
                     has_started = True
-                    audio_data.append(chunk)
+                    buffer.start()
+                    buffer.append(chunk)
+                else:
+                    buffer.push_pre_roll(chunk)
             else:
                 # RECORDING MODE
-                audio_data.append(chunk)
+                if not buffer.append(chunk):
+                    print(f"\nReached the {max_duration:g}s limit. Stopping recording.")
+                    break
                 
                 if volume < silence_threshold:
                     silence_chunks += 1
@@ -87,19 +251,96 @@ def record_audio(filename="input.wav", silence_threshold=800, silence_duration=2
                     break
     
     # End of recording loop
-    if not audio_data:
+    last_capture.update(seconds=buffer.seconds, overflows=overflows, truncated=buffer.truncated)
+    if overflows:
+        print(f"[Warning] Audio input overflowed {overflows} times, some audio was lost.")
+    if not has_started:
         return None
         
-    full_audio = np.concatenate(audio_data, axis=0)
-    wav.write(filename, samplerate, full_audio)
+    if return_array:
+        return buffer.view()
+    import scipy.io.wavfile as wav
+    wav.write(filename, samplerate, buffer.view())
     return filename
 
-def transcribe_audio(filename="input.wav"):
-    if not os.path.exists(filename):
+def wait_for_wake_word(spotter, samplerate=16000, stats=None, verbose=True):
+    """
+    Hands-free mode: listen until the wake word is heard. Returns True when it
+    fires, False when the audio source runs out.
+    While it's quiet this only reads chunks and checks their peak; short bursts
+    of sound are buffered and handed to the spotter, Whisper is never involved.
+    stats (dict) counts the "bursts" checked and "wakes" fired.
+    """
+    import wake_word
+    global wake_capture
+    if wake_capture is None or wake_capture.samplerate != samplerate:
+        wake_capture = CaptureBuffer(samplerate, wake_word.MAX_BURST_SECONDS, 0.2)
+    burst = wake_capture
+    burst.reset()
+    stats = stats if stats is not None else {}
+    stats.setdefault("bursts", 0)
+    stats.setdefault("wakes", 0)
+
+    chunk_samples = int(0.1 * samplerate)
+    gap_chunks = max(1, int(wake_word.BURST_GAP_SECONDS / 0.1))
+    min_samples = int(wake_word.MIN_BURST_SECONDS * samplerate)
+    in_burst = False
+    quiet_chunks = 0
+
+    with audio_source.open(samplerate, channels=1, dtype='int16') as stream:
+        while True:
+            try:
+                chunk, _ = stream.read(chunk_samples)
+            except AudioSourceExhausted:
+                return False
+            chunk = chunk.reshape(-1)
+            loud = np.max(np.abs(chunk)) > wake_word.GATE_THRESHOLD
+
+            if not in_burst:
+                if loud:
+                    in_burst = True
+                    quiet_chunks = 0
+                    burst.start()
+                    burst.append(chunk)
+                else:
+                    burst.push_pre_roll(chunk)
+                continue
+
+            burst.append(chunk)  # stops growing at the cap and marks the burst as truncated
+            quiet_chunks = 0 if loud else quiet_chunks + 1
+            if quiet_chunks < gap_chunks:
+                continue
+
+            # Burst over: only word-sized ones are worth a look
+            in_burst = False
+            if not burst.truncated and burst.length >= min_samples:
+                stats["bursts"] += 1
+                if spotter.detect(burst.view()):
+                    stats["wakes"] += 1
+                    if verbose: print("\n>>> Wake word detected!")
+                    return True
+            burst.reset()
+
+def transcribe_audio(audio="input.wav", samplerate=16000):
+    """
+    Transcribe a WAV file path, or a PCM array recorded at samplerate.
+    """
+    if isinstance(audio, str):
+        if not os.path.exists(audio):
+            return ""
+        if PREPROCESS_AUDIO:
+            audio = preprocessor.load(audio)
+    elif PREPROCESS_AUDIO:
+        audio = preprocessor.process(audio, samplerate)
+    else:
+        # No trimming or normalizing, but Whisper still needs mono 16 kHz
+        audio = resample(to_mono(to_float32(np.asarray(audio))), samplerate)
+
+    if not isinstance(audio, str) and len(audio) == 0:
         return ""
-    
+
     try:
-        segments, info = model.transcribe(filename, beam_size=5)
+        segments, info = get_model().transcribe(audio, beam_size=5)
         text = " ".join([segment.text for segment in segments])
         
         if text.strip():
@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Measures how long "import main" takes (python -X importtime) and checks
+# that the text-only path never pulls in the audio / ML stack.
+# Exit code 1 if the budget is exceeded or a forbidden module was imported.
+
+STARTUP_BUDGET_MS = 150
+AUDIO_MODULES = ["speech_module", "sounddevice", "pyttsx3", "faster_whisper", "ctranslate2", "scipy", "numpy"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module="main"):
+    """
+    Import module in a fresh interpreter.
+    Returns (total_ms, [(cumulative_ms, name), ...] for every imported module, loaded module names).
+    """
+    code = f"import sys; import {module}; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self_us | cumulative_us | name"
+        fields = line[len("import time:"):].split("|")
+        timings.append((int(fields[1]) / 1000.0, fields[2].strip()))
+
+    total = next((ms for ms, name in timings if name == module), 0.0)
+    return total, timings, set(result.stdout.split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of the text-only entry point.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="Max import time in ms")
+    parser.add_argument("--runs", type=int, default=5, help="Take the best of N runs")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports")
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    total, timings, loaded = min(runs, key=lambda r: r[0])
+
+    print(f"import main: {total:.1f} ms (best of {args.runs}, budget {args.budget:.0f} ms)")
+    print("Slowest imports:")
+    for ms, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    forbidden = [m for m in AUDIO_MODULES if m in loaded]
+    ok = True
+    if forbidden:
+        print(f"FAIL: text-only import pulled in {', '.join(forbidden)}")
+        ok = False
+    if total > args.budget:
+        print(f"FAIL: over budget by {total - args.budget:.1f} ms")
+        ok = False
+    if ok:
+        print("OK")
+    sys.exit(0 if ok else 1)
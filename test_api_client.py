@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+
+import pytest
+
+import api_client
+from api_client import _decode_chunks, iter_json_array
+from calendar_store import CalendarMirror
+
+EVENTS = [{"id": i, "title": f"Termin {i} – Zahnarzt", "start_time": "2026-03-02T09:00", "location": None}
+          for i in range(20)]
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10_000])
+def test_items_at_any_chunk_size(size):
+    assert list(iter_json_array(chunked(json.dumps(EVENTS, indent=2), size))) == EVENTS
+
+
+def test_numbers_split_across_chunks():
+    assert list(iter_json_array(["[12", "3, 4.", "5, -6", "e2]"])) == [123, 4.5, -600.0]
+
+
+def test_empty_array_and_whitespace():
+    assert list(iter_json_array([" \n [ ", " ] "])) == []
+
+
+@pytest.mark.parametrize("body", ['{"error": "no calendar"}', "", "null"])
+def test_not_an_array_yields_nothing(body):
+    assert list(iter_json_array([body])) == []
+
+
+def test_cut_off_array_raises_after_the_complete_items():
+    items = iter_json_array(chunked(json.dumps(EVENTS)[:-40], 16))
+    received = []
+    with pytest.raises(ValueError):
+        for item in items:
+            received.append(item)
+    assert received == EVENTS[:len(received)] and received
+
+
+def test_utf8_split_inside_a_character():
+    body = json.dumps(EVENTS, ensure_ascii=False).encode("utf-8")
+    byte_chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+    assert list(iter_json_array(_decode_chunks(byte_chunks))) == EVENTS
+
+
+# --- _download ---
+
+class StreamedResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def download(tmp_path, monkeypatch):
+    """Run api_client._download against canned responses; returns (download, responses, mirror)."""
+    responses = []
+
+    class Requests:
+        RequestException = IOError
+        ConnectionError = ConnectionError
+        Timeout = TimeoutError
+
+        @staticmethod
+        def get(*args, **kwargs):
+            return responses.pop(0)
+
+    mirror = CalendarMirror(str(tmp_path / "mirror.db"))
+    monkeypatch.setattr(api_client, "requests", Requests)
+    monkeypatch.setattr(api_client, "mirror", mirror)
+    monkeypatch.setattr(api_client.time, "sleep", lambda seconds: None)
+    return api_client._download, responses, mirror
+
+
+def test_download_stores_the_calendar(download):
+    run, responses, mirror = download
+    response = StreamedResponse(json.dumps(EVENTS).encode("utf-8"))
+    responses.append(response)
+    assert run()
+    assert response.closed
+    assert [e.id for e in mirror.appointments()] == [e["id"] for e in EVENTS]
+
+
+def test_download_closes_the_stream_when_parsing_fails(download):
+    run, responses, mirror = download
+    mirror.replace_all(EVENTS[:2])
+    broken = [StreamedResponse(json.dumps(EVENTS).encode("utf-8")[:-30]) for _ in range(2)]
+    responses.extend(broken)
+    assert not run()
+    assert all(response.closed for response in broken)
+    assert [e.id for e in mirror.appointments()] == [0, 1]  # the old copy is kept
+    assert mirror.sync_status()["server_error"]
+
+
+def test_download_closes_error_responses(download):
+    run, responses, mirror = download
+    errors = [StreamedResponse(b"", status_code=500) for _ in range(2)]
+    responses.extend(errors)
+    assert not run()
+    assert all(response.closed for response in errors)
+    assert not mirror.is_offline()  # the server answered: not the same as unreachable
+
+
+# --- One download per command (sync_appointments) ---
+
+@pytest.fixture
+def fetches(tmp_path, monkeypatch):
+    """sync_appointments with _download replaced: returns the list of downloads made so far."""
+    made = []
+    monkeypatch.setattr(api_client, "mirror", CalendarMirror(str(tmp_path / "mirror.db")))
+    monkeypatch.setattr(api_client, "_snapshot", None)
+    monkeypatch.setattr(api_client, "_flight", None)
+    monkeypatch.setattr(api_client, "_write_generation", 0)
+    monkeypatch.setattr(api_client, "_download", lambda: made.append(1) or True)
+    api_client.begin_command()
+    return made
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_reads_of_one_command_share_a_download(fetches):
+    api_client.sync_appointments()
+    api_client.sync_appointments()
+    assert len(fetches) == 1
+    assert api_client.end_command() == {"fetches": 1, "coalesced": 0, "snapshot_hits": 1}
+
+
+def test_a_new_command_downloads_again(fetches):
+    api_client.sync_appointments()
+    api_client.begin_command()
+    api_client.sync_appointments()
+    assert len(fetches) == 2
+
+
+def test_a_write_invalidates_the_snapshot(fetches):
+    api_client.sync_appointments()
+    api_client._note_write()
+    api_client.sync_appointments()
+    assert len(fetches) == 2
+
+
+def test_a_write_finishing_during_the_download_invalidates_it(fetches, monkeypatch):
+    # The download may or may not contain a write whose response came back meanwhile
+    def download():
+        fetches.append(1)
+        api_client._note_write()
+        return True
+
+    monkeypatch.setattr(api_client, "_download", download)
+    api_client.sync_appointments()
+    monkeypatch.setattr(api_client, "_download", lambda: fetches.append(1) or True)
+    api_client.sync_appointments()
+    assert len(fetches) == 2
+
+
+def test_a_failed_download_is_not_a_snapshot(fetches, monkeypatch):
+    monkeypatch.setattr(api_client, "_download", lambda: fetches.append(1) and False)
+    api_client.sync_appointments()
+    api_client.sync_appointments()
+    assert len(fetches) == 2
+
+
+def in_flight(monkeypatch, fetches):
+    """Make the next download block until the returned event is set; returns (release, leader thread)."""
+    release = threading.Event()
+
+    def download():
+        fetches.append(1)
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(api_client, "_download", download)
+    leader = threading.Thread(target=api_client.sync_appointments)
+    leader.start()
+    wait_until(lambda: api_client._flight is not None)
+    return release, leader
+
+
+def test_concurrent_reads_join_the_download_in_flight(fetches, monkeypatch):
+    release, leader = in_flight(monkeypatch, fetches)
+    follower = threading.Thread(target=api_client.sync_appointments)
+    follower.start()
+    wait_until(lambda: api_client.fetch_stats["coalesced"] == 1)
+    assert follower.is_alive()  # waits for the leader's answer instead of sending a GET
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(fetches) == 1
+    assert api_client.end_command() == {"fetches": 1, "coalesced": 1, "snapshot_hits": 0}
+
+
+def test_reads_after_a_write_dont_join_an_older_download(fetches, monkeypatch):
+    release, leader = in_flight(monkeypatch, fetches)
+    api_client._note_write()
+    follower = threading.Thread(target=api_client.sync_appointments)
+    follower.start()
+    wait_until(lambda: len(fetches) == 2)  # its own GET, started while the old one is still running
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert api_client.fetch_stats["coalesced"] == 0
+    assert api_client._flight is None
+
+
+@pytest.mark.parametrize("send", [lambda: api_client._post_appointment({"title": "Gym"}),
+                                  lambda: api_client._delete_by_id(7)])
+def test_a_download_made_while_a_write_is_sent_is_not_reused(fetches, monkeypatch, send):
+    class Requests:
+        RequestException = IOError
+
+        @staticmethod
+        def answer(*args, **kwargs):
+            api_client.sync_appointments()  # another reader, while the server handles the write
+            return StreamedResponse(b"")
+
+        post = delete = answer
+
+    monkeypatch.setattr(api_client, "requests", Requests)
+    assert send()
+    api_client.sync_appointments()
+    assert len(fetches) == 2
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from audio_backend import CaptureBuffer
+
+RATE = 100  # samples per second: a pre-roll of 0.4 s is 40 samples
+
+
+def stream(n, start=0):
+    return np.arange(start, start + n, dtype=np.int16)
+
+
+def capture(pre_roll_chunks, chunk, max_seconds=10.0, pre_roll_seconds=0.4):
+    buffer = CaptureBuffer(RATE, max_seconds, pre_roll_seconds)
+    pushed = 0
+    for _ in range(pre_roll_chunks):
+        buffer.push_pre_roll(stream(chunk, pushed))
+        pushed += chunk
+    buffer.start()
+    return buffer, pushed
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 39, 40, 41, 100])
+@pytest.mark.parametrize("chunks", [1, 2, 5, 13])
+def test_pre_roll_keeps_the_newest_samples_in_order(chunk, chunks):
+    buffer, pushed = capture(chunks, chunk)
+    expected = stream(pushed)[-buffer.pre_roll:]
+    assert np.array_equal(buffer.view(), expected)
+
+
+def test_speech_follows_the_pre_roll():
+    buffer, pushed = capture(9, 7)
+    assert buffer.append(stream(50, pushed))
+    assert np.array_equal(buffer.view(), stream(pushed + 50)[-90:])
+    assert buffer.seconds == pytest.approx(0.9)
+
+
+def test_cap_truncates_and_keeps_what_fits():
+    buffer, pushed = capture(10, 10, max_seconds=1.0)
+    assert buffer.append(stream(60, pushed))
+    assert not buffer.append(stream(60, pushed + 60))
+    assert buffer.truncated
+    assert buffer.length == buffer.capacity == 140
+    assert np.array_equal(buffer.view(), stream(pushed + 100)[-140:])
+    assert not buffer.append(stream(1))  # full: nothing more goes in
+
+
+def test_reset_reuses_the_storage():
+    buffer, pushed = capture(10, 13)
+    data = buffer.data
+    buffer.append(stream(20, pushed))
+    buffer.reset()
+    buffer.push_pre_roll(stream(5, 1000))
+    buffer.start()
+    assert buffer.data is data
+    assert np.array_equal(buffer.view(), stream(5, 1000))
+    assert not buffer.truncated
+
+
+def test_without_pre_roll():
+    buffer, _ = capture(3, 10, pre_roll_seconds=0.0)
+    assert buffer.length == 0
+    buffer.append(stream(5))
+    assert np.array_equal(buffer.view(), stream(5))
@@ -0,0 +1,115 @@
+import pytest
+
+import api_client
+from load_generator import StubBackend, StubResponse
+
+
+class FlakyBackend(StubBackend):
+    """The stub calendar.php, but it can be unreachable, reject some POSTs or lose the answer to a DELETE."""
+
+    def __init__(self):
+        super().__init__()
+        self.offline = False
+        self.reject = lambda appointment: False   # POSTs it answers with HTTP 500
+        self.lose_delete_answers = 0            # DELETEs carried out, then timed out
+
+    def get(self, *args, **kwargs):
+        if self.offline:
+            raise ConnectionError("calendar.php unreachable")
+        return super().get(*args, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        if json is not None:
+            if self.offline:
+                raise ConnectionError("calendar.php unreachable")
+            if self.reject(json):
+                self.calls += 1
+                return StubResponse(500)
+        return super().post(url, data=data, json=json, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        if self.offline:
+            raise ConnectionError("calendar.php unreachable")
+        response = super().delete(*args, **kwargs)
+        if self.lose_delete_answers:
+            self.lose_delete_answers -= 1
+            raise TimeoutError("read timed out")
+        return response
+
+    def state(self):
+        return sorted((e["title"], e["location"]) for e in self.events)
+
+
+@pytest.fixture
+def calendar(stub_calendar, assistant, monkeypatch):
+    """A dentist appointment on the flaky backend, synced; returns (ask, backend, outbox)."""
+    main, _ = stub_calendar
+    backend = FlakyBackend()
+    monkeypatch.setattr(api_client, "requests", backend)
+    monkeypatch.setattr(api_client, "OFFLINE_RETRY", 0.01)
+    assistant("create an appointment dentist tomorrow at 10")
+    assert main.calendar_outbox.flush(timeout=5)
+    api_client.sync_appointments()
+    return assistant, backend, main.calendar_outbox
+
+
+def settle(outbox):
+    assert outbox.flush(timeout=10)
+    return [entry["op"] for entry in outbox.pop_failures()]
+
+
+def test_one_rejected_post_is_rolled_back_and_retried(calendar):
+    ask, backend, outbox = calendar
+    rejected = []
+    backend.reject = lambda a: a["location"] == "Berlin" and not rejected and not rejected.append(a)
+    ask("change the location of the dentist appointment to berlin")
+    assert settle(outbox) == []
+    assert rejected
+    assert backend.state() == [("Dentist", "Berlin")]   # not also the restored original
+
+
+def test_an_update_that_cannot_be_written_keeps_the_original_and_is_reported(calendar):
+    ask, backend, outbox = calendar
+    backend.reject = lambda a: a["location"] == "Berlin"
+    ask("change the location of the dentist appointment to berlin")
+    assert settle(outbox) == ["modify"]
+    assert backend.state() == [("Dentist", "Not specified")]
+
+
+def test_modifies_queued_offline_follow_the_new_id(calendar):
+    ask, backend, outbox = calendar
+    backend.offline = True
+    ask("change the location of the dentist appointment to berlin")
+    ask("change the dentist appointment title to doctor")
+    backend.offline = False
+    assert settle(outbox) == []
+    assert backend.state() == [("Doctor", "Berlin")]
+
+
+def test_delete_queued_after_a_modify_deletes_the_replacement(calendar):
+    ask, backend, outbox = calendar
+    backend.offline = True
+    ask("change the location of the dentist appointment to berlin")
+    assert ask("delete the dentist appointment") == ["Deleting appointment: Dentist."]
+    backend.offline = False
+    assert settle(outbox) == []
+    assert backend.state() == []
+
+
+def test_delete_whose_answer_was_lost_is_done(calendar):
+    ask, backend, outbox = calendar
+    ask("create an appointment dentist on friday at 4")   # same title, kept
+    assert outbox.flush(timeout=5)
+    backend.lose_delete_answers = 1
+    event = next(e for e in api_client.get_appointments() if e.start_time.endswith("T10:00"))
+    outbox.submit("delete", title="Dentist", event=event.to_json())
+    assert settle(outbox) == []
+    assert [e["start_time"][-5:] for e in backend.events] == ["04:00"]   # only the one asked for
+
+
+def test_missing_appointment_is_not_counted_as_deleted(calendar):
+    _, backend, outbox = calendar
+    gone = dict(backend.events[0], id=99, location="Nowhere")   # never on the server like this
+    outbox.submit("delete", title="Dentist", event=gone)
+    assert settle(outbox) == ["delete"]
+    assert backend.state() == [("Dentist", "Not specified")]
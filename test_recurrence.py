@@ -0,0 +1,127 @@
+import datetime
+
+import pytest
+
+from models import Appointment
+from recurrence import describe, expand, finish_rule, first_start, format_rule, occurrences, parse_recurrence, \
+    parse_rule, strip_recurrence
+
+MONDAY = datetime.datetime(2026, 3, 2, 9, 0)
+
+
+def series(rule, start=MONDAY, hours=1):
+    end = start + datetime.timedelta(hours=hours)
+    return Appointment(id=1, title="Series", description=format_rule(rule),
+                       start_time=start.isoformat(), end_time=end.isoformat())
+
+
+def starts(event, start, end):
+    return [occurrence.start for occurrence in occurrences(event, start, end)]
+
+
+def days(n):
+    return datetime.timedelta(days=n)
+
+
+# --- SPOKEN AND STORED RULES ---
+
+@pytest.mark.parametrize("text, freq, interval, byday", [
+    ("team meeting every monday at 9", "WEEKLY", 1, [0]),
+    ("gym on tuesdays and thursdays", "WEEKLY", 1, [1, 3]),
+    ("standup every weekday at 10", "WEEKLY", 1, [0, 1, 2, 3, 4]),
+    ("review every other week", "WEEKLY", 2, None),
+    ("water the plants daily", "DAILY", 1, None),
+    ("rent every month", "MONTHLY", 1, None),
+])
+def test_parse_recurrence(text, freq, interval, byday):
+    rule = parse_recurrence(text)
+    assert (rule["freq"], rule["interval"], rule["byday"]) == (freq, interval, byday)
+
+
+def test_one_off_is_not_a_series():
+    assert parse_recurrence("dentist on monday at 9") is None
+
+
+def test_spoken_limits():
+    assert parse_recurrence("yoga every day for 10 times")["count"] == 10
+    assert parse_recurrence("yoga every day for 6 weeks")["span"] == (6, "weeks")
+
+
+def test_strip_recurrence_keeps_the_day():
+    assert strip_recurrence("team meeting every monday at 9") == "team meeting on monday at 9"
+    assert strip_recurrence("yoga daily for 6 weeks at 7") == "yoga at 7"
+
+
+def test_rule_round_trip():
+    rule = {"freq": "WEEKLY", "interval": 2, "byday": [0, 2], "until": datetime.date(2026, 12, 31)}
+    assert format_rule(rule) == "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20261231"
+    assert parse_rule("Notes RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20261231") == rule
+
+
+@pytest.mark.parametrize("description", [None, "", "just notes", "RRULE:FREQ=YEARLY", "RRULE:INTERVAL=2",
+                                         "RRULE:FREQ=WEEKLY;BYDAY=XX"])
+def test_parse_rule_rejects(description):
+    assert parse_rule(description) is None
+
+
+def test_describe():
+    assert describe({"freq": "WEEKLY", "interval": 1, "byday": [0, 1, 2, 3, 4]}) == "every weekday"
+    assert describe({"freq": "WEEKLY", "interval": 2, "byday": None}, MONDAY) == "every 2 weeks on Monday"
+
+
+def test_first_start_moves_to_a_listed_day():
+    saturday = MONDAY + days(5)
+    assert first_start({"freq": "WEEKLY", "byday": [0, 1, 2, 3, 4]}, saturday) == MONDAY + days(7)
+
+
+def test_finish_rule_count_and_span():
+    daily = {"freq": "DAILY", "interval": 1, "byday": None, "count": 10, "span": None}
+    assert finish_rule(daily, MONDAY)["until"] == (MONDAY + days(9)).date()
+    weekly = {"freq": "WEEKLY", "interval": 1, "byday": None, "count": None, "span": (6, "weeks")}
+    assert finish_rule(weekly, MONDAY)["until"] == (MONDAY + days(41)).date()
+
+
+# --- EXPANSION ---
+
+def test_daily_in_window():
+    event = series({"freq": "DAILY", "interval": 1})
+    assert starts(event, MONDAY + days(100), MONDAY + days(103)) == [MONDAY + days(d) for d in (100, 101, 102)]
+
+
+def test_every_other_week_on_two_days():
+    event = series({"freq": "WEEKLY", "interval": 2, "byday": [0, 2]})
+    assert starts(event, MONDAY, MONDAY + days(21)) == [MONDAY, MONDAY + days(2), MONDAY + days(14),
+                                                        MONDAY + days(16)]
+    # A window in an odd week starts at the next active week
+    assert starts(event, MONDAY + days(7), MONDAY + days(15)) == [MONDAY + days(14)]
+
+
+def test_monthly_skips_months_without_the_day():
+    event = series({"freq": "MONTHLY", "interval": 1}, start=datetime.datetime(2026, 1, 31, 9))
+    assert [s.date() for s in starts(event, datetime.datetime(2026, 1, 1), datetime.datetime(2026, 6, 1))] == \
+        [datetime.date(2026, 1, 31), datetime.date(2026, 3, 31), datetime.date(2026, 5, 31)]
+
+
+def test_until_ends_the_series():
+    event = series({"freq": "DAILY", "interval": 1, "until": (MONDAY + days(2)).date()})
+    assert starts(event, MONDAY, MONDAY + days(10)) == [MONDAY, MONDAY + days(1), MONDAY + days(2)]
+
+
+def test_nothing_before_the_first_occurrence():
+    event = series({"freq": "WEEKLY", "interval": 1})
+    assert starts(event, MONDAY - days(30), MONDAY + days(1)) == [MONDAY]
+
+
+def test_occurrence_running_into_the_window_is_included():
+    event = series({"freq": "DAILY", "interval": 1}, hours=3)
+    window = MONDAY + days(5) + datetime.timedelta(hours=1)
+    occurrence, = occurrences(event, window, window + datetime.timedelta(hours=1))
+    assert (occurrence.start, occurrence.end, occurrence.id) == \
+        (MONDAY + days(5), MONDAY + days(5) + datetime.timedelta(hours=3), 1)
+
+
+def test_expand_passes_one_offs_through():
+    one_off = Appointment(id=2, title="Dentist", start_time=(MONDAY + days(40)).isoformat())
+    events = list(expand([one_off, series({"freq": "DAILY", "interval": 1})], MONDAY, MONDAY + days(2)))
+    assert events[0] is one_off
+    assert [e.start for e in events[1:]] == [MONDAY, MONDAY + days(1)]
@@ -0,0 +1,131 @@
+import numpy as np
+
+from models import Forecast, ForecastDay
+from response_cache import EVICTION_WINDOW, ClipCache, ResponseCache
+
+
+def test_hit_for_the_same_version():
+    cache = ResponseCache()
+    cache.put("weather", ("berlin", 0), "v1", "Sunny.", cost=0.2)
+    assert cache.get("weather", ("berlin", 0), "v1") == "Sunny."
+    assert cache.stats()["hits"] == 1 and cache.saved == 0.2
+
+
+def test_other_version_drops_the_entry():
+    cache = ResponseCache()
+    cache.put("range", ("today",), "v1", "You have 1 appointment.")
+    assert cache.get("range", ("today",), "v2") is None
+    assert len(cache) == 0
+    assert cache.get("range", ("today",), "v1") is None  # stale for good, even for the old version
+
+
+def test_get_or_build_builds_once_per_version():
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return f"reply {len(builds)}"
+
+    assert cache.get_or_build("range", ("today",), 1, build) == "reply 1"
+    assert cache.get_or_build("range", ("today",), 1, build) == "reply 1"
+    assert cache.get_or_build("range", ("today",), 2, build) == "reply 2"
+    assert len(builds) == 2
+
+
+def test_eviction_drops_the_cheapest_least_recently_used():
+    size = EVICTION_WINDOW + 2
+    costs = {i: 1.0 + i for i in range(size)}
+    costs.update({4: 0.5, 1: 0.01, size - 1: 0.001})
+    cache = ResponseCache(max_entries=size)
+    for i in range(size):
+        cache.put("intent", (i,), 1, f"reply {i}", cost=costs[i])
+    cache.get("intent", (1,), 1)    # cheap, but just used: out of the eviction window
+    cache.put("intent", ("new",), 1, "new reply", cost=1.0)
+    assert len(cache) == size
+    assert cache.get("intent", (4,), 1) is None
+    assert all(cache.get("intent", (i,), 1) == f"reply {i}" for i in range(size) if i != 4)
+
+
+def test_eviction_only_looks_at_the_oldest_entries():
+    size = EVICTION_WINDOW * 2
+    cache = ResponseCache(max_entries=size)
+    for i in range(size):
+        cache.put("intent", (i,), 1, "", cost=0.0 if i == size - 1 else 1.0 + i)
+    cache.put("intent", ("new",), 1, "", cost=5.0)
+    assert cache.get("intent", (size - 1,), 1) == ""   # cheapest overall, but recent
+    assert cache.get("intent", (0,), 1) is None         # cheapest of the oldest window
+
+
+def test_clip_cache_byte_budget():
+    clip = lambda n: (np.zeros(n, dtype=np.int16), 16000)
+    cache = ClipCache(budget_bytes=1000)
+    cache.put("slow", clip(200), cost=1.0)      # 400 bytes
+    cache.put("fast", clip(200), cost=0.01)     # 400 bytes, cheap to render again
+    cache.put("next", clip(200), cost=0.5)
+    assert cache.bytes <= 1000
+    assert cache.get("fast") is None
+    assert cache.get("slow") is not None and cache.get("next") is not None
+    cache.put("huge", clip(1000), cost=9.0)     # bigger than the whole budget: not kept
+    assert cache.get("huge") is None and cache.stats()["entries"] == 2
+
+
+def test_forecast_version_covers_all_fields():
+    def forecast(place="Berlin", temp_max=11):
+        return Forecast(place, [ForecastDay("Monday", "Rain", 4, temp_max), ForecastDay("Tuesday", "Clear", 2, 9)])
+
+    assert forecast().version == forecast().version
+    assert forecast().version != forecast(place="Hamburg").version
+    assert forecast().version != forecast(temp_max=12).version
+
+
+# --- Replaying cached clips (speech_module.speak_stream) ---
+
+class ClipSink:
+    """Pyttsx3Sink's interface without pyttsx3: logs what it was asked to do."""
+
+    def __init__(self):
+        self.clips = ClipCache()
+        self.log = []
+
+    def cached(self, text):
+        return self.clips.get(text)
+
+    def synthesize(self, text):
+        clip = self.clips.get(text)
+        if clip is None:
+            self.log.append("synthesize")
+            clip = (np.zeros(10, dtype=np.int16), 16000)
+            self.clips.put(text, clip)
+        return clip
+
+    def speak(self, text):
+        self.log.append("speak")
+
+    def play(self, clip):
+        self.log.append("play")
+        return 0.0
+
+    def wait(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def test_speak_stream_replays_cached_clips(monkeypatch):
+    import speech_module
+    sink = ClipSink()
+    monkeypatch.setattr(speech_module, "speech_sink", sink)
+    monkeypatch.setattr(speech_module, "CANCEL_ON_ENTER", False)
+
+    speech_module.speak_stream("Nothing today.")
+    assert sink.log == ["speak"]   # uncached single sentence: no detour through a rendered file
+
+    sink.log.clear()
+    speech_module.speak_stream("Monday is dry. Nothing today.")
+    assert sink.log == ["synthesize", "play", "synthesize", "play"]
+
+    sink.log.clear()
+    speech_module.speak_stream("Nothing today.")
+    assert sink.log == ["play"]    # rendered by the longer answer: replayed from the cache
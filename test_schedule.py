@@ -0,0 +1,117 @@
+import datetime
+
+import pytest
+
+from models import Appointment
+from recurrence import format_rule
+from schedule import DEFAULT_DURATION, ScheduleIndex, parse_time, week_range
+
+DAY = datetime.date(2026, 3, 2)  # a Monday
+
+
+def at(hour, minute=0, day=DAY):
+    return datetime.datetime.combine(day, datetime.time(hour, minute))
+
+
+def appointment(title, start, end=None):
+    return Appointment(title=title, start_time=start.isoformat() if start else None,
+                       end_time=end.isoformat() if end else None)
+
+
+@pytest.fixture
+def index():
+    return ScheduleIndex([
+        appointment("Lunch", at(12), at(13)),
+        appointment("Dentist", at(9), at(10)),
+        appointment("Workshop", at(14), at(18)),
+        appointment("Call", at(15), at(15, 30)),      # inside the workshop
+        appointment("No end", at(19)),                 # DEFAULT_DURATION
+        appointment("Broken", None),                   # no start: left out
+    ])
+
+
+def test_events_are_sorted_and_undated_ones_skipped(index):
+    assert [e.title for e in index.events] == ["Dentist", "Lunch", "Workshop", "Call", "No end"]
+    assert index.ends[-1] == at(19) + DEFAULT_DURATION
+
+
+def test_conflicts_overlap_only(index):
+    assert [e.title for _, _, e in index.conflicts(at(9, 30), at(10, 30))] == ["Dentist"]
+    assert index.conflicts(at(10), at(11)) == []      # starts when the dentist ends
+    assert index.conflicts(at(11), at(12)) == []      # ends when lunch starts
+
+
+def test_conflicts_find_long_event_started_earlier(index):
+    # The call ends at 15:30 but the workshop still runs: the running max end finds it
+    assert [e.title for _, _, e in index.conflicts(at(16), at(17))] == ["Workshop"]
+
+
+def test_window_keeps_only_overlapping_events(index):
+    windowed = ScheduleIndex(index.events, window=(at(14, 30), at(16)))
+    assert [e.title for e in windowed.events] == ["Workshop", "Call"]
+    assert windowed.conflicts(at(14, 30), at(16)) == index.conflicts(at(14, 30), at(16))
+
+
+def test_free_slots_between_day_start_and_end(index):
+    assert index.free_slots(DAY) == [(at(8), at(9)), (at(10), at(12)), (at(13), at(14)), (at(18), at(19))]
+
+
+def test_free_slots_respect_duration(index):
+    assert index.free_slots(DAY, duration=datetime.timedelta(hours=2)) == [(at(10), at(12))]
+
+
+def test_free_slots_empty_day():
+    assert ScheduleIndex([]).free_slots(DAY) == [(at(8), at(20))]
+
+
+def test_next_after(index):
+    assert index.next_after(at(13, 30))[2].title == "Workshop"
+    assert index.next_after(at(20)) is None
+
+
+def test_parse_time_rejects_malformed():
+    assert parse_time("2026-03-02T15:00") == at(15)
+    assert parse_time("2026-02-30T10:00") is None
+    assert parse_time("") is None
+
+
+def test_week_range():
+    wednesday = DAY + datetime.timedelta(days=2)
+    assert week_range(wednesday) == (at(0, day=wednesday), at(0, day=DAY + datetime.timedelta(days=7)))
+    assert week_range(wednesday, next_week=True) == (at(0, day=DAY + datetime.timedelta(days=7)),
+                                                     at(0, day=DAY + datetime.timedelta(days=14)))
+
+
+# --- Through handle_command, against the load generator's stub backend ---
+
+def test_availability_late_evening(assistant):
+    # The hour after 11 pm used to be built as T24:00 and crash
+    assert assistant("am i free tomorrow at 11 pm") == ["Yes, you are free tomorrow at 23:00."]
+
+
+def test_availability_impossible_date(assistant):
+    # Used to raise ValueError out of parse_query_range
+    assert assistant("am i free on february 30") == ["I didn't understand that time."]
+
+
+def test_availability_answers(assistant):
+    assistant("create an appointment dentist tomorrow at 10")
+    assert assistant("am i free tomorrow at 10")[-1].startswith("No,")
+    assert assistant("am i free tomorrow at 3")[-1].startswith("Yes, you are free")
+
+
+def test_availability_late_evening_booked(assistant):
+    # The slot's end used to wrap to 00:00 of the same day, so nothing clashed
+    assistant("create an appointment movie tomorrow at 11 pm")
+    assert assistant("am i free tomorrow at 11 pm")[-1].startswith("No,")
+
+
+def test_next_appointment_sees_series_beyond_the_cached_window(stub_calendar, assistant):
+    # The cached index passes the one-off through but has no occurrences after its window
+    _, backend = stub_calendar
+    today = datetime.date.today()
+    monthly = at(9, day=today + datetime.timedelta(days=29))
+    backend.post(None, json=appointment("Rent", monthly, monthly + datetime.timedelta(hours=1)).to_json()
+                 | {"description": format_rule({"freq": "MONTHLY", "interval": 1})})
+    backend.post(None, json=appointment("Dentist", at(10, day=today + datetime.timedelta(days=45))).to_json())
+    assert assistant("when is my next appointment") == [f"Your next appointment is on {monthly:%Y-%m-%d} at 09:00."]
@@ -0,0 +1,146 @@
+import difflib
+import re
+from collections import Counter, defaultdict
+
+# Fuzzy lookup of appointment titles as Whisper hears them: "Dentist" may
+# arrive as "dennis", "Homework" as "home work". Every title is indexed by
+# the character trigrams of its spelling and of a rough phonetic key, so a
+# lookup only scores the few titles that share sounds with the query.
+
+MIN_SCORE = 0.6     # below this a lookup finds nothing
+CANDIDATES = 10     # titles scored in full per lookup
+
+# Words in a command that are never part of the title being talked about
+COMMAND_WORDS = {"the", "a", "an", "my", "please", "delete", "remove", "cancel", "change", "modify", "move",
+                 "rename", "add", "appointment", "appointments", "meeting", "event", "reminder", "remainder",
+                 "calendar", "called", "titled", "named", "location", "place", "title", "name", "date",
+                 "time", "of", "to", "for", "and", "on", "at", "in", "is", "i", "can", "you", "want",
+                 "first", "second", "third", "last", "previous", "recently", "today", "tomorrow",
+                 "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"}
+
+PHONETIC_DIGRAPHS = [("ph", "f"), ("th", "t"), ("ck", "k"), ("sh", "s"), ("ch", "k"), ("gh", "g"),
+                     ("wh", "w"), ("qu", "kw"), ("x", "ks")]
+PHONETIC_LETTERS = str.maketrans({"d": "t", "b": "p", "g": "k", "c": "k", "q": "k", "j": "k",
+                                  "z": "s", "v": "f", "y": "i", "h": ""})
+
+
+def spelling(text):
+    """Lowercase letters and digits only: "Lunch with Anna!" -> "lunchwithanna"."""
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+
+def phonetic_key(text):
+    """
+    Rough sound-alike key: voiced/unvoiced pairs merged (d/t, b/p, g/k),
+    all vowels one symbol, repeats collapsed. "Doctor" and "docter" -> "taktar".
+    """
+    key = spelling(text)
+    for digraph, sound in PHONETIC_DIGRAPHS:
+        key = key.replace(digraph, sound)
+    key = re.sub(r'c(?=[eiy])', 's', key).translate(PHONETIC_LETTERS)
+    key = re.sub(r'[aeiou]', 'a', key)
+    return re.sub(r'(.)\1+', r'\1', key)
+
+
+def trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def title_query(text):
+    """The part of a spoken command that can name an appointment ("delete the dentist" -> "dentist")."""
+    return " ".join(w for w in re.findall(r"[a-z0-9']+", text.lower()) if w not in COMMAND_WORDS)
+
+
+class TitleIndex:
+    """
+    Inverted trigram index over a set of titles, kept up to date with
+    add/remove (or sync against a fresh list) instead of being rebuilt.
+    """
+
+    def __init__(self, titles=()):
+        self._counts = Counter()               # title -> number of events carrying it
+        self._keys = {}                        # title -> (spelling, phonetic key, spelling trigrams, all grams)
+        self._by_spelling = defaultdict(set)   # exact lookups
+        self._postings = defaultdict(set)      # trigram -> titles
+        for title in titles:
+            self.add(title)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, title):
+        return title in self._keys
+
+    def add(self, title):
+        if not title or not title.strip():
+            return
+        self._counts[title] += 1
+        if title in self._keys:
+            return
+        spelled, sound = spelling(title), phonetic_key(title)
+        spelled_grams = trigrams(spelled)
+        grams = {"s" + g for g in spelled_grams} | {"p" + g for g in trigrams(sound)}
+        self._keys[title] = (spelled, sound, spelled_grams, grams)
+        self._by_spelling[spelled].add(title)
+        for gram in grams:
+            self._postings[gram].add(title)
+
+    def remove(self, title):
+        if title not in self._keys:
+            return
+        self._counts[title] -= 1
+        if self._counts[title] > 0:
+            return
+        del self._counts[title]
+        spelled, _, _, grams = self._keys.pop(title)
+        self._by_spelling[spelled].discard(title)
+        if not self._by_spelling[spelled]:
+            del self._by_spelling[spelled]
+        for gram in grams:
+            self._postings[gram].discard(title)
+            if not self._postings[gram]:
+                del self._postings[gram]
+
+    def sync(self, titles):
+        """Bring the index in line with a fresh list of titles, touching only what changed."""
+        wanted = Counter(t for t in titles if t and t.strip())
+        if wanted == self._counts:
+            return
+        for title, count in (self._counts - wanted).items():
+            for _ in range(count):
+                self.remove(title)
+        for title, count in (wanted - self._counts).items():
+            for _ in range(count):
+                self.add(title)
+
+    def search(self, query, limit=3):
+        """Best matching titles as [(score, title), ...], best first. 1.0 is an exact match."""
+        spelled, sound = spelling(query), phonetic_key(query)
+        if not spelled:
+            return []
+        exact = self._by_spelling.get(spelled)
+        if exact:
+            return [(1.0, title) for title in sorted(exact)][:limit]
+
+        q_grams = trigrams(spelled)
+        shared = Counter()
+        for gram in {"s" + g for g in q_grams} | {"p" + g for g in trigrams(sound)}:
+            shared.update(self._postings.get(gram, ()))
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(sound)  # the query side is analysed once
+
+        results = []
+        for title, _ in shared.most_common(CANDIDATES):
+            t_spelled, t_sound, t_grams, _ = self._keys[title]
+            if len(spelled) >= 3 and (spelled in t_spelled or t_spelled in spelled):
+                score = 0.9  # one contains the other: "dentist" / "dentist tomorrow"
+            else:
+                score = 2.0 * len(q_grams & t_grams) / (len(q_grams) + len(t_grams))
+                matcher.set_seq1(t_sound)
+                if matcher.quick_ratio() > score:  # cheap upper bound before the full comparison
+                    score = max(score, matcher.ratio())
+                score *= 0.85
+            results.append((score, title))
+        results.sort(key=lambda r: (-r[0], r[1]))
+        return results[:limit]
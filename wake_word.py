@@ -0,0 +1,238 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Hands-free activation without running Whisper all the time.
+# Two cheap stages run on the capture stream (see speech_module.wait_for_wake_word):
+#   1. an energy gate: a peak check per 100 ms chunk, nothing else while it's quiet
+#   2. a keyword spotter on each short burst of sound: log-mel features compared
+#      by dynamic time warping against a few enrolled recordings of the wake word
+# Only when the spotter fires is the normal record_audio + Whisper turn started.
+#
+#   python wake_word.py --enroll                 (say the wake word 3 times)
+#   python wake_word.py --enroll-files a.wav b.wav c.wav
+#   python wake_word.py --measure test_audio     (CPU / memory of the waiting loop)
+
+# --- CONFIGURATION ---
+TEMPLATE_FILE = "wake_templates.npz"
+SAMPLERATE = 16000
+GATE_THRESHOLD = 800        # peak amplitude that opens the gate (same scale as record_audio)
+MIN_BURST_SECONDS = 0.25    # shorter bursts are clicks, not words
+MAX_BURST_SECONDS = 2.0     # longer bursts are conversation, not the wake word
+BURST_GAP_SECONDS = 0.3     # quiet time that ends a burst
+DEFAULT_THRESHOLD = 1.2     # DTW distance for a single template (more templates calibrate it)
+THRESHOLD_MARGIN = 1.25     # accept up to this times the largest distance between templates
+
+# Steady-state budgets for small always-on boxes (waiting loop only, model excluded)
+CPU_BUDGET = 0.05           # fraction of one core
+MEMORY_BUDGET_MB = 150
+
+FRAME = 400                 # 25 ms
+HOP = 160                   # 10 ms
+N_FFT = 512
+N_MELS = 24
+TRIM_DB = -35.0             # frames this far below the loudest are silence
+BAND = 0.25                 # DTW search band, as a fraction of the longer sequence
+
+_filterbank = None
+
+
+def mel_filterbank(samplerate=SAMPLERATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Triangular mel filters, (n_mels, n_fft // 2 + 1); built once."""
+    global _filterbank
+    if _filterbank is not None:
+        return _filterbank
+    mel = lambda hz: 2595.0 * np.log10(1.0 + hz / 700.0)
+    hz = lambda m: 700.0 * (10 ** (m / 2595.0) - 1.0)
+    edges = hz(np.linspace(mel(60.0), mel(samplerate / 2.0), n_mels + 2))
+    bins = np.floor((n_fft + 1) * edges / samplerate).astype(int)
+    bank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for i in range(n_mels):
+        left, centre, right = bins[i], bins[i + 1], bins[i + 2]
+        if centre > left:
+            bank[i, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            bank[i, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    _filterbank = bank
+    return bank
+
+
+def features(audio):
+    """int16 / float mono audio -> (frames, N_MELS) log-mel energies, mean-normalized per band."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FRAME:
+        audio = np.pad(audio, (0, FRAME - len(audio)))
+    n_frames = 1 + (len(audio) - FRAME) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        audio, shape=(n_frames, FRAME), strides=(audio.strides[0] * HOP, audio.strides[0]))
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME).astype(np.float32), n=N_FFT)) ** 2
+    mel = spectrum @ mel_filterbank().T
+
+    # Only the voiced part: leading/trailing frames far below the loudest one are dropped
+    energy = mel.sum(axis=1)
+    voiced = np.flatnonzero(energy > energy.max() * 10 ** (TRIM_DB / 10.0))
+    if len(voiced):
+        mel = mel[voiced[0]:voiced[-1] + 1]
+    logmel = np.log(mel + mel.max() * 1e-4 + 1e-9)  # floor relative to the peak, not to zero
+    return logmel - logmel.mean(axis=0)
+
+
+def dtw_distance(a, b, band=BAND):
+    """Average per-step frame distance along the best alignment of a and b (lower = more alike)."""
+    n, m = len(a), len(b)
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).mean(axis=2))
+    width = max(abs(n - m) + 1, int(band * max(n, m)))
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        centre = int(i * m / n)
+        lo, hi = max(1, centre - width), min(m, centre + width)
+        row, prev = acc[i], acc[i - 1]
+        for j in range(lo, hi + 1):
+            row[j] = cost[i - 1, j - 1] + min(prev[j], prev[j - 1], row[j - 1])
+    return acc[n, m] / (n + m)
+
+
+class WakeWordSpotter:
+    """Template matcher for the wake word; threshold calibrated from the templates themselves."""
+
+    def __init__(self, templates, threshold=None):
+        self.templates = list(templates)
+        if threshold is None:
+            threshold = DEFAULT_THRESHOLD
+            if len(self.templates) > 1:
+                spread = max(dtw_distance(a, b) for i, a in enumerate(self.templates)
+                             for b in self.templates[i + 1:])
+                threshold = spread * THRESHOLD_MARGIN
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path=TEMPLATE_FILE):
+        """Enrolled spotter, or None if nothing was enrolled yet."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            templates = [data[k] for k in sorted(k for k in data.files if k.startswith("template_"))]
+            threshold = float(data["threshold"]) if "threshold" in data.files else None
+        return cls(templates, threshold) if templates else None
+
+    def save(self, path=TEMPLATE_FILE):
+        arrays = {f"template_{i:02d}": t for i, t in enumerate(self.templates)}
+        np.savez(path, threshold=self.threshold, **arrays)
+
+    def score(self, audio):
+        feats = features(audio)
+        return min(dtw_distance(feats, t) for t in self.templates)
+
+    def detect(self, audio):
+        return self.score(audio) <= self.threshold
+
+
+class ResourceMeter:
+    """
+    CPU share of one core and resident memory of this process since start().
+    loop_mb is the resident memory above baseline_mb (taken once Whisper is
+    loaded), which is what MEMORY_BUDGET_MB is about; without a baseline it
+    is the whole process.
+    """
+
+    def __init__(self, baseline_mb=None):
+        self.baseline_mb = baseline_mb
+
+    def start(self):
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def report(self):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        rss = resident_mb()
+        loop = rss - self.baseline_mb if rss is not None and self.baseline_mb is not None else rss
+        return {"seconds": wall, "cpu": cpu / wall if wall > 0 else 0.0, "rss_mb": rss, "loop_mb": loop}
+
+
+def resident_mb():
+    """Current resident set size in MB (None where it can't be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        return None
+
+
+def format_usage(usage, stats=None):
+    rss = f"{usage['rss_mb']:.0f} MB" if usage["rss_mb"] is not None else "n/a"
+    if usage["rss_mb"] is not None and usage["loop_mb"] != usage["rss_mb"]:
+        rss += f" ({usage['loop_mb']:+.0f} MB for the waiting loop)"
+    line = f"[wake] {usage['seconds']:.0f}s idle, CPU {usage['cpu'] * 100:.1f}% of a core, RSS {rss}"
+    if stats:
+        line += f", {stats['bursts']} bursts checked, {stats['wakes']} wakes"
+    return line
+
+
+def within_budget(usage):
+    return usage["cpu"] <= CPU_BUDGET and (usage["loop_mb"] is None or usage["loop_mb"] <= MEMORY_BUDGET_MB)
+
+
+# --- CLI ---
+
+def enroll_from_microphone(count):
+    import speech_module
+    templates = []
+    for i in range(count):
+        speech_module.speak_text(f"Say the wake word ({i + 1} of {count}).")
+        audio = speech_module.record_audio(silence_duration=0.8, max_duration=MAX_BURST_SECONDS, return_array=True)
+        if audio is not None and len(audio):
+            templates.append(features(audio))
+    return templates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll or measure the wake word spotter.")
+    parser.add_argument("--enroll", action="store_true", help="Record the wake word from the microphone")
+    parser.add_argument("--enroll-files", nargs="+", help="Use these WAV recordings of the wake word instead")
+    parser.add_argument("--count", type=int, default=3, help="Recordings to take with --enroll")
+    parser.add_argument("--measure", nargs="+", help="Replay WAV files/folders in real time through the waiting loop")
+    args = parser.parse_args()
+
+    if args.enroll or args.enroll_files:
+        if args.enroll_files:
+            from audio_backend import load_wav
+            templates = [features(load_wav(path, SAMPLERATE)) for path in args.enroll_files]
+        else:
+            templates = enroll_from_microphone(args.count)
+        if not templates:
+            print("Nothing recorded.")
+            sys.exit(1)
+        spotter = WakeWordSpotter(templates)
+        spotter.save()
+        print(f"Saved {len(templates)} templates to {TEMPLATE_FILE} (threshold {spotter.threshold:.3f}).")
+
+    elif args.measure:
+        import speech_module
+        from audio_backend import FileAudioSource, RecordingSink
+        from replay import collect_wavs
+
+        spotter = WakeWordSpotter.load()
+        if spotter is None:
+            print(f"No {TEMPLATE_FILE}; enroll first.")
+            sys.exit(1)
+        speech_module.set_audio_backend(FileAudioSource(collect_wavs(args.measure), speed=1.0), RecordingSink())
+        meter = ResourceMeter(resident_mb()).start()  # the loop's own memory, not the imports
+        stats = {"bursts": 0, "wakes": 0}
+        while speech_module.wait_for_wake_word(spotter, stats=stats, verbose=False):
+            pass
+        usage = meter.report()
+        print(format_usage(usage, stats))
+        print(f"Budget: CPU {CPU_BUDGET * 100:.0f}% of a core, {MEMORY_BUDGET_MB} MB -> "
+              f"{'OK' if within_budget(usage) else 'OVER'}")
+    else:
+        parser.print_help()
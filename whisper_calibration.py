@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import platform
+import re
+import time
+
+# Picks the Whisper model / compute type / thread count for this machine.
+# Every candidate decodes a bundled reference clip; the most accurate one
+# whose decode time meets the per-turn latency target wins. The decision is
+# cached in whisper_config.json, so later starts load it directly; it is
+# redone when the machine, the target or faster_whisper changes. A target
+# given on the command line is kept with the decision and used at runtime
+# from then on (WHISPER_LATENCY_TARGET overrides it).
+#
+#   python whisper_calibration.py                 (at install time)
+#   python whisper_calibration.py --target 1.0 --force
+
+# --- CONFIGURATION ---
+CONFIG_FILE = "whisper_config.json"
+REFERENCE_CLIP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_reference.wav")
+REFERENCE_TEXT = "weather in marburg tomorrow"
+LATENCY_TARGET = 1.5        # seconds to decode one turn (the 4.8 s reference clip)
+
+# Most accurate first; float32 is the reference, int8 the cheapest
+MODELS = ["small", "base", "tiny"]
+COMPUTE_TYPES = ["float32", "int8_float32", "int8"]
+DEFAULT_CONFIG = {"model": "base", "compute_type": "int8", "cpu_threads": 0}  # 0 = ctranslate2 default
+
+
+def thread_options():
+    cores = os.cpu_count() or 1
+    return sorted({cores, max(1, cores // 2), min(cores, 4), min(cores, 2)}, reverse=True)
+
+
+def fingerprint(target):
+    """What the decision depends on; a cached decision for another fingerprint is ignored."""
+    try:
+        from importlib.metadata import version
+        fw_version = version("faster-whisper")
+    except Exception:
+        fw_version = None
+    return {"target": target, "cpu_count": os.cpu_count(), "machine": platform.machine(),
+            "system": platform.system(), "faster_whisper": fw_version}
+
+
+def word_error(heard, expected):
+    """Word error rate of heard against expected (0.0 = perfect)."""
+    norm = lambda s: re.sub(r"[^a-z0-9 ]", " ", s.lower()).split()
+    a, b = norm(heard), norm(expected)
+    row = list(range(len(b) + 1))
+    for i, word in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, ref in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (word != ref))
+    return row[-1] / max(1, len(b))
+
+
+def measure(model_name, compute_type, cpu_threads, audio, runs=2):
+    """(best decode seconds, transcript) for one configuration; None if it can't run here."""
+    from faster_whisper import WhisperModel
+    try:
+        model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+    except (ValueError, RuntimeError, OSError) as e:  # OSError: model not downloadable here
+        print(f"  {model_name}/{compute_type}: not available ({e})")
+        return None
+
+    def decode():
+        segments, _ = model.transcribe(audio, beam_size=5)
+        return " ".join(segment.text for segment in segments).strip()
+
+    decode()  # warm-up
+    best, text = float("inf"), ""
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        text = decode()
+        best = min(best, time.perf_counter() - t0)
+    return best, text
+
+
+def calibrate(target=LATENCY_TARGET, clip=REFERENCE_CLIP, reference_text=REFERENCE_TEXT, runs=2):
+    """
+    Benchmark the candidates and return the chosen config plus all measurements.
+    Candidates are tried cheapest model first: once a model misses the target
+    with its fastest compute type, the bigger ones are not even loaded.
+    """
+    from audio_preprocess import Preprocessor
+    audio = Preprocessor().load(clip).copy()  # a copy: the preprocessor reuses its buffer
+    threads = thread_options()[0]
+
+    results = []
+    for model_name in reversed(MODELS):
+        fits = False
+        for compute_type in reversed(COMPUTE_TYPES):
+            outcome = measure(model_name, compute_type, threads, audio, runs)
+            if outcome is None:
+                continue
+            latency, text = outcome
+            error = word_error(text, reference_text)
+            results.append({"model": model_name, "compute_type": compute_type, "cpu_threads": threads,
+                            "latency": round(latency, 3), "word_error": round(error, 3), "text": text})
+            print(f"  {model_name:<6}{compute_type:<14}{latency:7.2f}s  WER {error:.2f}  \"{text}\"")
+            fits = fits or latency <= target
+            if latency > target:
+                break  # a heavier compute type of this model will be slower still
+        if not fits:
+            break
+
+    fitting = [r for r in results if r["latency"] <= target]
+    if fitting:
+        # Lowest measured error, then the larger model / more precise type as tie-break
+        rank = lambda r: (r["word_error"], MODELS.index(r["model"]), COMPUTE_TYPES.index(r["compute_type"]))
+        chosen = dict(min(fitting, key=rank))
+    elif results:
+        print(f"Nothing meets the {target:g}s target; using the fastest configuration.")
+        chosen = dict(min(results, key=lambda r: r["latency"]))
+    else:
+        return dict(DEFAULT_CONFIG), results
+
+    # Threads don't change accuracy: keep the fastest count for the chosen configuration
+    for count in thread_options()[1:]:
+        outcome = measure(chosen["model"], chosen["compute_type"], count, audio, runs)
+        if outcome and outcome[0] < chosen["latency"]:
+            chosen["cpu_threads"], chosen["latency"] = count, round(outcome[0], 3)
+            print(f"  {count} threads: {outcome[0]:.2f}s")
+
+    config = {key: chosen[key] for key in ("model", "compute_type", "cpu_threads", "latency", "word_error")}
+    return config, results
+
+
+def runtime_target(path=CONFIG_FILE):
+    """
+    The latency target to use when no target is passed: WHISPER_LATENCY_TARGET
+    if set, else the one the cached decision was made for, else LATENCY_TARGET.
+    """
+    if os.environ.get("WHISPER_LATENCY_TARGET"):
+        try:
+            return float(os.environ["WHISPER_LATENCY_TARGET"])
+        except ValueError:
+            print(f"Ignoring WHISPER_LATENCY_TARGET={os.environ['WHISPER_LATENCY_TARGET']!r} (not a number)")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(json.load(f)["fingerprint"]["target"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return LATENCY_TARGET
+
+
+def load_cached(target=LATENCY_TARGET, path=CONFIG_FILE):
+    """The cached decision if it was made for this machine and target, else None."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("fingerprint") != fingerprint(target):
+        return None
+    return cached.get("config")
+
+
+def save(config, results, target=LATENCY_TARGET, path=CONFIG_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint(target), "config": config, "measured": results,
+                   "calibrated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+
+
+def get_config(target=None, force=False):
+    """
+    Model settings for speech_module.get_model: cached if possible, otherwise
+    calibrated now (first start on a new box) and cached. Falls back to the
+    old fixed base/int8 if calibration is impossible (e.g. no clip, no network).
+    Without a target, runtime_target() decides.
+    """
+    if target is None:
+        target = runtime_target()
+    if not force:
+        cached = load_cached(target)
+        if cached:
+            return cached
+    if not os.path.exists(REFERENCE_CLIP):
+        return dict(DEFAULT_CONFIG)
+    print(f"Calibrating Whisper for a {target:g}s turn (one-time, cached in {CONFIG_FILE})...")
+    try:
+        config, results = calibrate(target)
+    except Exception as e:
+        print(f"Calibration failed ({e}); using {DEFAULT_CONFIG['model']}/{DEFAULT_CONFIG['compute_type']}.")
+        return dict(DEFAULT_CONFIG)
+    if results:
+        save(config, results, target)
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the Whisper configuration for this machine.")
+    parser.add_argument("--target", type=float,
+                        help=f"Max seconds to decode one turn (default: the saved target, else {LATENCY_TARGET:g})")
+    parser.add_argument("--force", action="store_true", help="Recalibrate even if a cached decision exists")
+    args = parser.parse_args()
+
+    config = get_config(args.target, force=args.force)
+    print(f"Using {config['model']} / {config['compute_type']} / "
+          f"{config['cpu_threads'] or 'default'} threads"
+          + (f" ({config['latency']:.2f}s per turn)" if "latency" in config else ""))